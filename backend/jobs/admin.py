@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import User, Applicant, Company, Job, Experience, JobApplication
+from .models import User, Applicant, Company, Job, Experience, JobApplication, OutboxEvent, SalaryStatBucket, CompanyApplicationRollup, IdempotencyKey, RefreshToken, RevokedToken, SavedSearch, SavedSearchMatch, NotificationEvent, SearchIndexRebuild, RedeemedStreamTicket
 
 admin.site.register(User)
 admin.site.register(Applicant)
@@ -9,4 +9,14 @@ admin.site.register(Company)
 admin.site.register(Job)
 admin.site.register(Experience)
 admin.site.register(JobApplication)
-
+admin.site.register(OutboxEvent)
+admin.site.register(SalaryStatBucket)
+admin.site.register(CompanyApplicationRollup)
+admin.site.register(IdempotencyKey)
+admin.site.register(RefreshToken)
+admin.site.register(RevokedToken)
+admin.site.register(SavedSearch)
+admin.site.register(SavedSearchMatch)
+admin.site.register(NotificationEvent)
+admin.site.register(SearchIndexRebuild)
+admin.site.register(RedeemedStreamTicket)
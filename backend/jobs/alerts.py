@@ -0,0 +1,149 @@
+"""
+Job alerts: saved searches matched against jobs as they are indexed.
+
+Re-running every saved search against Elasticsearch on a schedule costs one
+query per search whether anything changed or not. Instead every process keeps
+an inverted index of the saved searches in memory, the way a percolator does:
+each search is filed under its rarest term, so a job only looks up its own
+terms and checks the few searches filed under them. The ``job.sync`` outbox
+handler runs each batch of synced jobs through it in one pass, records the
+matches and queues a notification for each (jobs.notifications), which
+reach the applicant in their next digest.
+
+A search matches a job when every term of its query occurs in the job's
+title, skills, description, location or company and its filters agree.
+Only open jobs created after the search was saved are matched, so edits to
+older jobs never alert anybody, and a job is recorded once per search.
+"""
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .db import stream_queryset
+
+VERSION_KEY = 'saved-searches:version'
+
+# Keeps c++, c#, node.js and the like in one piece
+TERM_PATTERN = re.compile(r'[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*')
+
+
+def tokenize(text):
+    return set(TERM_PATTERN.findall((text or '').lower()))
+
+
+class SavedSearchIndex:
+    """Saved searches filed under their rarest term"""
+
+    def __init__(self, searches):
+        """``searches`` yields ``(id, query, job_type, location, created_at)``"""
+        rows = []
+        frequency = defaultdict(int)
+        for search_id, query, job_type, location, created_at in searches:
+            terms = frozenset(tokenize(query))
+            if not terms:
+                continue
+            rows.append((search_id, terms, job_type or None, frozenset(tokenize(location)), created_at))
+            for term in terms:
+                frequency[term] += 1
+
+        self.by_term = {}
+        for row in rows:
+            anchor = min(row[1], key=lambda term: (frequency[term], term))
+            self.by_term.setdefault(anchor, []).append(row)
+        self.size = len(rows)
+
+    def match(self, terms, location_terms, job_type, created_at):
+        """Ids of the saved searches matching one job"""
+        matched = []
+        for anchor in terms & self.by_term.keys():
+            for search_id, search_terms, search_job_type, search_location, search_created_at in self.by_term[anchor]:
+                if (search_terms <= terms
+                        and search_job_type in (None, job_type)
+                        and search_location <= location_terms
+                        and search_created_at <= created_at):
+                    matched.append(search_id)
+        return matched
+
+
+_index = None
+_index_version = None
+_index_built_at = 0.0
+_index_lock = threading.Lock()
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def invalidate_saved_search_index():
+    """Make every process rebuild its index before matching again"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, None)
+        cache.incr(VERSION_KEY)
+
+
+def get_index():
+    global _index, _index_version, _index_built_at
+    # Read the version first so a change during the load leaves the index stale
+    version = current_version()
+    with _index_lock:
+        # The age limit covers a version lost with an evicted cache key
+        if (_index is None or _index_version != version
+                or time.monotonic() - _index_built_at >= settings.SAVED_SEARCH_INDEX_SECONDS):
+            from .models import SavedSearch
+
+            _index = SavedSearchIndex(stream_queryset(
+                SavedSearch.objects.values_list('id', 'query', 'job_type', 'location', 'created_at')
+            ))
+            _index_version = version
+            _index_built_at = time.monotonic()
+        return _index
+
+
+def match_new_jobs(job_ids):
+    """Record the saved searches matched by ``job_ids``, returns the number of matches"""
+    from .models import Job, SavedSearchMatch
+
+    index = get_index()
+    if not index.size or not job_ids:
+        return 0
+
+    matches = []
+    jobs = Job.objects.filter(pk__in=job_ids, status='open').values_list(
+        'id', 'title', 'skills', 'description', 'location', 'company__name', 'company__industry',
+        'job_type', 'created_at')
+    for job_id, title, skills, description, location, company_name, industry, job_type, created_at in jobs:
+        terms = tokenize(' '.join(filter(None, (title, skills, description, location, company_name, industry))))
+        for search_id in index.match(terms, tokenize(location), job_type, created_at):
+            matches.append(SavedSearchMatch(saved_search_id=search_id, job_id=job_id))
+    # A job synced again finds its matches already recorded and queued
+    SavedSearchMatch.objects.bulk_create(matches, batch_size=1000, ignore_conflicts=True)
+    return queue_match_notifications(job_ids) if matches else 0
+
+
+def queue_match_notifications(job_ids):
+    """Queue a notification for every match of ``job_ids`` not queued yet"""
+    from .models import SavedSearchMatch
+    from .notifications import JOB_MATCHED, notify
+
+    pending = list(
+        SavedSearchMatch.objects.filter(job_id__in=job_ids, notified_at__isnull=True)
+        .values_list('id', 'job_id', 'saved_search__name', 'saved_search__query', 'saved_search__applicant__user_id')
+    )
+    notify([
+        (user_id, JOB_MATCHED, job_id, {'job_id': job_id, 'search': search_name or query})
+        for _, job_id, search_name, query, user_id in pending
+    ])
+    SavedSearchMatch.objects.filter(id__in=[row[0] for row in pending]).update(notified_at=timezone.now())
+    return len(pending)
@@ -1,15 +1,24 @@
 import jwt
 import hashlib
+import secrets
+import uuid
 from datetime import datetime, timedelta
 from django.conf import settings
-from django.http import JsonResponse
-from functools import wraps
-from .models import User, Applicant, Company
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import User, Applicant, Company, RefreshToken
+from .permissions import AccessRule, declare
+from .revocation import is_revoked
+from .token_cache import verified_tokens
 
 # JWT Secret Key - In production, this should be in environment variables
 JWT_SECRET = getattr(settings, 'JWT_SECRET', 'your-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
-JWT_EXPIRATION_DELTA = timedelta(days=7)
+JWT_EXPIRATION_DELTA = timedelta(seconds=settings.JWT_ACCESS_TOKEN_SECONDS)
+REFRESH_TOKEN_DELTA = timedelta(days=settings.JWT_REFRESH_TOKEN_DAYS)
+TOKEN_VERSION_CACHE_KEY = 'token-version:{user_id}'
 
 def hash_password(password):
     """Hash a password for storing in the database"""
@@ -19,29 +28,127 @@ def verify_password(password, hashed_password):
     """Verify a password against its hash"""
     return hashlib.sha256(password.encode()).hexdigest() == hashed_password
 
-def generate_jwt_token(user):
-    """Generate JWT token for a user"""
+class TokenPrincipal:
+    """The caller as described by a verified token, built without a query"""
+    is_authenticated = True
+
+    def __init__(self, payload):
+        self.id = self.pk = payload['user_id']
+        self.email = payload.get('email')
+        self.role = payload.get('role')
+        self.applicant_id = payload.get('applicant_id')
+        self.company_id = payload.get('company_id')
+        self.token_version = payload['ver']
+        self.jti = payload['jti']
+        self.expires_at = payload['exp']
+
+    def __repr__(self):
+        return f'<TokenPrincipal user={self.id} role={self.role}>'
+
+def generate_jwt_token(user, applicant_id=None, company_id=None):
+    """Generate JWT token for a user, carrying its profile id and token version"""
+    if user.role == 'applicant' and applicant_id is None:
+        applicant_id = Applicant.objects.filter(user=user).values_list('id', flat=True).first()
+    elif user.role == 'company' and company_id is None:
+        company_id = Company.objects.filter(user=user).values_list('id', flat=True).first()
     payload = {
         'user_id': user.id,
         'email': user.email,
         'role': user.role,
+        'ver': user.token_version,
+        'jti': uuid.uuid4().hex,
         'exp': datetime.utcnow() + JWT_EXPIRATION_DELTA,
         'iat': datetime.utcnow()
     }
+    if applicant_id is not None:
+        payload['applicant_id'] = applicant_id
+    if company_id is not None:
+        payload['company_id'] = company_id
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
+def _hash_refresh_token(raw_token):
+    return hashlib.sha256(raw_token.encode()).hexdigest()
+
+def issue_refresh_token(user, family=None):
+    """Store a new refresh token for the user and return its raw value"""
+    raw_token = secrets.token_urlsafe(32)
+    RefreshToken.objects.create(
+        user=user,
+        token_hash=_hash_refresh_token(raw_token),
+        family=family or uuid.uuid4().hex,
+        expires_at=timezone.now() + REFRESH_TOKEN_DELTA,
+    )
+    return raw_token
+
+def issue_tokens(user, applicant_id=None, company_id=None, family=None):
+    """An access token with the refresh token that renews it"""
+    return {
+        'token': generate_jwt_token(user, applicant_id=applicant_id, company_id=company_id),
+        'refresh_token': issue_refresh_token(user, family),
+        'expires_in': int(JWT_EXPIRATION_DELTA.total_seconds()),
+    }
+
+def rotate_refresh_token(raw_token):
+    """Trade a refresh token for a new token pair, None if it is not valid.
+
+    Each refresh token works once. Presenting one that was already rotated
+    means it leaked, so every token of its family is revoked.
+    """
+    token_hash = _hash_refresh_token(raw_token)
+    now = timezone.now()
+    with transaction.atomic():
+        claimed = RefreshToken.objects.filter(
+            token_hash=token_hash, used_at__isnull=True, revoked_at__isnull=True, expires_at__gt=now,
+        ).update(used_at=now)
+        record = RefreshToken.objects.select_related('user').filter(token_hash=token_hash).first()
+        if record is None:
+            return None
+        if not claimed:
+            if record.used_at is not None:
+                RefreshToken.objects.filter(family=record.family, revoked_at__isnull=True).update(revoked_at=now)
+            return None
+        return issue_tokens(record.user, family=record.family)
+
+def revoke_refresh_token(raw_token, user_id):
+    """Revoke the family of one of the user's refresh tokens"""
+    family = RefreshToken.objects.filter(
+        token_hash=_hash_refresh_token(raw_token), user_id=user_id).values_list('family', flat=True).first()
+    if family is not None:
+        RefreshToken.objects.filter(family=family, revoked_at__isnull=True).update(revoked_at=timezone.now())
+
+def current_token_version(user_id):
+    """The user's token version from the cache, None for a deleted user"""
+    key = TOKEN_VERSION_CACHE_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        version = User.objects.filter(id=user_id).values_list('token_version', flat=True).first()
+        if version is not None:
+            cache.set(key, version, settings.TOKEN_VERSION_CACHE_SECONDS)
+    return version
+
+def revoke_user_tokens(user_id):
+    """Invalidate every token issued to the user so far"""
+    User.objects.filter(id=user_id).update(token_version=F('token_version') + 1)
+    RefreshToken.objects.filter(user_id=user_id, revoked_at__isnull=True).update(revoked_at=timezone.now())
+    cache.delete(TOKEN_VERSION_CACHE_KEY.format(user_id=user_id))
+
 def decode_jwt_token(token):
-    """Decode and validate JWT token"""
+    """Decode and validate JWT token, reusing an earlier verification"""
+    digest = verified_tokens.digest(token)
+    payload = verified_tokens.get(digest)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        verified_tokens.put(digest, payload)
         return payload
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
 
-def get_user_from_token(request):
-    """Extract user from JWT token in request headers"""
+def get_principal_from_token(request):
+    """Extract the caller from the JWT token in request headers"""
     # Handle both Django and DRF request objects
     if hasattr(request, 'META'):
         auth_header = request.META.get('HTTP_AUTHORIZATION')
@@ -52,143 +159,32 @@ def get_user_from_token(request):
     if not auth_header or not auth_header.startswith('Bearer '):
         return None
     
-    token = auth_header.split(' ')[1]
+    return principal_from_token(auth_header.split(' ')[1])
+
+def principal_from_token(token):
+    """The caller a raw access token stands for, or None when it is not valid"""
     payload = decode_jwt_token(token)
-    if not payload:
+    # Tokens issued before versioning carry no profile ids, they must be renewed
+    if not payload or 'user_id' not in payload or 'ver' not in payload or 'jti' not in payload:
         return None
-    
-    try:
-        user = User.objects.get(id=payload['user_id'])
-        return user
-    except User.DoesNotExist:
+    if is_revoked(payload):
         return None
+    if current_token_version(payload['user_id']) != payload['ver']:
+        return None
+    return TokenPrincipal(payload)
 
 def require_authentication(view_func):
-    """Decorator to require authentication for a view"""
-    @wraps(view_func)
-    def wrapper(view_or_request, *args, **kwargs):
-        # Handle both Django views and DRF APIView methods
-        if hasattr(view_or_request, 'request'):
-            # This is a DRF view instance
-            request = view_or_request.request
-            view_instance = view_or_request
-        else:
-            # This is a Django function-based view
-            request = view_or_request
-            view_instance = None
-        
-        user = get_user_from_token(request)
-        if not user:
-            if view_instance:
-                # Return DRF Response for APIView
-                from rest_framework.response import Response
-                from rest_framework import status
-                return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
-            else:
-                # Return Django JsonResponse for function-based views
-                from django.http import JsonResponse
-                return JsonResponse({'error': 'Authentication required'}, status=401)
-        
-        # Add user to request object for easy access
-        request.user = user
-        
-        if view_instance:
-            # Call the method with the view instance
-            return view_func(view_instance, *args, **kwargs)
-        else:
-            # Call the function with the request
-            return view_func(request, *args, **kwargs)
-    
-    return wrapper
+    """Require an authenticated caller, enforced by permissions.DeclaredAccess"""
+    return declare(view_func, AccessRule('authenticated'))
 
 def require_role(required_role):
-    """Decorator to require specific role for a view"""
+    """Require the caller to have ``required_role``"""
     def decorator(view_func):
-        @wraps(view_func)
-        def wrapper(request, *args, **kwargs):
-            user = get_user_from_token(request)
-            if not user:
-                # Check if it's a DRF view by looking for Response in the view module
-                try:
-                    from rest_framework.response import Response
-                    return Response({'error': 'Authentication required'}, status=401)
-                except ImportError:
-                    return JsonResponse({'error': 'Authentication required'}, status=401)
-            
-            if user.role != required_role:
-                try:
-                    from rest_framework.response import Response
-                    return Response({'error': 'Insufficient permissions'}, status=403)
-                except ImportError:
-                    return JsonResponse({'error': 'Insufficient permissions'}, status=403)
-            
-            request.user = user
-            return view_func(request, *args, **kwargs)
-        
-        return wrapper
+        return declare(view_func, AccessRule('role', required_role))
     return decorator
 
 def require_ownership_or_admin(model_name, id_param='id'):
-    """Decorator to require ownership of a resource or admin role"""
+    """Require the caller to own the ``model_name`` named by URL kwarg ``id_param``"""
     def decorator(view_func):
-        @wraps(view_func)
-        def wrapper(request, *args, **kwargs):
-            user = get_user_from_token(request)
-            if not user:
-                try:
-                    from rest_framework.response import Response
-                    return Response({'error': 'Authentication required'}, status=401)
-                except ImportError:
-                    return JsonResponse({'error': 'Authentication required'}, status=401)
-            
-            resource_id = kwargs.get(id_param)
-            if not resource_id:
-                try:
-                    from rest_framework.response import Response
-                    return Response({'error': 'Resource ID required'}, status=400)
-                except ImportError:
-                    return JsonResponse({'error': 'Resource ID required'}, status=400)
-            
-            # Check ownership based on model type
-            try:
-                if model_name == 'applicant':
-                    applicant = Applicant.objects.get(id=resource_id)
-                    if applicant.user.id != user.id:
-                        try:
-                            from rest_framework.response import Response
-                            return Response({'error': 'Access denied'}, status=403)
-                        except ImportError:
-                            return JsonResponse({'error': 'Access denied'}, status=403)
-                elif model_name == 'company':
-                    company = Company.objects.get(id=resource_id)
-                    if company.user.id != user.id:
-                        try:
-                            from rest_framework.response import Response
-                            return Response({'error': 'Access denied'}, status=403)
-                        except ImportError:
-                            return JsonResponse({'error': 'Access denied'}, status=403)
-                elif model_name == 'user':
-                    if int(resource_id) != user.id:
-                        try:
-                            from rest_framework.response import Response
-                            return Response({'error': 'Access denied'}, status=403)
-                        except ImportError:
-                            return JsonResponse({'error': 'Access denied'}, status=403)
-                else:
-                    try:
-                        from rest_framework.response import Response
-                        return Response({'error': 'Invalid resource type'}, status=400)
-                    except ImportError:
-                        return JsonResponse({'error': 'Invalid resource type'}, status=400)
-            except (Applicant.DoesNotExist, Company.DoesNotExist, User.DoesNotExist):
-                try:
-                    from rest_framework.response import Response
-                    return Response({'error': 'Resource not found'}, status=404)
-                except ImportError:
-                    return JsonResponse({'error': 'Resource not found'}, status=404)
-            
-            request.user = user
-            return view_func(request, *args, **kwargs)
-        
-        return wrapper
+        return declare(view_func, AccessRule('owner', model_name, id_param))
     return decorator
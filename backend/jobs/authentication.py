@@ -0,0 +1,22 @@
+from rest_framework.authentication import BaseAuthentication
+
+from .auth import get_principal_from_token
+
+
+class JWTAuthentication(BaseAuthentication):
+    """Resolve the caller from a ``Bearer`` token, once per request.
+
+    DRF keeps the result on the request, so stacked permission checks and
+    the view all share the same ``TokenPrincipal``. An invalid or revoked
+    token leaves the request anonymous; views that need a caller reject it
+    through ``DeclaredAccess``.
+    """
+
+    def authenticate(self, request):
+        principal = get_principal_from_token(request)
+        if principal is None:
+            return None
+        return principal, None
+
+    def authenticate_header(self, request):
+        return 'Bearer'
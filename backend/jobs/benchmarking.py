@@ -0,0 +1,94 @@
+"""
+Helpers shared by the benchmark management commands.
+
+Latencies are collected in seconds and summarised as JSON-friendly dicts so
+runs from different commits can be diffed directly.
+"""
+import platform
+import subprocess
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+BENCHMARK_EMAIL_DOMAIN = 'bench.example.com'
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarise(latencies, statuses, wall_time):
+    """Throughput and latency distribution of one scenario run"""
+    ordered = sorted(latencies)
+    count = len(ordered)
+    errors = sum(1 for status in statuses if status >= 500 or status == 0)
+    return {
+        'requests': count,
+        'errors': errors,
+        'status_codes': {str(code): n for code, n in sorted(Counter(statuses).items())},
+        'duration_s': round(wall_time, 4),
+        'throughput_rps': round(count / wall_time, 2) if wall_time else 0.0,
+        'latency_ms': {
+            'mean': round(sum(ordered) / count * 1000, 3) if count else 0.0,
+            'p50': round(percentile(ordered, 0.50) * 1000, 3),
+            'p95': round(percentile(ordered, 0.95) * 1000, 3),
+            'p99': round(percentile(ordered, 0.99) * 1000, 3),
+            'max': round(ordered[-1] * 1000, 3) if count else 0.0,
+        },
+    }
+
+
+def run_concurrently(call, total, concurrency, make_worker_state=None):
+    """Run ``call(state, index)`` ``total`` times across ``concurrency`` threads.
+
+    ``call`` returns a status code. ``make_worker_state`` builds per-thread
+    state such as a test client, which is not safe to share between threads.
+    """
+    per_worker = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+
+    def worker(worker_index):
+        state = make_worker_state() if make_worker_state else None
+        latencies, statuses = [], []
+        start_index = sum(per_worker[:worker_index])
+        for index in range(start_index, start_index + per_worker[worker_index]):
+            started = time.perf_counter()
+            try:
+                status = call(state, index)
+            except Exception:
+                status = 0
+            latencies.append(time.perf_counter() - started)
+            statuses.append(status)
+        return latencies, statuses
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(worker, range(concurrency)))
+    wall_time = time.perf_counter() - started
+
+    latencies = [value for worker_latencies, _ in results for value in worker_latencies]
+    statuses = [value for _, worker_statuses in results for value in worker_statuses]
+    return summarise(latencies, statuses, wall_time)
+
+
+def environment_info():
+    """Identify the code and runtime a benchmark ran against"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
@@ -0,0 +1,34 @@
+"""
+System checks for settings that only work in combination.
+
+They run with ``manage.py check``, ``migrate``, ``runserver`` and the test
+runner, so a deployment fails before serving traffic.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from .db_router import get_replicas
+
+# Backends whose entries only the process that wrote them can read
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_is_shared(alias='default'):
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+@register(Tags.caches, Tags.database)
+def check_replica_sticky_cache(app_configs, **kwargs):
+    # The sticky window after a write is a cache entry. Kept per process, the
+    # writer's next request can land in another process and read a replica
+    # that has not caught up.
+    if get_replicas() and not cache_is_shared():
+        return [Error(
+            'Read replicas need a cache shared by every process.',
+            hint='Set CACHE_URL to a Redis URL, the sticky window after a write is kept in the default cache.',
+            id='jobs.E001',
+        )]
+    return []
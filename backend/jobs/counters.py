@@ -0,0 +1,74 @@
+"""
+Application counters stored on ``Job``.
+
+``applications_count`` and one counter per application status are adjusted
+with ``F()`` updates by the ``JobApplication`` signals, so listing or sorting
+jobs by popularity needs no aggregation. ``recount_applications`` rebuilds
+them from ``JobApplication`` when they drift, e.g. after bulk writes that
+skip signals.
+"""
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+STATUS_COUNTERS = {
+    'applied': 'applied_count',
+    'interview': 'interview_count',
+    'offered': 'offered_count',
+    'rejected': 'rejected_count',
+}
+COUNTER_FIELDS = ['applications_count', *STATUS_COUNTERS.values()]
+
+
+def apply_counter_changes(old, new, using=None):
+    """Move one application from ``old`` to ``new``, each ``(job_id, status)`` or None"""
+    from .models import Job
+
+    if old == new:
+        return
+    deltas = {}
+    for key, step in ((old, -1), (new, 1)):
+        if key is None or key[0] is None:
+            continue
+        job_id, status = key
+        changes = deltas.setdefault(job_id, {})
+        changes['applications_count'] = changes.get('applications_count', 0) + step
+        if status in STATUS_COUNTERS:
+            field = STATUS_COUNTERS[status]
+            changes[field] = changes.get(field, 0) + step
+
+    with transaction.atomic(using=using):
+        for job_id, changes in deltas.items():
+            updates = {field: F(field) + step for field, step in changes.items() if step}
+            if updates:
+                Job.objects.using(using).filter(pk=job_id).update(**updates)
+
+
+def _count(status=None):
+    from .models import JobApplication
+
+    applications = JobApplication.objects.filter(job=OuterRef('pk'))
+    if status is not None:
+        applications = applications.filter(status=status)
+    counted = applications.order_by().values('job').annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+
+def recount_applications(batch_size=5000):
+    """Recompute every job's counters in id range batches, returns jobs updated"""
+    from .models import Job
+
+    counts = {'applications_count': _count()}
+    counts.update({field: _count(status) for status, field in STATUS_COUNTERS.items()})
+
+    updated = 0
+    last_pk = 0
+    while True:
+        # Short transactions, each one only locks a batch of jobs
+        batch = list(Job.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            break
+        with transaction.atomic():
+            updated += Job.objects.filter(pk__gte=batch[0], pk__lte=batch[-1]).update(**counts)
+        last_pk = batch[-1]
+    return updated
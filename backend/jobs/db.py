@@ -0,0 +1,47 @@
+from django.db import connections, transaction
+
+
+def stream_queryset(queryset, chunk_size=2000):
+    """Iterate a queryset through a server-side cursor.
+
+    The iteration runs inside a transaction so the named cursor survives
+    PgBouncer transaction pooling, where every statement outside a
+    transaction may land on a different server connection.
+    """
+    with transaction.atomic(using=queryset.db):
+        yield from queryset.iterator(chunk_size=chunk_size)
+
+
+def get_pool(alias='default'):
+    """Return the psycopg pool backing a database alias, or None"""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return None
+    return getattr(connection, 'pool', None)
+
+
+def pool_stats():
+    """Snapshot psycopg pool statistics for every configured database"""
+    stats = {}
+    for alias in connections:
+        pool = get_pool(alias)
+        if pool is None:
+            continue
+        stats[alias] = pool.get_stats()
+    return stats
+
+
+def close_connections_for_fork():
+    """Close every database connection and connection pool of this process.
+
+    With the psycopg pool ``close()`` only hands a connection back to the
+    pool, whose sockets and worker threads a forked child would share with
+    its parent. Call this before forking, and in the child before its first
+    query.
+    """
+    connections.close_all()
+    for alias in connections:
+        connection = connections[alias]
+        # Only pools that exist, reading ``pool`` would open a new one
+        if alias in getattr(connection, '_connection_pools', ()):
+            connection.close_pool()
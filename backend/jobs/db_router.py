@@ -0,0 +1,59 @@
+"""
+Database router sending safe reads to read replicas.
+
+Reads only go to a replica while replica routing is switched on for the
+current context, which ``ReplicaRoutingMiddleware`` does for safe requests
+to the views listed in ``REPLICA_ROUTED_VIEWS``. Everything else, including
+every write, stays on ``default``.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+_read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+def get_replicas():
+    """Aliases of the configured read replicas"""
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def enable_replica_reads():
+    """Route reads in the current context to a replica, returns a reset token"""
+    return _read_from_replica.set(True)
+
+
+def reset_replica_reads(token):
+    _read_from_replica.reset(token)
+
+
+@contextmanager
+def replica_reads():
+    """Context manager routing reads inside the block to a replica"""
+    token = enable_replica_reads()
+    try:
+        yield
+    finally:
+        reset_replica_reads(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if replicas and _read_from_replica.get():
+            return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas mirror the primary, objects from any of them can relate.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_replicas():
+            return False
+        return None
@@ -1,14 +1,33 @@
-from django_elasticsearch_dsl import Document
+from datetime import date
+
+from django.conf import settings as django_settings
+from django_elasticsearch_dsl import Document, fields
 from django_elasticsearch_dsl.registries import registry
-from .models import Job
+from .models import Applicant, Company, Experience, Job, User
 
 @registry.register_document
 class JobDocument(Document):
+    id = fields.LongField()
+    status = fields.KeywordField()
+    job_type = fields.KeywordField()
+    application_url = fields.KeywordField(index=False)
+    location_point = fields.GeoPointField()
+    # Denormalised so search can match on and render the company without
+    # going back to Postgres. Company changes fan out through the outbox.
+    company = fields.ObjectField(properties={
+        'id': fields.LongField(),
+        'name': fields.TextField(fields={'raw': fields.KeywordField()}),
+        'industry': fields.TextField(fields={'raw': fields.KeywordField()}),
+        'logo': fields.KeywordField(index=False),
+        'website': fields.KeywordField(index=False),
+    })
+
     class Index:
+        # An alias, rebuild_search_index points it at a versioned index
         name = 'jobs'
         settings = {
-            'number_of_shards': 1,
-            'number_of_replicas': 0
+            'number_of_shards': django_settings.SEARCH_INDEX_SHARDS,
+            'number_of_replicas': django_settings.SEARCH_INDEX_REPLICAS
         }
 
     class Django:
@@ -18,4 +37,101 @@ class JobDocument(Document):
             'description',
             'location',
             'skills',
+            'salary',
+            'created_at',
         ]
+        related_models = [Company]
+
+    def prepare_location_point(self, instance):
+        if instance.latitude is None or instance.longitude is None:
+            return None
+        return {'lat': instance.latitude, 'lon': instance.longitude}
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('company')
+
+    def get_instances_from_related(self, related_instance):
+        if isinstance(related_instance, Company):
+            return related_instance.jobs.all()
+
+
+def skill_tags(*texts):
+    """Comma separated skills as lower-cased, de-duplicated tags"""
+    tags = []
+    for text in texts:
+        for skill in (text or '').split(','):
+            skill = skill.strip().lower()
+            if skill and skill not in tags:
+                tags.append(skill)
+    return tags
+
+
+def years_of_experience(experiences, today=None):
+    """Total years covered by the experiences, overlapping periods counted once"""
+    today = today or date.today()
+    periods = sorted((e.start_date, min(e.end_date or today, today)) for e in experiences)
+    days = 0
+    current_start = current_end = None
+    for start, end in periods:
+        if end < start:
+            continue
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                days += (current_end - current_start).days
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        days += (current_end - current_start).days
+    return round(days / 365.25, 1)
+
+
+@registry.register_document
+class ApplicantDocument(Document):
+    """Applicant profiles for recruiter search, kept in sync by the outbox"""
+    id = fields.LongField()
+    name = fields.TextField()
+    skills = fields.TextField()
+    skill_tags = fields.KeywordField(multi=True)
+    experience_titles = fields.TextField(multi=True, fields={'raw': fields.KeywordField()})
+    experience_companies = fields.TextField(multi=True, fields={'raw': fields.KeywordField()})
+    # Ongoing experiences count up to the last sync of the profile
+    years_of_experience = fields.FloatField()
+    linkedin = fields.KeywordField(index=False)
+    github = fields.KeywordField(index=False)
+
+    class Index:
+        # An alias, rebuild_search_index --alias applicants rebuilds it
+        name = 'applicants'
+        settings = {
+            'number_of_shards': django_settings.SEARCH_INDEX_SHARDS,
+            'number_of_replicas': django_settings.SEARCH_INDEX_REPLICAS
+        }
+
+    class Django:
+        model = Applicant
+        related_models = [User, Experience]
+
+    def prepare_name(self, instance):
+        return instance.user.name
+
+    def prepare_skill_tags(self, instance):
+        return skill_tags(instance.skills, *(experience.skills for experience in instance.experiences.all()))
+
+    def prepare_experience_titles(self, instance):
+        return [experience.job_title for experience in instance.experiences.all()]
+
+    def prepare_experience_companies(self, instance):
+        return [experience.company_name for experience in instance.experiences.all()]
+
+    def prepare_years_of_experience(self, instance):
+        return years_of_experience(instance.experiences.all())
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('user').prefetch_related('experiences')
+
+    def get_instances_from_related(self, related_instance):
+        if isinstance(related_instance, User):
+            return Applicant.objects.filter(user=related_instance)
+        if isinstance(related_instance, Experience):
+            return related_instance.applicant
@@ -0,0 +1,144 @@
+"""
+Offline geocoding and distance helpers.
+
+Job locations are free text, they are resolved against the gazetteer shipped
+in ``jobs/data/gazetteer.csv`` so no request ever leaves the process. Radius
+queries against the database use a bounding box on the indexed
+``(latitude, longitude)`` columns and refine the candidates with the
+haversine distance.
+"""
+import csv
+import math
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+GAZETTEER_PATH = Path(__file__).resolve().parent / 'data' / 'gazetteer.csv'
+EARTH_RADIUS_KM = 6371.0088
+MAX_RADIUS_KM = 20000
+
+_SEPARATORS = re.compile(r'[,/|;()]+|\s+-\s+')
+
+
+def _normalise(name):
+    return ' '.join(name.lower().replace('.', ' ').split())
+
+
+@lru_cache(maxsize=1)
+def load_gazetteer():
+    """Map normalised place names and aliases to ``(latitude, longitude)``"""
+    places = {}
+    with open(GAZETTEER_PATH, newline='', encoding='utf-8') as handle:
+        for row in csv.DictReader(handle):
+            point = (float(row['latitude']), float(row['longitude']))
+            names = [row['name']] + [alias for alias in (row['aliases'] or '').split('|') if alias]
+            for name in names:
+                places.setdefault(_normalise(name), point)
+    return places
+
+
+def geocode(location):
+    """Resolve a free text location such as "Cairo, Egypt" to coordinates or None"""
+    if not location:
+        return None
+    places = load_gazetteer()
+    normalised = _normalise(location)
+    if normalised in places:
+        return places[normalised]
+    # "Berlin, Germany", "Remote / London": the first part naming a known
+    # place wins.
+    for part in _SEPARATORS.split(location):
+        point = places.get(_normalise(part))
+        if point:
+            return point
+    return None
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """Return ``(min_lat, max_lat, min_lon, max_lon)`` enclosing the circle.
+
+    The longitude bounds are None when the box spans a pole or the
+    antimeridian, only the latitude range is usable then.
+    """
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = latitude - delta_lat, latitude + delta_lat
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90), min(max_lat, 90), None, None
+    delta_lon = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(latitude))))
+    min_lon, max_lon = longitude - delta_lon, longitude + delta_lon
+    if min_lon < -180 or max_lon > 180:
+        return min_lat, max_lat, None, None
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def distance_expression(latitude, longitude):
+    """Haversine distance in km from the given point to a Job's coordinates"""
+    lat = Radians(F('latitude'))
+    lon = Radians(F('longitude'))
+    origin_lat = Radians(Value(latitude, output_field=FloatField()))
+    origin_lon = Radians(Value(longitude, output_field=FloatField()))
+    a = (
+        Power(Sin((lat - origin_lat) / 2), 2)
+        + Cos(origin_lat) * Cos(lat) * Power(Sin((lon - origin_lon) / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a), output_field=FloatField())
+
+
+def within_radius(queryset, latitude, longitude, radius_km):
+    """Filter ``queryset`` to jobs within ``radius_km``, annotated with ``distance_km``"""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+    queryset = queryset.filter(latitude__gte=min_lat, latitude__lte=max_lat)
+    if min_lon is not None:
+        queryset = queryset.filter(longitude__gte=min_lon, longitude__lte=max_lon)
+    return queryset.annotate(distance_km=distance_expression(latitude, longitude)).filter(
+        distance_km__lte=radius_km)
+
+
+class GeoParamError(ValueError):
+    pass
+
+
+def parse_origin(params):
+    """Read the search origin from ``lat``/``lon`` or a ``near`` place name.
+
+    Returns ``(latitude, longitude)`` or None when no origin was given and
+    raises GeoParamError for unusable values.
+    """
+    near = (params.get('near') or '').strip()
+    lat, lon = params.get('lat'), params.get('lon')
+    if lat not in (None, '') or lon not in (None, ''):
+        try:
+            latitude, longitude = float(lat), float(lon)
+        except (TypeError, ValueError):
+            raise GeoParamError('lat and lon must both be numbers')
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise GeoParamError('lat or lon out of range')
+        return latitude, longitude
+    if near:
+        point = geocode(near)
+        if point is None:
+            raise GeoParamError(f'Unknown place "{near}"')
+        return point
+    return None
+
+
+def parse_radius(params):
+    radius = params.get('radius_km')
+    if radius in (None, ''):
+        return None
+    try:
+        radius = float(radius)
+    except (TypeError, ValueError):
+        raise GeoParamError('radius_km must be a number')
+    if not 0 < radius <= MAX_RADIUS_KM:
+        raise GeoParamError(f'radius_km must be between 0 and {MAX_RADIUS_KM}')
+    return radius
@@ -0,0 +1,134 @@
+"""
+``Idempotency-Key`` support for unsafe API methods.
+
+The first request with a key claims it by inserting an ``IdempotencyKey``
+row, runs the view and stores the response on that row. Retries with the
+same key and payload replay the stored response without running the view
+again; the same key with a different payload is rejected. Keys are scoped
+to the authenticated user and expire after ``IDEMPOTENCY_KEY_TTL_SECONDS``.
+
+Only outcomes a retry would repeat are stored: 2xx responses, and 4xx
+responses the view marked ``replayable`` because they were decided from the
+request alone, before any database work. Anything else releases the key so
+a retry runs the view again. A claim whose request never finished (the
+process died) is taken over by a retry after
+``IDEMPOTENCY_IN_FLIGHT_SECONDS``.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(request):
+    payload = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{payload}'.encode()).hexdigest()
+
+
+def request_scope(request):
+    user_id = getattr(request.user, 'pk', None)
+    return f'user:{user_id}' if user_id is not None else 'anonymous'
+
+
+def replayable(response):
+    """Mark a 4xx response, decided before any database work, to be replayed to retries"""
+    response.idempotent_replayable = True
+    return response
+
+
+def _should_store(response):
+    if status.is_success(response.status_code):
+        return True
+    return status.is_client_error(response.status_code) and getattr(response, 'idempotent_replayable', False)
+
+
+def _claim(scope, key, fingerprint):
+    """Return ``(record, claimed)`` for the key, expired records are replaced"""
+    now = timezone.now()
+    IdempotencyKey.objects.filter(scope=scope, key=key, expires_at__lte=now).delete()
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                scope=scope, key=key, fingerprint=fingerprint,
+                expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS),
+            )
+        return record, True
+    except IntegrityError:
+        pass
+
+    record = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+    if record is None or record.response_status is not None or record.fingerprint != fingerprint:
+        return record, False
+    # Still in flight long after any request should have finished: take it
+    # over. The conditional update lets exactly one retry win.
+    taken = IdempotencyKey.objects.filter(
+        pk=record.pk, response_status__isnull=True, created_at=record.created_at,
+        created_at__lte=now - timedelta(seconds=settings.IDEMPOTENCY_IN_FLIGHT_SECONDS),
+    ).update(created_at=now)
+    if taken:
+        record.created_at = now
+    return record, bool(taken)
+
+
+def _owned(record):
+    # A claim taken over by a retry has a new created_at, the original
+    # request must neither store its response nor release the key then
+    return IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at)
+
+
+def idempotent(view_method):
+    """Make an APIView method replay its response for a repeated Idempotency-Key"""
+    @wraps(view_method)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(view, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = request_fingerprint(request)
+        record, claimed = _claim(request_scope(request), key, fingerprint)
+        if record is None:
+            # Lost a race with an expiry purge, treat as a fresh request
+            return view_method(view, request, *args, **kwargs)
+        if not claimed:
+            if record.fingerprint != fingerprint:
+                return Response({'error': f'{HEADER} was already used with a different request'},
+                                status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            if record.response_status is None:
+                return Response({'error': f'A request with this {HEADER} is still in progress'},
+                                status=status.HTTP_409_CONFLICT)
+            return Response(record.response_body, status=record.response_status,
+                            headers={'Idempotent-Replayed': 'true'})
+
+        try:
+            response = view_method(view, request, *args, **kwargs)
+        except Exception:
+            _owned(record).delete()
+            raise
+        if _should_store(response):
+            _owned(record).update(response_status=response.status_code, response_body=response.data)
+        else:
+            # The outcome may differ next time (a transient error caught by
+            # the view, or a check against data), let the client retry for real
+            _owned(record).delete()
+        return response
+
+    return wrapper
+
+
+def purge_expired_keys():
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -0,0 +1,155 @@
+"""
+Bulk search indexing fed by the outbox.
+
+Every write is "make the document match the database row": rows that still
+exist are (re)indexed, rows that are gone are deleted. The outbox event id is
+sent as an ``external_gte`` version so a replayed or out-of-order batch can
+never overwrite a newer document, which makes retries idempotent.
+
+Writes become searchable when the relay batch that made them ends: the
+indices written to are refreshed with a single request, then the search
+cache generation is bumped once.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.utils import timezone
+from elasticsearch.helpers import bulk
+from elasticsearch_dsl import connections as es_connections
+
+from .alerts import match_new_jobs
+from .documents import ApplicantDocument, JobDocument
+from .instrumentation import track_es
+from .models import Job, SearchIndexRebuild
+from .outbox import after_batch, outbox_handler
+from .search_cache import bump_generation
+
+logger = logging.getLogger(__name__)
+
+# Jobs re-indexed per bulk request when a company change fans out
+CASCADE_CHUNK_SIZE = 500
+
+# While an index is being rebuilt, live changes are written to it as well so
+# nothing committed during the rebuild is missing after the alias swap. The
+# target is a SearchIndexRebuild row, which every relay process sees; one
+# left behind by a killed rebuild is ignored after a day.
+REBUILD_TARGET_TIMEOUT = timedelta(days=1)
+
+# Version written by the bulk loader of a rebuild. Any live write carries an
+# outbox event id, which is always higher, so it wins regardless of order.
+REBUILD_VERSION = 0
+
+
+# Indices written to since the last refresh, per relay thread
+_written = threading.local()
+
+
+class SearchIndexError(Exception):
+    pass
+
+
+def _is_ignorable(item):
+    (op_type, result), = item.items()
+    # 409: a newer version is already indexed. 404: deleting something the
+    # index never had.
+    return result.get('status') == 409 or (op_type == 'delete' and result.get('status') == 404)
+
+
+def get_rebuild_target(alias):
+    return SearchIndexRebuild.objects.filter(
+        alias=alias, started_at__gt=timezone.now() - REBUILD_TARGET_TIMEOUT,
+    ).values_list('index_name', flat=True).first()
+
+
+def set_rebuild_target(alias, index_name):
+    SearchIndexRebuild.objects.update_or_create(
+        alias=alias, defaults={'index_name': index_name, 'started_at': timezone.now()})
+
+
+def clear_rebuild_target(alias):
+    SearchIndexRebuild.objects.filter(alias=alias).delete()
+
+
+def sync_documents(document, events):
+    """Bring ``document``'s index in line with the database for ``events``"""
+    versions = dict(events)
+    if not versions:
+        return 0
+
+    actions = []
+    found = set()
+    for instance in document.get_queryset().filter(pk__in=list(versions)):
+        found.add(instance.pk)
+        action = document._prepare_action(instance, 'index')
+        action.update(_version=versions[instance.pk], _version_type='external_gte')
+        actions.append(action)
+    for pk in versions.keys() - found:
+        actions.append({
+            '_op_type': 'delete',
+            '_index': document._index._name,
+            '_id': pk,
+            '_version': versions[pk],
+            '_version_type': 'external_gte',
+        })
+
+    rebuild_target = get_rebuild_target(document._index._name)
+    if rebuild_target:
+        actions += [{**action, '_index': rebuild_target} for action in actions]
+
+    _written_indices().add(document._index._name)
+    with track_es():
+        _, errors = bulk(document._get_connection(), actions, raise_on_error=False, stats_only=False)
+    failures = [item for item in errors if not _is_ignorable(item)]
+    if failures:
+        raise SearchIndexError(f'{len(failures)} of {len(actions)} bulk actions failed: {failures[:3]}')
+    return len(actions)
+
+
+def _written_indices():
+    indices = getattr(_written, 'indices', None)
+    if indices is None:
+        indices = _written.indices = set()
+    return indices
+
+
+@after_batch
+def refresh_written_indices():
+    """Make the writes since the last call searchable, then invalidate cached searches"""
+    indices = _written_indices()
+    if not indices:
+        return
+    names = ','.join(sorted(indices))
+    indices.clear()
+    # Refresh before bumping, otherwise a search racing the refresh would
+    # cache pre-flush results under the new generation.
+    with track_es():
+        es_connections.get_connection().indices.refresh(index=names)
+    bump_generation()
+
+
+@outbox_handler('job.sync')
+def sync_jobs(events):
+    synced = sync_documents(JobDocument(), events)
+    # Only once the jobs are written; the alerts go out with the next digest,
+    # long after the batch's refresh made them searchable
+    match_new_jobs([job_id for job_id, _ in events])
+    return synced
+
+
+@outbox_handler('company.sync')
+def sync_company_jobs(events):
+    """Re-index only the jobs of the changed companies"""
+    document = JobDocument()
+    synced = 0
+    for company_id, version in events:
+        job_ids = list(Job.objects.filter(company_id=company_id).values_list('id', flat=True))
+        for start in range(0, len(job_ids), CASCADE_CHUNK_SIZE):
+            chunk = job_ids[start:start + CASCADE_CHUNK_SIZE]
+            synced += sync_documents(document, [(job_id, version) for job_id in chunk])
+    return synced
+
+
+@outbox_handler('applicant.sync')
+def sync_applicants(events):
+    return sync_documents(ApplicantDocument(), events)
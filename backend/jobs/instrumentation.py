@@ -0,0 +1,127 @@
+"""
+Per-request performance accounting.
+
+``PerformanceMiddleware`` opens a ``RequestStats`` for every request and the
+hooks below add to it: database time through ``connection.execute_wrapper``,
+Elasticsearch time through ``track_es()``, cache lookups through
+``record_cache_lookup()`` and response rendering through the middleware's
+template-response hook. Rendering is only DRF turning the finished data into
+JSON; views that build their dicts by hand spend that time in the view, which
+is what is left of ``total`` after the other entries.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from .metrics import Counter, Histogram
+
+_current_stats = ContextVar('request_stats', default=None)
+
+REQUEST_DURATION = Histogram(
+    'jobs_http_request_duration_seconds', 'Total request time per endpoint', ['endpoint', 'method'])
+DB_DURATION = Histogram(
+    'jobs_http_db_duration_seconds', 'Database time per request', ['endpoint', 'method'])
+DB_QUERIES = Histogram(
+    'jobs_http_db_queries', 'Database queries per request', ['endpoint', 'method'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200))
+ES_DURATION = Histogram(
+    'jobs_http_es_duration_seconds', 'Elasticsearch time per request', ['endpoint', 'method'])
+RENDER_DURATION = Histogram(
+    'jobs_http_render_duration_seconds', 'Time DRF took to render the response per request', ['endpoint', 'method'])
+CACHE_LOOKUPS = Counter(
+    'jobs_http_cache_lookups_total', 'Cache lookups made while serving requests', ['endpoint', 'result'])
+
+
+class RequestStats:
+    """Timings and counters collected while serving one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.db_count = 0
+        self.db_time = 0.0
+        self.queries = []
+        self.es_count = 0
+        self.es_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.render_time = 0.0
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+        return self
+
+    def server_timing(self):
+        """Render the stats as a Server-Timing header value"""
+        return ', '.join([
+            f'total;dur={self.total * 1000:.1f}',
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.db_count} queries"',
+            f'es;dur={self.es_time * 1000:.1f};desc="{self.es_count} calls"',
+            f'cache;desc="{self.cache_hits} hits {self.cache_misses} misses"',
+            f'render;dur={self.render_time * 1000:.1f}',
+        ])
+
+    def observe(self, endpoint, method):
+        """Fold the stats into the per-endpoint histograms"""
+        REQUEST_DURATION.observe(self.total, endpoint=endpoint, method=method)
+        DB_DURATION.observe(self.db_time, endpoint=endpoint, method=method)
+        DB_QUERIES.observe(self.db_count, endpoint=endpoint, method=method)
+        ES_DURATION.observe(self.es_time, endpoint=endpoint, method=method)
+        RENDER_DURATION.observe(self.render_time, endpoint=endpoint, method=method)
+        if self.cache_hits:
+            CACHE_LOOKUPS.inc(self.cache_hits, endpoint=endpoint, result='hit')
+        if self.cache_misses:
+            CACHE_LOOKUPS.inc(self.cache_misses, endpoint=endpoint, result='miss')
+
+
+def current_stats():
+    """The RequestStats of the request being served, or None"""
+    return _current_stats.get()
+
+
+def start_request():
+    stats = RequestStats()
+    return stats, _current_stats.set(stats)
+
+
+def end_request(token):
+    _current_stats.reset(token)
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrapper hook timing every query"""
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        stats.db_count += 1
+        stats.db_time += duration
+        stats.queries.append((sql, duration, context['connection'].alias))
+
+
+@contextmanager
+def track_es():
+    """Time an Elasticsearch call against the current request"""
+    stats = _current_stats.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.es_count += 1
+            stats.es_time += time.perf_counter() - started
+
+
+def record_cache_lookup(hit):
+    """Count a cache hit or miss against the current request"""
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    if hit:
+        stats.cache_hits += 1
+    else:
+        stats.cache_misses += 1
@@ -0,0 +1,54 @@
+"""
+Cached job summaries for rendering applications.
+
+Applications only reference their job. The title, company name and URL
+shown next to them are read through this cache with one ``get_many`` per
+page, falling back to a single query for the misses. Job and company saves
+drop the affected entries. Applications whose job was deleted carry a
+``job_snapshot`` instead.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+KEY = 'job-summary:{id}'
+
+
+def _key(job_id):
+    return KEY.format(id=job_id)
+
+
+def make_summary(title, company_name, job_url):
+    return {'job_title': title, 'company_name': company_name, 'job_url': job_url}
+
+
+def get_job_summaries(job_ids):
+    """Map each job id to its summary, ids of deleted jobs are left out"""
+    job_ids = {job_id for job_id in job_ids if job_id is not None}
+    if not job_ids:
+        return {}
+    cached = cache.get_many([_key(job_id) for job_id in job_ids])
+    summaries = {job_id: cached[_key(job_id)] for job_id in job_ids if _key(job_id) in cached}
+
+    missing = job_ids - summaries.keys()
+    if missing:
+        from .models import Job
+
+        loaded = {
+            job_id: make_summary(title, company_name, url)
+            for job_id, title, company_name, url in Job.objects.filter(id__in=missing).values_list(
+                'id', 'title', 'company__name', 'application_url')
+        }
+        cache.set_many({_key(job_id): summary for job_id, summary in loaded.items()},
+                       settings.JOB_SUMMARY_CACHE_SECONDS)
+        summaries.update(loaded)
+    return summaries
+
+
+def invalidate_job_summaries(job_ids):
+    cache.delete_many([_key(job_id) for job_id in job_ids])
+
+
+def application_job_fields(application, summaries):
+    """The job fields shown for an application: live, or its deletion snapshot"""
+    summary = summaries.get(application.job_id) or application.job_snapshot
+    return summary or make_summary(None, None, None)
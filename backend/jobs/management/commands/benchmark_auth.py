@@ -0,0 +1,118 @@
+import json
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from jobs.auth import decode_jwt_token, generate_jwt_token, require_authentication, require_ownership_or_admin, require_role
+from jobs.authentication import JWTAuthentication
+from jobs.benchmarking import BENCHMARK_EMAIL_DOMAIN, environment_info, percentile
+from jobs.models import Applicant
+from jobs.permissions import DeclaredAccess
+from jobs.token_cache import verified_tokens
+
+
+# Each scenario authenticates a fresh request and checks the declared rules,
+# which is what every request pays before reaching the view
+SCENARIOS = {
+    'decode': None,
+    'require_authentication': [require_authentication],
+    'require_role': [require_role('applicant')],
+    'require_ownership_or_admin': [require_ownership_or_admin('applicant', 'applicant_id')],
+    'stacked': [require_authentication, require_role('applicant'),
+                require_ownership_or_admin('applicant', 'applicant_id')],
+}
+
+
+def _declared(decorators):
+    def handler(view, request, **kwargs):
+        return None
+
+    for decorator in reversed(decorators):
+        handler = decorator(handler)
+    return handler
+
+
+class Command(BaseCommand):
+    help = 'Measure the per request cost of authentication and access rules with and without the verified token cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000, help='Measured calls per scenario and mode')
+        parser.add_argument('--warmup', type=int, default=200, help='Unmeasured calls per scenario and mode')
+        parser.add_argument('--tokens', type=int, default=1,
+                            help='Distinct tokens cycled through, as sent by that many clients')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        applicant = (
+            Applicant.objects.select_related('user')
+            .filter(user__email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}').first()
+        )
+        if applicant is None:
+            raise CommandError('No benchmark data found, run seed_benchmark_data first')
+
+        factory = RequestFactory()
+        tokens = [generate_jwt_token(applicant.user, applicant_id=applicant.id) for _ in range(options['tokens'])]
+        requests = [factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}') for token in tokens]
+
+        report = {
+            'environment': environment_info(),
+            'config': {
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+                'tokens': options['tokens'],
+                'cache_size': verified_tokens.maxsize,
+            },
+            'results': {},
+        }
+        cache_size = verified_tokens.maxsize
+        try:
+            for mode, size in (('uncached', 0), ('cached', cache_size)):
+                verified_tokens.maxsize = size
+                verified_tokens.clear()
+                report['results'][mode] = {
+                    name: self.run_scenario(decorators, tokens, requests, applicant.id, options)
+                    for name, decorators in SCENARIOS.items()
+                }
+        finally:
+            verified_tokens.maxsize = cache_size
+            verified_tokens.clear()
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+            self.stderr.write(f'Wrote {options["output"]}')
+        else:
+            self.stdout.write(output)
+
+    def run_scenario(self, decorators, tokens, requests, applicant_id, options):
+        if decorators is None:
+            def call(index):
+                return decode_jwt_token(tokens[index % len(tokens)]) is not None
+        else:
+            view = SimpleNamespace(get=_declared(decorators), kwargs={'applicant_id': applicant_id})
+            authenticators = [JWTAuthentication()]
+            permission = DeclaredAccess()
+
+            def call(index):
+                request = Request(requests[index % len(requests)], authenticators=authenticators)
+                return permission.has_permission(request, view)
+
+        for index in range(options['warmup']):
+            if not call(index):
+                raise CommandError('Benchmark token was rejected')
+
+        timings = []
+        for index in range(options['iterations']):
+            started = time.perf_counter()
+            call(index)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        return {
+            'mean_us': round(sum(timings) / len(timings) * 1e6, 3),
+            'p50_us': round(percentile(timings, 0.50) * 1e6, 3),
+            'p99_us': round(percentile(timings, 0.99) * 1e6, 3),
+        }
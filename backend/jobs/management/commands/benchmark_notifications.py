@@ -0,0 +1,76 @@
+import json
+import os
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from jobs.benchmarking import BENCHMARK_EMAIL_DOMAIN, environment_info
+from jobs.models import JobApplication, NotificationEvent, User
+from jobs.notifications import FileSink, fan_out
+
+STATUSES = ['applied', 'interview', 'offered', 'rejected']
+
+
+class Command(BaseCommand):
+    help = 'Change application statuses in a burst and measure how the notification fan-out delivers them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--changes', type=int, default=10000, help='Status changes made in the burst')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--sink-path', help='File the digests are written to, a temporary file by default')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        applications = list(
+            JobApplication.objects.filter(applicant__user__email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}')
+            .exclude(job=None)
+        )
+        if not applications:
+            raise CommandError('No benchmark data found, run seed_benchmark_data first')
+        recipient_ids = list(
+            User.objects.filter(email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}').values_list('id', flat=True)
+        )
+        # Only the benchmark users' events are delivered, drop leftovers of
+        # an aborted run so they do not skew the counts
+        NotificationEvent.objects.filter(recipient_id__in=recipient_ids).delete()
+
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+        with transaction.atomic():
+            for _ in range(options['changes']):
+                application = rng.choice(applications)
+                application.status = rng.choice([s for s in STATUSES if s != application.status])
+                application.save(update_fields=['status'])
+        burst_seconds = time.perf_counter() - started
+        events = NotificationEvent.objects.filter(recipient_id__in=recipient_ids).count()
+
+        sink_path = options['sink_path']
+        if sink_path is None:
+            handle, sink_path = tempfile.mkstemp(prefix='notifications-', suffix='.jsonl')
+            os.close(handle)
+        started = time.perf_counter()
+        stats = fan_out(recipient_ids=recipient_ids, sinks=[FileSink('file', path=sink_path)])
+        fan_out_seconds = time.perf_counter() - started
+
+        report = {
+            'environment': environment_info(),
+            'config': {'changes': options['changes'], 'applications': len(applications), 'seed': options['seed']},
+            'results': {
+                'burst_seconds': round(burst_seconds, 3),
+                'events': events,
+                'digests': stats['file']['digests'],
+                'fan_out_seconds': round(fan_out_seconds, 3),
+                'sinks': stats,
+                'sink_path': sink_path,
+            },
+        }
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+            self.stderr.write(f'Wrote {options["output"]}')
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from jobs.geo import geocode
+from jobs.models import Job
+from jobs.outbox import publish
+
+
+class Command(BaseCommand):
+    help = 'Resolve job coordinates from their location against the bundled gazetteer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-geocode jobs that already have coordinates')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        queryset = Job.objects.only('id', 'location', 'latitude', 'longitude').order_by('pk')
+        if not options['all']:
+            queryset = queryset.filter(latitude__isnull=True)
+
+        updated = unresolved = 0
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            changed = []
+            for job in batch:
+                point = geocode(job.location) or (None, None)
+                if point[0] is None:
+                    unresolved += 1
+                if point != (job.latitude, job.longitude):
+                    job.latitude, job.longitude = point
+                    changed.append(job)
+
+            # bulk_update skips post_save, publish the re-index explicitly
+            with transaction.atomic():
+                Job.objects.bulk_update(changed, ['latitude', 'longitude'])
+                if changed:
+                    publish('job.sync', [job.pk for job in changed])
+            updated += len(changed)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {updated} jobs, {unresolved} locations not found in the gazetteer'
+        ))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from jobs.salary import rebuild_salary_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the salary distribution table from all jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        cells = rebuild_salary_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {cells} salary histogram cells in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,150 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django_elasticsearch_dsl.registries import registry
+from elasticsearch.helpers import bulk
+from elasticsearch_dsl import connections as es_connections
+
+from jobs.db import close_connections_for_fork
+from jobs.indexing import REBUILD_VERSION, clear_rebuild_target, set_rebuild_target
+
+
+def _document_for(alias):
+    for document in registry.get_documents():
+        if document._index._name == alias:
+            return document
+    raise CommandError(f'No search document uses the index alias "{alias}"')
+
+
+def _init_worker():
+    # Forked workers must not reuse the parent's database or HTTP sockets.
+    close_connections_for_fork()
+    es_connections.create_connection('default', **settings.ELASTICSEARCH_DSL['default'])
+
+
+def _index_slice(alias, index_name, start_id, end_id, chunk_size):
+    """Bulk load the rows with start_id <= id < end_id into index_name"""
+    document = _document_for(alias)()
+    queryset = document.get_queryset().filter(pk__gte=start_id, pk__lt=end_id).order_by('pk')
+
+    def actions():
+        for instance in queryset.iterator(chunk_size=chunk_size):
+            action = document._prepare_action(instance, 'index')
+            action.update(_index=index_name, _version=REBUILD_VERSION, _version_type='external_gte')
+            yield action
+
+    indexed, errors = bulk(
+        document._get_connection(), actions(), chunk_size=chunk_size,
+        raise_on_error=False, stats_only=False,
+    )
+    # A 409 means a live change reached the new index first, which is newer.
+    failures = [item for item in errors if next(iter(item.values())).get('status') != 409]
+    return indexed, len(failures)
+
+
+class Command(BaseCommand):
+    help = ('Build a new versioned search index from the database in parallel id-range '
+            'slices, then atomically point the alias at it')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='jobs', help='Index alias used by the search document')
+        parser.add_argument('--workers', type=int, default=4, help='Loader processes')
+        parser.add_argument('--slices', type=int, default=None, help='Id-range slices, defaults to workers * 4')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Documents per bulk request')
+        parser.add_argument('--shards', type=int, default=settings.SEARCH_INDEX_SHARDS)
+        parser.add_argument('--replicas', type=int, default=settings.SEARCH_INDEX_REPLICAS)
+        parser.add_argument('--keep-old', action='store_true', help='Do not delete the previous index after the swap')
+
+    def handle(self, *args, **options):
+        alias = options['alias']
+        document_class = _document_for(alias)
+        document = document_class()
+        client = document._get_connection()
+        index_name = f'{alias}-{time.strftime("%Y%m%d%H%M%S", time.gmtime())}'
+
+        # Replicas and refreshes are pure overhead while bulk loading, both
+        # are restored right before the swap.
+        index = document_class._index.clone(name=index_name)
+        index.settings(
+            number_of_shards=options['shards'],
+            number_of_replicas=0,
+            refresh_interval='-1',
+        )
+        index.create()
+        self.stdout.write(f'Created {index_name} ({options["shards"]} shards)')
+
+        set_rebuild_target(alias, index_name)
+        try:
+            started = time.perf_counter()
+            indexed, failed = self.load(alias, index_name, document, options)
+            elapsed = time.perf_counter() - started
+            if failed:
+                raise CommandError(f'{failed} documents failed to index, {alias} left unchanged')
+
+            client.indices.put_settings(index=index_name, settings={
+                'index': {'number_of_replicas': options['replicas'], 'refresh_interval': None},
+            })
+            client.indices.refresh(index=index_name)
+            client.cluster.health(index=index_name, wait_for_status='yellow' if options['replicas'] else 'green',
+                                  timeout='5m')
+            old_indices = self.swap_alias(client, alias, index_name)
+        except BaseException:
+            clear_rebuild_target(alias)
+            client.indices.delete(index=index_name, ignore_unavailable=True)
+            raise
+        clear_rebuild_target(alias)
+
+        if old_indices and not options['keep_old']:
+            client.indices.delete(index=','.join(old_indices), ignore_unavailable=True)
+
+        rate = indexed / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {indexed} documents in {elapsed:.1f}s ({rate:.0f} docs/sec), '
+            f'{alias} -> {index_name}'
+        ))
+
+    def load(self, alias, index_name, document, options):
+        bounds = document.get_queryset().aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            return 0, 0
+
+        slices = options['slices'] or options['workers'] * 4
+        span = bounds['high'] - bounds['low'] + 1
+        step = max(-(-span // slices), 1)
+        ranges = [(start, min(start + step, bounds['high'] + 1))
+                  for start in range(bounds['low'], bounds['high'] + 1, step)]
+
+        # Pools included: the workers are forked from this process
+        close_connections_for_fork()
+        indexed = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker,
+                                 mp_context=multiprocessing.get_context('fork')) as executor:
+            futures = [
+                executor.submit(_index_slice, alias, index_name, start, end, options['chunk_size'])
+                for start, end in ranges
+            ]
+            for number, future in enumerate(futures, 1):
+                slice_indexed, slice_failed = future.result()
+                indexed += slice_indexed
+                failed += slice_failed
+                self.stdout.write(f'  slice {number}/{len(ranges)}: {slice_indexed} documents')
+        return indexed, failed
+
+    def swap_alias(self, client, alias, index_name):
+        """Point alias at index_name in one atomic request, returns replaced indices"""
+        actions = []
+        old_indices = []
+        if client.indices.exists_alias(name=alias):
+            old_indices = list(client.indices.get_alias(name=alias).keys())
+            actions += [{'remove': {'index': old, 'alias': alias}} for old in old_indices]
+        elif client.indices.exists(index=alias):
+            # A concrete index created before aliases were used, it is removed
+            # in the same atomic request that creates the alias.
+            actions.append({'remove_index': {'index': alias}})
+        actions.append({'add': {'index': index_name, 'alias': alias}})
+        client.indices.update_aliases(actions=actions)
+        return old_indices
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from jobs.counters import recount_applications
+
+
+class Command(BaseCommand):
+    help = 'Recompute the application counters stored on every job'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Jobs updated per transaction')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        updated = recount_applications(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Recounted applications for {updated} jobs in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from jobs.outbox import drain_outbox, requeue_failed
+
+
+class Command(BaseCommand):
+    help = 'Drain the transactional outbox to the search indexer, optionally forever'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting when empty')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--requeue-failed', action='store_true',
+                            help='Retry dead-lettered events before draining')
+        parser.add_argument('--topic', help='Only requeue dead-lettered events of this topic')
+
+    def handle(self, *args, **options):
+        if options['requeue_failed']:
+            requeued = requeue_failed(options['topic'])
+            self.stdout.write(f'Requeued {requeued} dead-lettered events')
+        while True:
+            started = time.perf_counter()
+            handled = drain_outbox(batch_size=options['batch_size'])
+            if handled:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'Relayed {handled} events in {elapsed:.2f}s ({handled / elapsed:.0f}/s)')
+            if not options['loop']:
+                break
+            if not handled:
+                time.sleep(options['interval'])
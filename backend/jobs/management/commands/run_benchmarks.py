@@ -0,0 +1,198 @@
+import json
+import random
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.test import Client, override_settings
+
+from jobs.benchmarking import (
+    BENCHMARK_EMAIL_DOMAIN, BENCHMARK_PASSWORD, environment_info, run_concurrently,
+)
+from jobs.models import Applicant, Job
+
+SCENARIOS = ['list', 'detail', 'search', 'login', 'apply']
+SEARCH_TERMS = ['python', 'react remote', 'data', 'devops kubernetes', 'berlin', 'engineer']
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class InProcessTransport:
+    """Drives the Django stack through the test client, no sockets involved"""
+
+    name = 'inprocess'
+
+    def make_state(self):
+        return Client(HTTP_HOST='localhost')
+
+    def get(self, client, path, headers=None):
+        return client.get(path, headers=headers or {}).status_code
+
+    def post(self, client, path, payload, headers=None):
+        response = client.post(path, data=payload, content_type='application/json', headers=headers or {})
+        return response.status_code, response
+
+    def token_from(self, response):
+        return response.json().get('token')
+
+    def close(self):
+        pass
+
+
+class HTTPTransport:
+    """Drives a threaded WSGI server on an ephemeral local port"""
+
+    name = 'http'
+
+    def __init__(self):
+        self.server = ThreadedWSGIServer(('127.0.0.1', 0), QuietRequestHandler, allow_reuse_address=True)
+        self.server.set_app(get_wsgi_application())
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def make_state(self):
+        return None
+
+    def _send(self, request):
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read()
+
+    def get(self, state, path, headers=None):
+        return self._send(urllib.request.Request(self.base_url + path, headers=headers or {}))[0]
+
+    def post(self, state, path, payload, headers=None):
+        request = urllib.request.Request(
+            self.base_url + path, data=json.dumps(payload).encode(), method='POST',
+            headers={'Content-Type': 'application/json', **(headers or {})},
+        )
+        return self._send(request)
+
+    def token_from(self, response):
+        return json.loads(response).get('token')
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the API endpoints in-process and over local HTTP, printing JSON results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['inprocess', 'http', 'both'], default='both')
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                            help=f'Comma separated subset of: {", ".join(SCENARIOS)}')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per scenario')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests per scenario')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+
+        job_ids = list(Job.objects.values_list('id', flat=True))
+        applicants = list(
+            Applicant.objects.filter(user__email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}')
+            .values_list('id', 'user__email')
+        )
+        if not job_ids or not applicants:
+            raise CommandError('No benchmark data found, run seed_benchmark_data first')
+
+        self.rng = random.Random(options['seed'])
+        self.job_ids = job_ids
+        self.applicants = applicants
+
+        modes = ['inprocess', 'http'] if options['mode'] == 'both' else [options['mode']]
+        report = {
+            'environment': environment_info(),
+            'config': {
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'warmup': options['warmup'],
+                'seed': options['seed'],
+            },
+            'dataset': {'jobs': len(job_ids), 'applicants': len(applicants)},
+            'results': {},
+        }
+
+        # The login scenario hammers one account, which the credential
+        # throttles would otherwise cut off after a handful of requests
+        with override_settings(AUTH_THROTTLE_RATES={}):
+            for mode in modes:
+                transport = InProcessTransport() if mode == 'inprocess' else HTTPTransport()
+                try:
+                    token = self.login(transport)
+                    report['results'][mode] = {
+                        name: self.run_scenario(transport, name, token, options)
+                        for name in scenarios
+                    }
+                finally:
+                    transport.close()
+                    connections.close_all()
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+            self.stderr.write(f'Wrote {options["output"]}')
+        else:
+            self.stdout.write(output)
+
+    def login(self, transport):
+        _, email = self.applicants[0]
+        status_code, response = transport.post(
+            transport.make_state(), '/api/auth/login/', {'email': email, 'password': BENCHMARK_PASSWORD})
+        if status_code != 200:
+            raise CommandError(f'Benchmark login failed with status {status_code}')
+        return transport.token_from(response)
+
+    def build_call(self, transport, name, token):
+        # Inputs are drawn up front so the random generator is not shared
+        # between worker threads.
+        auth = {'Authorization': f'Bearer {token}'}
+        job_ids = [self.rng.choice(self.job_ids) for _ in range(4096)]
+        terms = [self.rng.choice(SEARCH_TERMS) for _ in range(4096)]
+        applicants = [self.rng.choice(self.applicants) for _ in range(4096)]
+
+        if name == 'list':
+            return lambda state, i: transport.get(state, '/api/jobs/')
+        if name == 'detail':
+            return lambda state, i: transport.get(state, f'/api/jobs/{job_ids[i % 4096]}/')
+        if name == 'search':
+            return lambda state, i: transport.get(
+                state, '/api/jobs/search/?q=' + urllib.parse.quote(terms[i % 4096]))
+        if name == 'login':
+            return lambda state, i: transport.post(
+                state, '/api/auth/login/',
+                {'email': applicants[i % 4096][1], 'password': BENCHMARK_PASSWORD})[0]
+        if name == 'apply':
+            applicant_id = self.applicants[0][0]
+            return lambda state, i: transport.post(
+                state, '/api/applications/',
+                {'applicant_id': applicant_id, 'job_id': job_ids[i % 4096], 'status': 'applied'},
+                headers=auth)[0]
+        raise CommandError(f'Unknown scenario {name}')
+
+    def run_scenario(self, transport, name, token, options):
+        call = self.build_call(transport, name, token)
+        if options['warmup']:
+            run_concurrently(call, options['warmup'], 1, transport.make_state)
+        self.stderr.write(f'[{transport.name}] {name}: {options["requests"]} requests '
+                          f'at concurrency {options["concurrency"]}')
+        return run_concurrently(call, options['requests'], options['concurrency'], transport.make_state)
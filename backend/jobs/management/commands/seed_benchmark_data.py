@@ -0,0 +1,129 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from jobs.auth import hash_password
+from jobs.benchmarking import BENCHMARK_EMAIL_DOMAIN, BENCHMARK_PASSWORD
+from jobs.models import Applicant, Company, Experience, Job, JobApplication, User
+from jobs.counters import recount_applications
+from jobs.outbox import publish
+from jobs.rollups import rebuild_rollups
+from jobs.salary import rebuild_salary_stats
+
+TITLES = ['Backend Engineer', 'Frontend Developer', 'Data Scientist', 'DevOps Engineer',
+          'Product Manager', 'QA Engineer', 'Mobile Developer', 'Site Reliability Engineer']
+SKILLS = ['python', 'django', 'react', 'vue', 'postgres', 'kubernetes', 'aws', 'go',
+          'typescript', 'elasticsearch', 'redis', 'celery', 'docker', 'java', 'kotlin']
+LOCATIONS = ['Cairo', 'Alexandria', 'Berlin', 'London', 'Remote', 'Dubai', 'Amsterdam', 'Paris']
+INDUSTRIES = ['Software', 'Fintech', 'E-commerce', 'Healthcare', 'Education', 'Logistics']
+STATUSES = ['applied', 'interview', 'offered', 'rejected']
+JOB_TYPES = ['full_time', 'part_time', 'internship']
+
+
+def _derived(job):
+    # bulk_create bypasses Job.save, which normally fills these in
+    job.derive_fields()
+    return job
+
+
+class Command(BaseCommand):
+    help = 'Seed synthetic companies, jobs, applicants, applications and experiences with bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--companies', type=int, default=50)
+        parser.add_argument('--jobs-per-company', type=int, default=20)
+        parser.add_argument('--applicants', type=int, default=1000)
+        parser.add_argument('--applications-per-applicant', type=int, default=5)
+        parser.add_argument('--experiences-per-applicant', type=int, default=2)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, keeps datasets identical across runs')
+        parser.add_argument('--flush', action='store_true', help='Delete previously seeded benchmark data first')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+
+        if options['flush']:
+            deleted, _ = User.objects.filter(email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}').delete()
+            self.stdout.write(f'Deleted {deleted} rows of previous benchmark data')
+
+        # Hashing once is enough, every benchmark user shares the password.
+        password_hash = hash_password(BENCHMARK_PASSWORD)
+
+        with transaction.atomic():
+            # Numbering continues after earlier runs, seeding again without
+            # --flush adds users instead of clashing on their emails
+            seeded = User.objects.filter(email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}')
+            first_company = seeded.filter(role='company').count()
+            first_applicant = seeded.filter(role='applicant').count()
+
+            company_users = User.objects.bulk_create([
+                User(email=f'company-{i}@{BENCHMARK_EMAIL_DOMAIN}', password_hash=password_hash,
+                     role='company', name=f'Bench Company {i}')
+                for i in range(first_company, first_company + options['companies'])
+            ], batch_size=batch_size)
+            companies = Company.objects.bulk_create([
+                Company(user=user, name=user.name, industry=rng.choice(INDUSTRIES),
+                        brief=f'{user.name} builds things.', website=f'https://company-{i}.{BENCHMARK_EMAIL_DOMAIN}')
+                for i, user in enumerate(company_users, first_company)
+            ], batch_size=batch_size)
+
+            jobs = Job.objects.bulk_create([
+                _derived(Job(company=company, title=rng.choice(TITLES),
+                    description=f'Work on {", ".join(rng.sample(SKILLS, 4))} at {company.name}.',
+                    location=rng.choice(LOCATIONS),
+                    application_url=f'https://company-{company.id}.{BENCHMARK_EMAIL_DOMAIN}/jobs/{n}',
+                    salary=Decimal(rng.randrange(20_000, 200_000, 500)),
+                    skills=', '.join(rng.sample(SKILLS, 5)),
+                    status=rng.choice(['open', 'open', 'open', 'closed']),
+                    job_type=rng.choice(JOB_TYPES)))
+                for company in companies
+                for n in range(options['jobs_per_company'])
+            ], batch_size=batch_size)
+
+            applicant_users = User.objects.bulk_create([
+                User(email=f'applicant-{i}@{BENCHMARK_EMAIL_DOMAIN}', password_hash=password_hash,
+                     role='applicant', name=f'Bench Applicant {i}')
+                for i in range(first_applicant, first_applicant + options['applicants'])
+            ], batch_size=batch_size)
+            applicants = Applicant.objects.bulk_create([
+                Applicant(user=user, skills=', '.join(rng.sample(SKILLS, 4)))
+                for user in applicant_users
+            ], batch_size=batch_size)
+
+            today = date.today()
+            experiences = []
+            for applicant in applicants:
+                for n in range(options['experiences_per_applicant']):
+                    start = today - timedelta(days=rng.randrange(365, 365 * 10))
+                    experiences.append(Experience(
+                        applicant=applicant, company_name=f'Previous Corp {rng.randrange(500)}',
+                        job_title=rng.choice(TITLES), start_date=start,
+                        end_date=start + timedelta(days=rng.randrange(90, 365 * 3)),
+                        description='Shipped features.', skills=', '.join(rng.sample(SKILLS, 3))))
+            Experience.objects.bulk_create(experiences, batch_size=batch_size)
+
+            applications = []
+            per_applicant = min(options['applications_per_applicant'], len(jobs))
+            for applicant in applicants:
+                for job in rng.sample(jobs, per_applicant):
+                    applications.append(JobApplication(applicant=applicant, job=job, status=rng.choice(STATUSES)))
+            JobApplication.objects.bulk_create(applications, batch_size=batch_size)
+
+            # bulk_create skips the post_save receivers writing the outbox,
+            # record the index events here so search sees the seeded rows
+            publish('job.sync', [job.id for job in jobs])
+            publish('applicant.sync', [applicant.id for applicant in applicants])
+
+        # The aggregates are maintained by signals, which bulk_create skips
+        rebuild_salary_stats()
+        rebuild_rollups()
+        recount_applications()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(companies)} companies, {len(jobs)} jobs, {len(applicants)} applicants, '
+            f'{len(experiences)} experiences and {len(applications)} applications'
+        ))
@@ -0,0 +1,198 @@
+"""
+Process-local metrics rendered in the Prometheus text exposition format.
+
+Collectors are callables returning an iterable of ``MetricFamily`` objects.
+They are evaluated on every scrape of ``/metrics`` so gauges always reflect
+the current state of the process.
+
+``/metrics`` answers only scrapers presenting ``METRICS_TOKEN`` as a Bearer
+token or connecting from an address in ``METRICS_ALLOWED_IPS``; everybody
+else gets a 404. With neither setting the endpoint is off.
+"""
+import hmac
+import threading
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+from .db import pool_stats
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_collectors = []
+
+
+class MetricFamily:
+    """A named metric with a type, help text and labelled samples"""
+
+    def __init__(self, name, metric_type, documentation):
+        self.name = name
+        self.metric_type = metric_type
+        self.documentation = documentation
+        self.samples = []
+
+    def add(self, value, labels=None, suffix=''):
+        self.samples.append((suffix, labels or {}, value))
+        return self
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.metric_type}',
+        ]
+        for suffix, labels, value in self.samples:
+            lines.append(f'{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    body = ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return '{' + body + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        register_collector(self.collect)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        family = MetricFamily(self.name, 'counter', self.documentation)
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                family.add(value, dict(zip(self.labelnames, key)))
+        return [family]
+
+
+class Histogram:
+    """Cumulative bucketed histogram with a fixed set of label names"""
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}
+        self._lock = threading.Lock()
+        register_collector(self.collect)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][index] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def collect(self):
+        family = MetricFamily(self.name, 'histogram', self.documentation)
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, count in zip(self.buckets, series['buckets']):
+                    cumulative += count
+                    family.add(cumulative, {**labels, 'le': _format_value(float(bound))}, '_bucket')
+                family.add(series['sum'], labels, '_sum')
+                family.add(series['count'], labels, '_count')
+        return [family]
+
+
+def register_collector(collector):
+    """Register a callable that yields MetricFamily objects on each scrape"""
+    if collector not in _collectors:
+        _collectors.append(collector)
+    return collector
+
+
+def render_metrics():
+    """Render every registered collector as Prometheus text"""
+    blocks = []
+    for collector in _collectors:
+        for family in collector():
+            blocks.append(family.render())
+    return '\n'.join(blocks) + '\n'
+
+
+def scrape_allowed(request):
+    """Whether the caller may read ``/metrics``"""
+    token = settings.METRICS_TOKEN
+    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and hmac.compare_digest(auth_header.encode(), f'Bearer {token}'.encode()):
+        return True
+    # The direct peer, never a forwarded header a client could set
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint"""
+    if not scrape_allowed(request):
+        # Not advertised to callers who may not scrape it
+        raise Http404
+    return HttpResponse(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@register_collector
+def collect_db_pool():
+    """Pool size, saturation and wait time for every psycopg pool"""
+    stats = pool_stats()
+    if not stats:
+        return []
+
+    size = MetricFamily('jobs_db_pool_size', 'gauge', 'Connections currently held by the pool')
+    available = MetricFamily('jobs_db_pool_available', 'gauge', 'Idle connections ready to be handed out')
+    max_size = MetricFamily('jobs_db_pool_max_size', 'gauge', 'Configured maximum pool size')
+    waiting = MetricFamily('jobs_db_pool_requests_waiting', 'gauge', 'Requests currently queued for a connection')
+    saturation = MetricFamily('jobs_db_pool_saturation', 'gauge', 'Fraction of max_size checked out by requests')
+    requests = MetricFamily('jobs_db_pool_requests_total', 'counter', 'Connection requests served by the pool')
+    queued = MetricFamily('jobs_db_pool_requests_queued_total', 'counter', 'Connection requests that had to wait')
+    wait = MetricFamily('jobs_db_pool_wait_seconds_total', 'counter', 'Time spent waiting for a pooled connection')
+    errors = MetricFamily('jobs_db_pool_errors_total', 'counter', 'Connection requests that timed out or failed')
+
+    for alias, values in stats.items():
+        labels = {'alias': alias}
+        pool_size = values.get('pool_size', 0)
+        pool_available = values.get('pool_available', 0)
+        pool_max = values.get('pool_max', 0)
+        size.add(pool_size, labels)
+        available.add(pool_available, labels)
+        max_size.add(pool_max, labels)
+        waiting.add(values.get('requests_waiting', 0), labels)
+        saturation.add((pool_size - pool_available) / pool_max if pool_max else 0.0, labels)
+        requests.add(values.get('requests_num', 0), labels)
+        queued.add(values.get('requests_queued', 0), labels)
+        wait.add(values.get('requests_wait_ms', 0) / 1000.0, labels)
+        errors.add(values.get('requests_errors', 0), labels)
+
+    return [size, available, max_size, waiting, saturation, requests, queued, wait, errors]
@@ -0,0 +1,131 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from .auth import decode_jwt_token
+from .db_router import enable_replica_reads, get_replicas, reset_replica_reads
+from .instrumentation import (
+    current_stats, db_execute_wrapper, end_request, record_cache_lookup, start_request,
+)
+
+logger = logging.getLogger('jobs.performance')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def endpoint_name(request):
+    """Low-cardinality label for the view that served a request"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.url_name or match.route or 'unnamed'
+
+
+class PerformanceMiddleware:
+    """Record where the time of every request goes.
+
+    Adds a ``Server-Timing`` header, feeds the per-endpoint histograms served
+    at ``/metrics`` and logs requests slower than
+    ``SLOW_REQUEST_THRESHOLD_MS`` together with the queries they ran.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats, token = start_request()
+        request.performance = stats
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(db_execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            end_request(token)
+
+        stats.finish()
+        endpoint = endpoint_name(request)
+        stats.observe(endpoint, request.method)
+        response['Server-Timing'] = stats.server_timing()
+
+        if stats.total * 1000 >= settings.SLOW_REQUEST_THRESHOLD_MS:
+            self.log_slow_request(request, endpoint, stats)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the last template-response hook,
+        # so timing starts here and stops in the post-render callback.
+        stats = current_stats()
+        if stats is not None:
+            started = time.perf_counter()
+
+            def finished(rendered):
+                stats.render_time += time.perf_counter() - started
+
+            response.add_post_render_callback(finished)
+        return response
+
+    def log_slow_request(self, request, endpoint, stats):
+        limit = settings.SLOW_REQUEST_LOG_QUERIES
+        query_lines = [
+            f'  [{alias}] {duration * 1000:.1f}ms {sql}'
+            for sql, duration, alias in stats.queries[:limit]
+        ]
+        if len(stats.queries) > limit:
+            query_lines.append(f'  ... {len(stats.queries) - limit} more')
+        logger.warning(
+            'Slow request %s %s (%s) %.1fms: %s\n%s',
+            request.method, request.path, endpoint, stats.total * 1000,
+            stats.server_timing(), '\n'.join(query_lines),
+        )
+
+
+def _sticky_cache_key(request):
+    """Identify the caller by JWT user id, falling back to the client address"""
+    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+    if auth_header.startswith('Bearer '):
+        payload = decode_jwt_token(auth_header.split(' ')[1])
+        if payload and 'user_id' in payload:
+            return f"replica-sticky:user:{payload['user_id']}"
+    return f"replica-sticky:addr:{request.META.get('REMOTE_ADDR', '')}"
+
+
+class ReplicaRoutingMiddleware:
+    """Send safe reads of list/detail views to a replica.
+
+    A successful write pins the caller to the primary for
+    ``REPLICA_STICKY_SECONDS`` so they always read their own writes even
+    while the replicas catch up.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._replica_token = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if request._replica_token is not None:
+                reset_replica_reads(request._replica_token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400 and get_replicas():
+            cache.set(_sticky_cache_key(request), True, settings.REPLICA_STICKY_SECONDS)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in SAFE_METHODS or not get_replicas():
+            return None
+        match = request.resolver_match
+        if match is None or match.url_name not in settings.REPLICA_ROUTED_VIEWS:
+            return None
+        sticky = cache.get(_sticky_cache_key(request))
+        record_cache_lookup(sticky is not None)
+        if sticky:
+            return None
+        request._replica_token = enable_replica_reads()
+        return None
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:26
+
+from django.db import migrations, models
+
+
+def backfill_annual_salary(apps, schema_editor):
+    # Existing salaries are read as yearly USD, the new field defaults.
+    # 0015 fills the histogram table from them.
+    Job = apps.get_model('jobs', 'Job')
+    Job.objects.update(salary_annual_min=models.F('salary'), salary_annual_max=models.F('salary'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0003_job_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='salary_annual_max',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=14, null=True),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='salary_annual_min',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=14, null=True),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='salary_currency',
+            field=models.CharField(default='USD', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='salary_max',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='salary_min',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='salary_period',
+            field=models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily'), ('week', 'Weekly'), ('month', 'Monthly'), ('year', 'Yearly')], default='year', max_length=16),
+        ),
+        migrations.CreateModel(
+            name='SalaryStatBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('title', 'Title'), ('skill', 'Skill'), ('location', 'Location')], max_length=16)),
+                ('value', models.CharField(max_length=255)),
+                ('bucket', models.IntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'value', 'bucket'), name='salary_stat_bucket_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_annual_salary, migrations.RunPython.noop),
+    ]
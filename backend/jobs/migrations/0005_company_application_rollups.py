@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    JobApplication = apps.get_model('jobs', 'JobApplication')
+    CompanyApplicationRollup = apps.get_model('jobs', 'CompanyApplicationRollup')
+    rows = (
+        JobApplication.objects.annotate(day=TruncDate('applied_at'))
+        .values('job__company_id', 'job_id', 'status', 'day')
+        .annotate(total=Count('id'))
+    )
+    CompanyApplicationRollup.objects.bulk_create([
+        CompanyApplicationRollup(company_id=row['job__company_id'], job_id=row['job_id'], status=row['status'],
+                                 day=row['day'], count=row['total'])
+        for row in rows
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0004_salary_ranges'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanyApplicationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=50)),
+                ('day', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='application_rollups', to='jobs.company')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='application_rollups', to='jobs.job')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('company', 'job', 'status', 'day'), name='company_rollup_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:31
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Job = apps.get_model('jobs', 'Job')
+    JobApplication = apps.get_model('jobs', 'JobApplication')
+
+    def count(status=None):
+        applications = JobApplication.objects.filter(job=OuterRef('pk'))
+        if status is not None:
+            applications = applications.filter(status=status)
+        counted = applications.order_by().values('job').annotate(total=Count('pk')).values('total')
+        return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+    Job.objects.update(
+        applications_count=count(),
+        applied_count=count('applied'),
+        interview_count=count('interview'),
+        offered_count=count('offered'),
+        rejected_count=count('rejected'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0005_company_application_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='applications_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='applied_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='interview_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='offered_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='rejected_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['-applications_count', '-id'], name='job_popularity_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:34
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Min, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def remove_duplicate_applications(apps, schema_editor):
+    """Keep the first application per applicant and job, then repair aggregates"""
+    Job = apps.get_model('jobs', 'Job')
+    JobApplication = apps.get_model('jobs', 'JobApplication')
+    CompanyApplicationRollup = apps.get_model('jobs', 'CompanyApplicationRollup')
+
+    duplicates = (
+        JobApplication.objects.values('applicant_id', 'job_id')
+        .annotate(first_id=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    job_ids = set()
+    for row in duplicates:
+        JobApplication.objects.filter(applicant_id=row['applicant_id'], job_id=row['job_id']).exclude(
+            id=row['first_id']).delete()
+        job_ids.add(row['job_id'])
+    if not job_ids:
+        return
+
+    # Historical models send no signals, fix the affected jobs' counters and
+    # dashboard rollups here.
+    def count(status=None):
+        applications = JobApplication.objects.filter(job=OuterRef('pk'))
+        if status is not None:
+            applications = applications.filter(status=status)
+        counted = applications.order_by().values('job').annotate(total=Count('pk')).values('total')
+        return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+    Job.objects.filter(pk__in=job_ids).update(
+        applications_count=count(),
+        applied_count=count('applied'),
+        interview_count=count('interview'),
+        offered_count=count('offered'),
+        rejected_count=count('rejected'),
+    )
+    CompanyApplicationRollup.objects.filter(job_id__in=job_ids).delete()
+    rows = (
+        JobApplication.objects.filter(job_id__in=job_ids).annotate(day=TruncDate('applied_at'))
+        .values('job__company_id', 'job_id', 'status', 'day')
+        .annotate(total=Count('id'))
+    )
+    CompanyApplicationRollup.objects.bulk_create([
+        CompanyApplicationRollup(company_id=row['job__company_id'], job_id=row['job_id'], status=row['status'],
+                                 day=row['day'], count=row['total'])
+        for row in rows
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0006_job_application_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=64)),
+                ('key', models.CharField(max_length=255)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('response_status', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('response_body', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.RunPython(remove_duplicate_applications, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='jobapplication',
+            constraint=models.UniqueConstraint(fields=('applicant', 'job'), name='unique_application_per_job'),
+        ),
+        migrations.AddConstraint(
+            model_name='idempotencykey',
+            constraint=models.UniqueConstraint(fields=('scope', 'key'), name='idempotency_key_unique'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0007_unique_applications_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='jobapplication',
+            name='company_name',
+        ),
+        migrations.RemoveField(
+            model_name='jobapplication',
+            name='job_title',
+        ),
+        migrations.RemoveField(
+            model_name='jobapplication',
+            name='job_url',
+        ),
+        migrations.AddField(
+            model_name='jobapplication',
+            name='job_snapshot',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='jobapplication',
+            name='job',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='applications', to='jobs.job'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0013_outbox_retries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndexRebuild',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=255, unique=True)),
+                ('index_name', models.CharField(max_length=255)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,52 @@
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations
+
+
+# Copies of jobs.salary._clean and stat_keys as they were when this migration
+# was written, so later changes to the app code do not change what it does.
+# The bucket width still comes from settings: the cells have to match the
+# width the running app reads them with.
+def _clean(value):
+    return ' '.join((value or '').lower().split())[:255]
+
+
+def stat_keys(title, skills, location, annual_min, annual_max):
+    if annual_min is None:
+        return []
+    midpoint = (Decimal(annual_min) + Decimal(annual_max if annual_max is not None else annual_min)) / 2
+    bucket = int(midpoint // settings.SALARY_HISTOGRAM_BUCKET_WIDTH)
+    values = [('title', _clean(title)), ('location', _clean(location))]
+    values += [('skill', skill) for skill in sorted({_clean(s) for s in (skills or '').split(',')})]
+    return [(dimension, value, bucket) for dimension, value in values if value]
+
+
+def backfill_salary_stats(apps, schema_editor):
+    # 0004 created the table empty, count every job the way
+    # rebuild_salary_stats does. Cells filled by saves since then are
+    # recomputed along with the rest.
+    Job = apps.get_model('jobs', 'Job')
+    SalaryStatBucket = apps.get_model('jobs', 'SalaryStatBucket')
+    counts = Counter()
+    jobs = Job.objects.filter(salary_annual_min__isnull=False).values_list(
+        'title', 'skills', 'location', 'salary_annual_min', 'salary_annual_max')
+    for row in jobs.iterator(chunk_size=2000):
+        counts.update(stat_keys(*row))
+    SalaryStatBucket.objects.all().delete()
+    SalaryStatBucket.objects.bulk_create([
+        SalaryStatBucket(dimension=dimension, value=value, bucket=bucket, count=count)
+        for (dimension, value, bucket), count in counts.items()
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0014_search_index_rebuilds'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_salary_stats, migrations.RunPython.noop),
+    ]
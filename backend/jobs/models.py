@@ -1,17 +1,28 @@
-from django.db import models
-from django.db.models.signals import post_save, post_delete
+from django.db import models, transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
 from django.dispatch import receiver
-from .tasks import update_search_index
+from .geo import geocode
+from .job_summaries import invalidate_job_summaries, make_summary
+from .counters import COUNTER_FIELDS, apply_counter_changes
+from .rollups import apply_rollup_changes, rollup_key
+from .salary import PERIOD_CHOICES, annual_range, apply_stat_changes, job_stat_keys, stat_keys
 
 class User(models.Model):
     email = models.EmailField(unique=True)
     password_hash = models.CharField(max_length=128)
     role = models.CharField(max_length=50, choices=[('applicant', 'Applicant'), ('company', 'Company')])
     name = models.CharField(max_length=255)
+    # Embedded in every token, bumping it revokes all tokens issued before
+    token_version = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Keep the outbox event written by post_save in the same transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
 
 class Applicant(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -23,6 +34,11 @@ class Applicant(models.Model):
     def __str__(self):
         return self.user.name
 
+    def save(self, *args, **kwargs):
+        # Keep the outbox event written by post_save in the same transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
 
 class Company(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -35,6 +51,11 @@ class Company(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Keep the outbox event written by post_save in the same transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
 
 class Job(models.Model):
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name="jobs")
@@ -43,21 +64,128 @@ class Job(models.Model):
     location = models.CharField(max_length=255)
     application_url = models.URLField(max_length=255)
     salary = models.DecimalField(max_digits=10, decimal_places=2)
+    salary_min = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    salary_max = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    salary_currency = models.CharField(max_length=3, default='USD')
+    salary_period = models.CharField(max_length=16, choices=PERIOD_CHOICES, default='year')
+    # Yearly range in the base currency of jobs/data/exchange_rates.json
+    salary_annual_min = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True, editable=False)
+    salary_annual_max = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True, editable=False)
     skills = models.TextField()
     status = models.CharField(max_length=50, choices=[('open', 'Open'), ('closed', 'Closed')])
     job_type = models.CharField(max_length=50, choices=[('full_time', 'Full Time'), ('part_time', 'Part Time'), ('internship', 'Internship')])
     created_at = models.DateTimeField(auto_now_add=True)
+    # Resolved from location against the bundled gazetteer on save
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # Maintained by JobApplication signals, see jobs.counters
+    applications_count = models.IntegerField(default=0, editable=False)
+    applied_count = models.IntegerField(default=0, editable=False)
+    interview_count = models.IntegerField(default=0, editable=False)
+    offered_count = models.IntegerField(default=0, editable=False)
+    rejected_count = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Radius queries filter a bounding box on these before computing
+            # exact distances.
+            models.Index(fields=['latitude', 'longitude'], name='job_lat_lon_idx'),
+            models.Index(fields=['-applications_count', '-id'], name='job_popularity_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    SALARY_FIELDS = {'salary', 'salary_min', 'salary_max', 'salary_currency', 'salary_period'}
+
+    def derive_fields(self, update_fields=None):
+        """Fill in the fields computed from others, returns the ones changed"""
+        derived = set()
+        if update_fields is None or 'location' in update_fields:
+            self.latitude, self.longitude = geocode(self.location) or (None, None)
+            derived |= {'latitude', 'longitude'}
+        if update_fields is None or self.SALARY_FIELDS & set(update_fields):
+            self.salary_currency = (self.salary_currency or '').upper()
+            self.salary_annual_min, self.salary_annual_max = annual_range(self)
+            derived |= {'salary_currency', 'salary_annual_min', 'salary_annual_max'}
+        return derived
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding:
+            # Counters are changed by F() updates behind this instance's back,
+            # never write its possibly stale copies.
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in COUNTER_FIELDS
+            ]
+            kwargs['update_fields'] = update_fields
+        derived = self.derive_fields(update_fields)
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, *derived}
+        # post_save writes the outbox event, keep it in the same transaction
+        # as the row itself.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
 @receiver(post_save, sender=Job)
 def update_job_document(sender, instance, **kwargs):
-    update_search_index.delay(instance.id)
+    from .outbox import publish
+    publish('job.sync', [instance.id])
 
 @receiver(post_delete, sender=Job)
 def delete_job_document(sender, instance, **kwargs):
-    update_search_index.delay(instance.id, action='delete')
+    from .outbox import publish
+    publish('job.sync', [instance.id])
+
+@receiver(pre_save, sender=Job)
+def remember_salary_stat_keys(sender, instance, raw=False, using=None, **kwargs):
+    # The stored row, not the instance, says what the aggregates hold now
+    instance._previous_stat_keys = []
+    if raw or instance.pk is None:
+        return
+    previous = Job.objects.using(using).filter(pk=instance.pk).values_list(
+        'title', 'skills', 'location', 'salary_annual_min', 'salary_annual_max').first()
+    if previous:
+        instance._previous_stat_keys = stat_keys(*previous)
+
+@receiver(post_save, sender=Job)
+def update_salary_stats(sender, instance, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    apply_stat_changes(getattr(instance, '_previous_stat_keys', []), job_stat_keys(instance), using=using)
+
+@receiver(post_delete, sender=Job)
+def remove_salary_stats(sender, instance, using=None, **kwargs):
+    apply_stat_changes(job_stat_keys(instance), [], using=using)
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+def drop_job_summary(sender, instance, using=None, **kwargs):
+    transaction.on_commit(lambda: invalidate_job_summaries([instance.pk]), using=using)
+
+@receiver(pre_delete, sender=Job)
+def snapshot_job_for_applications(sender, instance, using=None, **kwargs):
+    # Applications outlive their job (SET_NULL), keep what they displayed
+    company_name = Company.objects.using(using).filter(pk=instance.company_id).values_list('name', flat=True).first()
+    JobApplication.objects.using(using).filter(job_id=instance.pk).update(
+        job_snapshot=make_summary(instance.title, company_name, instance.application_url))
+
+@receiver(post_save, sender=Company)
+def update_company_job_documents(sender, instance, created, **kwargs):
+    # A new company has no jobs yet. Deletes cascade to Job and are synced
+    # by its own post_delete.
+    if created:
+        return
+    from .outbox import publish
+    publish('company.sync', [instance.id])
+
+@receiver(post_save, sender=Company)
+def drop_company_job_summaries(sender, instance, created, using=None, **kwargs):
+    if created:
+        return
+    job_ids = list(Job.objects.using(using).filter(company_id=instance.pk).values_list('id', flat=True))
+    transaction.on_commit(lambda: invalidate_job_summaries(job_ids), using=using)
 
 class Experience(models.Model):
     applicant = models.ForeignKey(Applicant, on_delete=models.CASCADE, related_name="experiences")
@@ -71,15 +199,269 @@ class Experience(models.Model):
     def __str__(self):
         return f"{self.job_title} at {self.company_name}"
 
+    def save(self, *args, **kwargs):
+        # Keep the outbox event written by post_save in the same transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+@receiver(post_save, sender=Applicant)
+@receiver(post_delete, sender=Applicant)
+def update_applicant_document(sender, instance, using=None, **kwargs):
+    from .outbox import publish
+    publish('applicant.sync', [instance.id], using=using)
+
+@receiver(post_save, sender=Experience)
+@receiver(post_delete, sender=Experience)
+def update_experience_applicant_document(sender, instance, using=None, **kwargs):
+    from .outbox import publish
+    publish('applicant.sync', [instance.applicant_id], using=using)
+
+@receiver(post_save, sender=User)
+def update_user_applicant_document(sender, instance, created, using=None, **kwargs):
+    # The name is indexed with the profile. A new user has no profile yet,
+    # deletes cascade to Applicant and are synced by its own post_delete.
+    if created or instance.role != 'applicant':
+        return
+    applicant_id = Applicant.objects.using(using).filter(user_id=instance.pk).values_list('id', flat=True).first()
+    if applicant_id is not None:
+        from .outbox import publish
+        publish('applicant.sync', [applicant_id], using=using)
+
 
 class JobApplication(models.Model):
     applicant = models.ForeignKey(Applicant, on_delete=models.CASCADE, related_name="applications")
-    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name="applications")
-    company_name = models.CharField(max_length=255)
+    # Job details are read through jobs.job_summaries. When the job is
+    # deleted the application keeps a snapshot of them instead.
+    job = models.ForeignKey(Job, on_delete=models.SET_NULL, null=True, blank=True, related_name="applications")
     status = models.CharField(max_length=50, choices=[('applied', 'Applied'), ('interview', 'Interview'), ('offered', 'Offered'), ('rejected', 'Rejected')])
-    job_title = models.CharField(max_length=255)
-    job_url = models.URLField(max_length=255)    
     applied_at = models.DateTimeField(auto_now_add=True)
+    job_snapshot = models.JSONField(null=True, blank=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['applicant', 'job'], name='unique_application_per_job'),
+        ]
+
+    def __str__(self):
+        title = self.job.title if self.job_id else (self.job_snapshot or {}).get('job_title')
+        return f"{self.applicant.user.name} -> {title}"
+
+
+def _application_rollup_key(application):
+    if application.job_id is None:
+        return None
+    if 'job' in application._state.fields_cache:
+        company_id = application.job.company_id
+    else:
+        company_id = Job.objects.filter(pk=application.job_id).values_list('company_id', flat=True).first()
+    return rollup_key(company_id, application.job_id, application.status, application.applied_at)
+
+@receiver(pre_save, sender=JobApplication)
+def remember_previous_application(sender, instance, raw=False, using=None, **kwargs):
+    # The stored row says what the rollups and counters hold right now
+    instance._previous_application = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_application = JobApplication.objects.using(using).filter(pk=instance.pk).values_list(
+        'job__company_id', 'job_id', 'status', 'applied_at').first()
+
+@receiver(post_save, sender=JobApplication)
+def update_application_aggregates(sender, instance, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_application', None)
+    apply_rollup_changes(rollup_key(*previous) if previous else None, _application_rollup_key(instance),
+                         using=using)
+    apply_counter_changes(previous[1:3] if previous else None, (instance.job_id, instance.status), using=using)
+
+@receiver(post_delete, sender=JobApplication)
+def remove_application_aggregates(sender, instance, using=None, **kwargs):
+    apply_rollup_changes(_application_rollup_key(instance), None, using=using)
+    apply_counter_changes((instance.job_id, instance.status), None, using=using)
+
+@receiver(post_save, sender=JobApplication)
+def notify_application_status(sender, instance, raw=False, using=None, **kwargs):
+    previous = getattr(instance, '_previous_application', None)
+    if raw or previous is None or previous[2] == instance.status:
+        return
+    from .notifications import notify_status_change
+    # Views set _changed_by so the user making the change is not told about it
+    notify_status_change(instance, previous[2], actor_id=getattr(instance, '_changed_by', None), using=using)
+
+@receiver(post_save, sender=JobApplication)
+def publish_application_status(sender, instance, raw=False, using=None, **kwargs):
+    previous = getattr(instance, '_previous_application', None)
+    if raw or (previous is not None and previous[2] == instance.status):
+        return
+    from .streams import publish_status
+    args = (instance.applicant_id, instance.pk, instance.job_id, instance.status, previous[2] if previous else None)
+    # Open streams only hear about committed changes
+    transaction.on_commit(lambda: publish_status(*args), using=using)
+
+
+class SavedSearch(models.Model):
+    """Job alert of an applicant, new jobs are matched against it by jobs.alerts"""
+    applicant = models.ForeignKey(Applicant, on_delete=models.CASCADE, related_name="saved_searches")
+    name = models.CharField(max_length=255, blank=True)
+    # Every term must appear in the job's title, skills, description,
+    # location or company
+    query = models.CharField(max_length=255)
+    job_type = models.CharField(max_length=50, blank=True, choices=[('full_time', 'Full Time'), ('part_time', 'Part Time'), ('internship', 'Internship')])
+    location = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name or self.query
+
+@receiver(post_save, sender=SavedSearch)
+@receiver(post_delete, sender=SavedSearch)
+def refresh_saved_search_index(sender, instance, using=None, **kwargs):
+    from .alerts import invalidate_saved_search_index
+    transaction.on_commit(invalidate_saved_search_index, using=using)
+
+
+class SavedSearchMatch(models.Model):
+    """New job matching a saved search, sent with the applicant's next alert digest"""
+    saved_search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name="matches")
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True)
+    notified_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['saved_search', 'job'], name='saved_search_match_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.saved_search_id} -> {self.job_id}"
+
+
+class CompanyApplicationRollup(models.Model):
+    """Applications to one job with one status, by the day they were made"""
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name="application_rollups")
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name="application_rollups")
+    status = models.CharField(max_length=50)
+    # jobs.rollups.COMPACTED_DAY holds the days older than the retention window
+    day = models.DateField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['company', 'job', 'status', 'day'], name='company_rollup_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.job_id} {self.status} {self.day}: {self.count}"
+
+
+class SalaryStatBucket(models.Model):
+    """Number of jobs per yearly salary bucket for one title, skill or location"""
+    dimension = models.CharField(max_length=16, choices=[('title', 'Title'), ('skill', 'Skill'), ('location', 'Location')])
+    value = models.CharField(max_length=255)
+    # Lower bound divided by SALARY_HISTOGRAM_BUCKET_WIDTH
+    bucket = models.IntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'value', 'bucket'], name='salary_stat_bucket_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension}={self.value} [{self.bucket}]: {self.count}"
+
+
+class IdempotencyKey(models.Model):
+    """Response stored for a client supplied Idempotency-Key, see jobs.idempotency"""
+    # "user:<id>" or "anonymous", keys only collide within one scope
+    scope = models.CharField(max_length=64)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='idempotency_key_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.key}"
+
+
+class RefreshToken(models.Model):
+    """Single use refresh token, see jobs.auth; only its hash is stored"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='refresh_tokens')
+    token_hash = models.CharField(max_length=64, unique=True)
+    # Every rotation stays in the family of the login that started it, reuse
+    # of a rotated token revokes the whole family
+    family = models.CharField(max_length=32, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    used_at = models.DateTimeField(null=True, blank=True)
+    revoked_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user_id}:{self.family}"
+
+
+class RevokedToken(models.Model):
+    """Access token revoked before it expires, mirrored in memory by jobs.revocation"""
+    jti = models.CharField(max_length=32, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.jti
+
+
+class RedeemedStreamTicket(models.Model):
+    """Stream ticket already used to open a stream, see jobs.streams"""
+    nonce = models.CharField(max_length=32, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.nonce
+
+
+class NotificationEvent(models.Model):
+    """Something a user should be told about, delivered in digests by jobs.notifications"""
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notification_events")
+    kind = models.CharField(max_length=64)
+    # Events of one kind about the same object coalesce within a digest
+    object_id = models.BigIntegerField()
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id} -> {self.recipient_id}"
+
+
+class SearchIndexRebuild(models.Model):
+    """Index being built behind an alias by rebuild_search_index"""
+    # The relay writes live changes to the new index as well while this row exists
+    alias = models.CharField(max_length=255, unique=True)
+    index_name = models.CharField(max_length=255)
+    started_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.alias} -> {self.index_name}"
+
+
+class OutboxEvent(models.Model):
+    """Side effect recorded in the same transaction as the change causing it"""
+    topic = models.CharField(max_length=64)
+    object_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Failed handler runs; the event waits until retry_at before the next one
+    attempts = models.PositiveSmallIntegerField(default=0)
+    retry_at = models.DateTimeField(null=True, blank=True)
+    # Set once OUTBOX_MAX_ATTEMPTS runs failed, the relay skips it from then on
+    failed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        ordering = ['id']
 
     def __str__(self):
-        return f"{self.applicant.user.username} -> {self.job.title}"
+        return f"{self.topic}:{self.object_id}"
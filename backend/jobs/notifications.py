@@ -0,0 +1,271 @@
+"""
+Notification fan-out: events are queued as rows, delivered as digests.
+
+Code that has something to tell a user writes ``NotificationEvent`` rows in
+the transaction of the change itself (``notify``). The ``deliver_notifications``
+task runs ``fan_out`` periodically: it takes the pending events of up to
+``NOTIFICATION_BATCH_RECIPIENTS`` recipients at a time, coalesces events of
+one kind about the same object, and hands each recipient a single
+``Digest``. Every configured sink receives the whole batch in one call, so a
+burst of ten thousand status changes costs one delivery per recipient rather
+than one per change.
+
+Sinks are configured in ``NOTIFICATION_SINKS`` like Django's cache or mail
+backends. ``EmailSink`` sends mail; ``ConsoleSink`` and ``FileSink`` are
+meant for development and tests. Delivered events are deleted.
+
+A sink that fails is counted and logged while the other sinks still get the
+batch. Its events stay queued for the next run and this run moves on to the
+next recipients, so one broken delivery never holds up anybody else. Delivery
+is at-least-once: the sinks that did succeed may see those digests twice.
+Workers running side by side skip recipients whose events another worker has
+locked.
+"""
+import json
+import logging
+import sys
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection, send_mass_mail
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .job_summaries import get_job_summaries
+from .metrics import Counter, Histogram
+from .models import JobApplication, NotificationEvent, User
+
+logger = logging.getLogger(__name__)
+
+STATUS_CHANGED = 'application.status'
+JOB_MATCHED = 'job.match'
+
+DIGEST_SUBJECT = 'Updates from the job board'
+
+DIGESTS_DELIVERED = Counter(
+    'jobs_notification_digests_total', 'Digests handed to each notification sink', ['sink'])
+EVENTS_DELIVERED = Counter(
+    'jobs_notification_events_total', 'Events covered by the digests handed to each sink', ['sink'])
+SINK_FAILURES = Counter(
+    'jobs_notification_sink_failures_total', 'Batches a notification sink failed to deliver', ['sink'])
+SINK_DURATION = Histogram(
+    'jobs_notification_sink_duration_seconds', 'Time a sink took to deliver one batch of digests', ['sink'])
+
+
+def notify(notifications, using=None):
+    """Queue ``(recipient_id, kind, object_id, payload)`` notifications"""
+    NotificationEvent.objects.using(using).bulk_create([
+        NotificationEvent(recipient_id=recipient_id, kind=kind, object_id=object_id, payload=payload)
+        for recipient_id, kind, object_id, payload in notifications
+    ], batch_size=1000)
+
+
+def notify_status_change(application, from_status, actor_id=None, using=None):
+    """Tell the applicant and the hiring company, but not whoever made the change"""
+    recipients = JobApplication.objects.using(using).filter(pk=application.pk).values_list(
+        'applicant__user_id', 'job__company__user_id').first() or ()
+    payload = {'job_id': application.job_id, 'status': application.status, 'from_status': from_status}
+    notify([
+        (recipient_id, STATUS_CHANGED, application.pk, payload)
+        for recipient_id in set(recipients) - {None, actor_id}
+    ], using=using)
+
+
+def _coalesce(kind, payloads):
+    """Fold the payloads of one kind and object into one, or None to drop them"""
+    if kind == STATUS_CHANGED:
+        payload = {**payloads[-1], 'from_status': payloads[0].get('from_status')}
+        # Changed and changed back again, nothing to report
+        return payload if payload['from_status'] != payload['status'] else None
+    return payloads[-1]
+
+
+def _describe(kind, object_id, payload, summaries):
+    summary = summaries.get(payload.get('job_id')) or {}
+    job = f"{summary.get('job_title') or 'a removed job'} at {summary.get('company_name') or 'unknown company'}"
+    if kind == STATUS_CHANGED:
+        return f"Application {object_id} for {job} moved from {payload['from_status']} to {payload['status']}"
+    if kind == JOB_MATCHED:
+        return f"{job} matches your saved search \"{payload.get('search')}\": {summary.get('job_url') or ''}"
+    return f'{kind} {object_id}'
+
+
+class Digest:
+    """Everything pending for one recipient, ready to be delivered"""
+
+    subject = DIGEST_SUBJECT
+
+    def __init__(self, recipient_id, email, name, items, events):
+        self.recipient_id = recipient_id
+        self.email = email
+        self.name = name
+        # (kind, object_id, payload, text) after coalescing
+        self.items = items
+        # Events folded into the items
+        self.events = events
+
+    def body(self):
+        limit = settings.NOTIFICATION_DIGEST_MAX_ITEMS
+        lines = [f'Hi {self.name},', '']
+        lines += [f'- {text}' for _, _, _, text in self.items[:limit]]
+        if len(self.items) > limit:
+            lines.append(f'and {len(self.items) - limit} more.')
+        return '\n'.join(lines) + '\n'
+
+
+def build_digests(events):
+    """One digest per recipient from ``(recipient_id, kind, object_id, payload)`` rows"""
+    grouped = {}
+    for recipient_id, kind, object_id, payload in events:
+        grouped.setdefault(recipient_id, {}).setdefault((kind, object_id), []).append(payload)
+
+    users = dict((pk, (email, name)) for pk, email, name in
+                 User.objects.filter(pk__in=grouped).values_list('pk', 'email', 'name'))
+    summaries = get_job_summaries({payload.get('job_id') for *_, payload in events})
+
+    digests = []
+    for recipient_id, by_object in grouped.items():
+        if recipient_id not in users:
+            continue
+        items = []
+        for (kind, object_id), payloads in by_object.items():
+            payload = _coalesce(kind, payloads)
+            if payload is not None:
+                items.append((kind, object_id, payload, _describe(kind, object_id, payload, summaries)))
+        if items:
+            email, name = users[recipient_id]
+            digests.append(Digest(recipient_id, email, name, items, sum(map(len, by_object.values()))))
+    return digests
+
+
+class NotificationSink:
+    """Delivers a batch of digests, subclasses implement ``deliver``"""
+
+    def __init__(self, name, **options):
+        self.name = name
+        self.options = options
+
+    def deliver(self, digests):
+        raise NotImplementedError
+
+
+class EmailSink(NotificationSink):
+    """One mail per digest, sent over a single connection"""
+
+    def deliver(self, digests):
+        messages = [
+            (digest.subject, digest.body(), settings.DEFAULT_FROM_EMAIL, [digest.email])
+            for digest in digests
+        ]
+        send_mass_mail(messages, fail_silently=False, connection=get_connection(self.options.get('backend')))
+
+
+class ConsoleSink(NotificationSink):
+    """Writes digests to stdout"""
+
+    def __init__(self, name, stream=None, **options):
+        super().__init__(name, **options)
+        self.stream = stream or sys.stdout
+
+    def deliver(self, digests):
+        self.stream.write(''.join(
+            f'To: {digest.email}\nSubject: {digest.subject}\n\n{digest.body()}\n' for digest in digests
+        ))
+        self.stream.flush()
+
+
+class FileSink(NotificationSink):
+    """Appends one JSON line per digest to ``path``"""
+
+    def deliver(self, digests):
+        with open(self.options['path'], 'a') as handle:
+            for digest in digests:
+                handle.write(json.dumps({
+                    'recipient_id': digest.recipient_id,
+                    'email': digest.email,
+                    'subject': digest.subject,
+                    'events': digest.events,
+                    'items': [{'kind': kind, 'object_id': object_id, 'payload': payload, 'text': text}
+                              for kind, object_id, payload, text in digest.items],
+                }) + '\n')
+
+
+def get_sinks():
+    return [
+        import_string(config['BACKEND'])(name, **config.get('OPTIONS', {}))
+        for name, config in settings.NOTIFICATION_SINKS.items()
+    ]
+
+
+def _deliver(sink, digests, events, stats):
+    """Hand the digests to one sink, returns whether it took them"""
+    sink_stats = stats[sink.name]
+    started = time.perf_counter()
+    try:
+        sink.deliver(digests)
+    except Exception:
+        SINK_FAILURES.inc(sink=sink.name)
+        sink_stats['failures'] += 1
+        logger.exception('Notification sink %s failed to deliver %d digests', sink.name, len(digests))
+        return False
+    elapsed = time.perf_counter() - started
+    SINK_DURATION.observe(elapsed, sink=sink.name)
+    DIGESTS_DELIVERED.inc(len(digests), sink=sink.name)
+    EVENTS_DELIVERED.inc(events, sink=sink.name)
+    sink_stats['digests'] += len(digests)
+    sink_stats['events'] += events
+    sink_stats['seconds'] += elapsed
+    return True
+
+
+def fan_out(batch_recipients=None, max_batches=None, recipient_ids=None, sinks=None):
+    """Deliver pending events as digests, returns per sink delivery stats"""
+    batch_recipients = batch_recipients or settings.NOTIFICATION_BATCH_RECIPIENTS
+    sinks = get_sinks() if sinks is None else sinks
+    stats = {sink.name: {'digests': 0, 'events': 0, 'seconds': 0.0, 'failures': 0} for sink in sinks}
+    pending = NotificationEvent.objects.all()
+    if recipient_ids is not None:
+        pending = pending.filter(recipient_id__in=recipient_ids)
+
+    batches = 0
+    # Recipients are walked in id order, a batch that is skipped or fails is
+    # left behind instead of being picked again
+    after = 0
+    while max_batches is None or batches < max_batches:
+        # Whole recipients per batch, so nobody gets two digests in one run
+        recipients = list(
+            pending.filter(recipient_id__gt=after).order_by('recipient_id')
+            .values_list('recipient_id', flat=True).distinct()[:batch_recipients]
+        )
+        if not recipients:
+            break
+        after = recipients[-1]
+        try:
+            with transaction.atomic():
+                events = list(
+                    pending.select_for_update(skip_locked=True).filter(recipient_id__in=recipients)
+                    .order_by('id').values_list('id', 'recipient_id', 'kind', 'object_id', 'payload')
+                )
+                if not events:
+                    # Another worker is delivering to these recipients
+                    continue
+
+                digests = build_digests([event[1:] for event in events])
+                # Every sink gets its chance even when an earlier one failed
+                delivered = [_deliver(sink, digests, len(events), stats) for sink in sinks] if digests else []
+                # Events that coalesced away are deleted without a delivery
+                if all(delivered):
+                    NotificationEvent.objects.filter(id__in=[event[0] for event in events]).delete()
+        except Exception:
+            logger.exception('Could not deliver notifications to recipients %d-%d, retrying next run',
+                             recipients[0], recipients[-1])
+        batches += 1
+
+    for name, sink_stats in stats.items():
+        seconds = sink_stats['seconds']
+        sink_stats['digests_per_second'] = round(sink_stats['digests'] / seconds, 1) if seconds else None
+        sink_stats['seconds'] = round(seconds, 6)
+        if sink_stats['digests']:
+            logger.info('Notification sink %s delivered %d digests for %d events in %.3fs',
+                        name, sink_stats['digests'], sink_stats['events'], seconds)
+    return stats
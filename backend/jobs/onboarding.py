@@ -0,0 +1,54 @@
+"""
+Follow-up work for new registrations, run by the outbox relay.
+
+``RegisterView`` only writes the user, its profile and a ``user.registered``
+outbox event. The relay hands the handler below every registration since
+its last run at once, and the handler queues one ``send_welcome_mail`` task
+for them when the batch commits. Mail is sent outside the relay's
+transaction, so a slow or failing mail server neither holds up the other
+topics of the batch nor makes the relay run it again; a batch that rolls
+back queues nothing. The task retries failed deliveries on its own, so a
+welcome mail can still arrive twice.
+"""
+import logging
+
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.db import transaction
+
+from .models import User
+from .outbox import outbox_handler
+
+logger = logging.getLogger(__name__)
+
+WELCOME_SUBJECT = 'Welcome to the job board'
+WELCOME_BODY = {
+    'applicant': 'Hi {name},\n\nyour applicant account is ready. Complete your profile and start applying.\n',
+    'company': 'Hi {name},\n\nyour company account is ready. Post your first job whenever you like.\n',
+}
+
+
+def send_welcome_mails(user_ids):
+    """Mail every user in ``user_ids`` over one connection, returns the number sent"""
+    users = User.objects.filter(id__in=user_ids).values_list('email', 'name', 'role')
+    messages = [
+        (WELCOME_SUBJECT, WELCOME_BODY.get(role, WELCOME_BODY['applicant']).format(name=name),
+         settings.DEFAULT_FROM_EMAIL, [email])
+        for email, name, role in users
+    ]
+    return send_mass_mail(messages, fail_silently=False) if messages else 0
+
+
+def _queue_welcome_mail(user_ids):
+    from .tasks import send_welcome_mail
+    try:
+        send_welcome_mail.delay(user_ids)
+    except Exception:
+        # The registrations are committed, only their welcome mail is lost
+        logger.warning('Could not queue welcome mail for %d users', len(user_ids), exc_info=True)
+
+
+@outbox_handler('user.registered')
+def welcome_users(events):
+    user_ids = [user_id for user_id, _ in events]
+    transaction.on_commit(lambda: _queue_welcome_mail(user_ids))
@@ -0,0 +1,168 @@
+"""
+Transactional outbox.
+
+Changes that need a side effect (search indexing, notifications, ...) write
+an ``OutboxEvent`` row in the same transaction as the change itself. Once the
+transaction commits a relay run is requested; the relay drains the table in
+id order and hands each topic's object ids to the handler registered for it.
+Events are deleted in the transaction that processed them (at-least-once
+delivery).
+
+Each topic of a batch runs in its own savepoint. When a handler fails only
+that topic's events stay behind: they are retried with exponential backoff,
+while the other topics keep flowing. After ``OUTBOX_MAX_ATTEMPTS`` failed
+runs an event is dead-lettered (``failed_at`` is set) and left for
+``relay_outbox --requeue-failed``.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .metrics import Counter
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+RELAY_NUDGE_KEY = 'outbox:relay-scheduled'
+RELAY_NUDGE_SECONDS = 1
+
+# Backoff after the n-th failure is 2**n seconds, capped here
+RETRY_MAX_SECONDS = 300
+
+HANDLER_FAILURES = Counter(
+    'jobs_outbox_handler_failures_total', 'Outbox batches a topic handler failed to process', ['topic'])
+DEAD_LETTERS = Counter(
+    'jobs_outbox_dead_letters_total', 'Outbox events given up on after OUTBOX_MAX_ATTEMPTS failures', ['topic'])
+
+_handlers = {}
+_batch_hooks = []
+
+
+def outbox_handler(topic):
+    """Register ``handler(events)`` for a topic.
+
+    ``events`` is a list of ``(object_id, event_id)`` pairs in event order,
+    with repeated object ids collapsed onto their latest event. The event id
+    grows monotonically, so handlers can use it as an external version.
+    """
+    def decorator(handler):
+        _handlers[topic] = handler
+        return handler
+    return decorator
+
+
+def after_batch(hook):
+    """Register ``hook()`` to run once after the handlers of every batch.
+
+    Handlers use it to finish work they share, e.g. refreshing the indices
+    all of them wrote to once instead of after each write.
+    """
+    _batch_hooks.append(hook)
+    return hook
+
+
+def publish(topic, object_ids, using=None):
+    """Record events for ``object_ids`` in the current transaction"""
+    OutboxEvent.objects.using(using).bulk_create(
+        [OutboxEvent(topic=topic, object_id=object_id) for object_id in object_ids]
+    )
+    transaction.on_commit(request_relay, using=using)
+
+
+def request_relay():
+    """Ask a worker to drain the outbox, coalescing bursts of commits"""
+    if not cache.add(RELAY_NUDGE_KEY, True, RELAY_NUDGE_SECONDS):
+        return
+    from .tasks import relay_outbox
+    try:
+        relay_outbox.delay()
+    except Exception:
+        # The events are safe in the table, the periodic relay picks them up.
+        logger.warning('Could not schedule outbox relay', exc_info=True)
+
+
+def _load_handlers():
+    # Handlers live next to the documents or services they write to.
+    from . import indexing, onboarding  # noqa: F401
+
+
+def _record_failure(topic, event_ids):
+    """Back the events off, or dead-letter those out of attempts"""
+    now = timezone.now()
+    events = OutboxEvent.objects.filter(id__in=event_ids)
+    events.update(attempts=F('attempts') + 1)
+    dead = events.filter(attempts__gte=settings.OUTBOX_MAX_ATTEMPTS).update(failed_at=now, retry_at=None)
+    for attempts in set(events.filter(failed_at__isnull=True).values_list('attempts', flat=True)):
+        delay = min(2 ** attempts, RETRY_MAX_SECONDS)
+        events.filter(attempts=attempts, failed_at__isnull=True).update(retry_at=now + timedelta(seconds=delay))
+    HANDLER_FAILURES.inc(topic=topic)
+    if dead:
+        DEAD_LETTERS.inc(dead, topic=topic)
+        logger.error('Dead-lettered %d %s outbox events after %d failed attempts',
+                     dead, topic, settings.OUTBOX_MAX_ATTEMPTS)
+
+
+def drain_outbox(batch_size=500, max_batches=None):
+    """Process pending events in ordered batches, returns the number handled"""
+    _load_handlers()
+    handled = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            events = list(
+                OutboxEvent.objects.select_for_update(skip_locked=True)
+                .filter(Q(retry_at__isnull=True) | Q(retry_at__lte=timezone.now()), failed_at__isnull=True)
+                .order_by('id')[:batch_size]
+            )
+            if not events:
+                break
+
+            by_topic = {}
+            for event in events:
+                # Re-inserting moves the object to the position of its latest
+                # event while keeping topics in first-seen order.
+                topic_events = by_topic.setdefault(event.topic, {})
+                topic_events.pop(event.object_id, None)
+                topic_events[event.object_id] = event.id
+
+            failed = set()
+            for topic, topic_events in by_topic.items():
+                handler = _handlers.get(topic)
+                if handler is None:
+                    logger.error('No outbox handler for topic %s, dropping %d events', topic, len(topic_events))
+                    continue
+                try:
+                    # A failing handler only rolls back its own writes
+                    with transaction.atomic():
+                        handler(list(topic_events.items()))
+                except Exception:
+                    logger.exception('Outbox handler for %s failed on %d events', topic, len(topic_events))
+                    failed.add(topic)
+
+            for hook in _batch_hooks:
+                try:
+                    hook()
+                except Exception:
+                    logger.exception('Outbox batch hook %s failed', hook.__name__)
+
+            done = [event.id for event in events if event.topic not in failed]
+            OutboxEvent.objects.filter(id__in=done).delete()
+            for topic in failed:
+                _record_failure(topic, [event.id for event in events if event.topic == topic])
+
+        handled += len(done)
+        batches += 1
+    return handled
+
+
+def requeue_failed(topic=None):
+    """Give dead-lettered events a fresh set of attempts, returns how many"""
+    events = OutboxEvent.objects.filter(failed_at__isnull=False)
+    if topic is not None:
+        events = events.filter(topic=topic)
+    return events.update(failed_at=None, retry_at=None, attempts=0)
@@ -0,0 +1,108 @@
+"""
+Access rules declared on view methods, enforced by ``DeclaredAccess``.
+
+``require_authentication``, ``require_role`` and ``require_ownership_or_admin``
+(jobs.auth) only attach rules to the method they decorate. ``DeclaredAccess``
+runs once per request, after ``JWTAuthentication`` has resolved the caller,
+and checks every rule of the handler against that one principal. Ownership
+of profiles is read from the token; rules on other resources fetch their
+owners with one query per model, however many rules are stacked.
+"""
+from django.apps import apps
+from rest_framework.exceptions import NotAuthenticated, NotFound, ParseError, PermissionDenied
+from rest_framework.permissions import BasePermission
+
+# resource: (model holding the owner or None when the id is the owner's,
+#            owner field of that model, principal attribute it must equal)
+# A tuple of owner fields with one of principal attributes grants access
+# when any pair matches.
+OWNERSHIP = {
+    'user': (None, None, 'id'),
+    'applicant': (None, None, 'applicant_id'),
+    'company': (None, None, 'company_id'),
+    'job': ('jobs.Job', 'company_id', 'company_id'),
+    'jobapplication': ('jobs.JobApplication', 'applicant_id', 'applicant_id'),
+    # The applicant and the hiring company both move an application along
+    'jobapplication_status': ('jobs.JobApplication', ('applicant_id', 'job__company_id'),
+                              ('applicant_id', 'company_id')),
+    'savedsearch': ('jobs.SavedSearch', 'applicant_id', 'applicant_id'),
+}
+
+
+class AccessRule:
+    """One requirement declared on a view method"""
+
+    def __init__(self, kind, value=None, id_param=None):
+        self.kind = kind
+        self.value = value
+        self.id_param = id_param
+
+    def __repr__(self):
+        return f'AccessRule({self.kind!r}, {self.value!r}, {self.id_param!r})'
+
+
+def declare(view_func, rule):
+    """Add ``rule`` to the rules of ``view_func`` and return it unwrapped"""
+    view_func.access_rules = (*getattr(view_func, 'access_rules', ()), rule)
+    return view_func
+
+
+def handler_rules(request, view):
+    handler = getattr(view, request.method.lower(), None)
+    return getattr(handler, 'access_rules', ())
+
+
+def _as_tuple(value):
+    return value if isinstance(value, tuple) else (value,)
+
+
+def check_ownership(principal, rules, view_kwargs):
+    """Raise unless the principal owns every resource named by ``rules``"""
+    lookups = {}
+    for rule in rules:
+        if rule.value not in OWNERSHIP:
+            raise ParseError({'error': 'Invalid resource type'})
+        resource_id = view_kwargs.get(rule.id_param)
+        if resource_id is None:
+            raise ParseError({'error': 'Resource ID required'})
+        model, owner_field, principal_attr = OWNERSHIP[rule.value]
+        if model is None:
+            expected = getattr(principal, principal_attr, None)
+            if expected is None or int(resource_id) != expected:
+                raise PermissionDenied({'error': 'Access denied'})
+        else:
+            expected = tuple(getattr(principal, attr, None) for attr in _as_tuple(principal_attr))
+            lookups.setdefault((model, _as_tuple(owner_field)), {})[int(resource_id)] = expected
+
+    for (model, owner_fields), expected_by_id in lookups.items():
+        owners = {
+            pk: values for pk, *values in
+            apps.get_model(model).objects.filter(pk__in=expected_by_id).values_list('pk', *owner_fields)
+        }
+        for resource_id, expected in expected_by_id.items():
+            if resource_id not in owners:
+                raise NotFound({'error': 'Resource not found'})
+            if not any(value is not None and value == owner for value, owner in zip(expected, owners[resource_id])):
+                raise PermissionDenied({'error': 'Access denied'})
+
+
+class DeclaredAccess(BasePermission):
+    """Enforce the access rules declared on the handler for this request"""
+
+    def has_permission(self, request, view):
+        rules = handler_rules(request, view)
+        if not rules:
+            return True
+        principal = request.user
+        if not getattr(principal, 'is_authenticated', False):
+            raise NotAuthenticated({'error': 'Authentication required'})
+
+        owner_rules = []
+        for rule in rules:
+            if rule.kind == 'role' and principal.role != rule.value:
+                raise PermissionDenied({'error': 'Insufficient permissions'})
+            if rule.kind == 'owner':
+                owner_rules.append(rule)
+        if owner_rules:
+            check_ownership(principal, owner_rules, view.kwargs)
+        return True
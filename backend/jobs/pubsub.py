@@ -0,0 +1,151 @@
+"""
+Publish/subscribe between synchronous Django code and open event streams.
+
+Publishers run in request threads and workers; subscribers are coroutines
+on the ASGI event loop (jobs.streams). Messages are serialised once when
+published and written to every stream as they are. Delivery is best effort:
+a stream that is not connected when a message is published misses it.
+
+``InMemoryPubSub`` only reaches streams of the same process, which suits a
+single process setup. ``RedisPubSub`` publishes through Redis and keeps one
+subscriber connection per process, subscribed to the channels its streams
+listen on, so a process holding thousands of idle streams holds a single
+Redis connection. ``STREAM_PUBSUB_URL`` selects Redis when set.
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Messages for one stream, in arrival order"""
+
+    def __init__(self, channel, maxsize):
+        self.channel = channel
+        self.queue = asyncio.Queue(maxsize)
+        # Set when messages were dropped because the stream fell behind
+        self.lagged = False
+
+    def offer(self, data):
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            self.lagged = True
+
+
+class LocalFanOut:
+    """Subscriptions of this process by channel, owned by the event loop"""
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._loop = None
+
+    def _dispatch(self, channel, data):
+        for subscription in list(self._subscriptions.get(channel, ())):
+            subscription.offer(data)
+
+    async def subscribe(self, channel):
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(channel, settings.STREAM_QUEUE_SIZE)
+        subscriptions = self._subscriptions.setdefault(channel, set())
+        subscriptions.add(subscription)
+        if len(subscriptions) == 1:
+            await self._listen(channel)
+        return subscription
+
+    async def unsubscribe(self, subscription):
+        subscriptions = self._subscriptions.get(subscription.channel)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.channel]
+            await self._unlisten(subscription.channel)
+
+    async def _listen(self, channel):
+        pass
+
+    async def _unlisten(self, channel):
+        pass
+
+    def publish(self, channel, message):
+        raise NotImplementedError
+
+
+class InMemoryPubSub(LocalFanOut):
+    """Delivers to the streams of this process only"""
+
+    def publish(self, channel, message):
+        loop = self._loop
+        if loop is None or loop.is_closed() or channel not in self._subscriptions:
+            return
+        data = json.dumps(message)
+        # Publishers run in other threads than the loop owning the queues
+        loop.call_soon_threadsafe(self._dispatch, channel, data)
+
+
+class RedisPubSub(LocalFanOut):
+    """Delivers through Redis to the streams of every process"""
+
+    RECONNECT_SECONDS = 1
+
+    def __init__(self, url):
+        super().__init__()
+        import redis
+
+        self._url = url
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self._pubsub = None
+        self._reader = None
+
+    def publish(self, channel, message):
+        try:
+            self._client.publish(channel, json.dumps(message))
+        except Exception:
+            # The change itself is committed, only the live update is lost
+            logger.warning('Could not publish to %s', channel, exc_info=True)
+
+    async def _listen(self, channel):
+        if self._pubsub is None:
+            import redis.asyncio
+
+            self._pubsub = redis.asyncio.Redis.from_url(self._url).pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(channel)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.ensure_future(self._read())
+
+    async def _unlisten(self, channel):
+        await self._pubsub.unsubscribe(channel)
+
+    async def _read(self):
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # The next read reconnects and subscribes to the channels again
+                logger.warning('Stream subscriber connection failed, reconnecting', exc_info=True)
+                await asyncio.sleep(self.RECONNECT_SECONDS)
+                continue
+            if message is not None and message['type'] == 'message':
+                self._dispatch(message['channel'].decode(), message['data'].decode())
+
+
+_pubsub = None
+_pubsub_lock = threading.Lock()
+
+
+def get_pubsub():
+    global _pubsub
+    if _pubsub is None:
+        with _pubsub_lock:
+            if _pubsub is None:
+                url = settings.STREAM_PUBSUB_URL
+                _pubsub = RedisPubSub(url) if url else InMemoryPubSub()
+    return _pubsub
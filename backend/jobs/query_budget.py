@@ -0,0 +1,134 @@
+"""
+Per-view query budgets.
+
+A budget is declared either with the ``query_budget`` decorator on a view
+class, view method or function view, or in the ``QUERY_BUDGETS`` setting
+keyed by URL name. ``QueryBudgetMiddleware`` compares the queries counted by
+``PerformanceMiddleware`` against it and, depending on ``QUERY_BUDGET_MODE``,
+raises ``QueryBudgetExceeded`` ("raise"), logs a warning ("warn") or does
+nothing ("off").
+"""
+import logging
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger('jobs.performance')
+
+_WHITESPACE = re.compile(r'\s+')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(max_queries):
+    """Declare the maximum number of queries a view may run"""
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def resolve_budget(request, view_func):
+    """Find the budget for a request: method, then view, then settings map"""
+    view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+    if view_class is not None:
+        handler = getattr(view_class, request.method.lower(), None)
+        budget = getattr(handler, 'query_budget', None)
+        if budget is not None:
+            return budget
+        budget = getattr(view_class, 'query_budget', None)
+        if budget is not None:
+            return budget
+    budget = getattr(view_func, 'query_budget', None)
+    if budget is not None:
+        return budget
+    match = getattr(request, 'resolver_match', None)
+    if match is not None:
+        return getattr(settings, 'QUERY_BUDGETS', {}).get(match.url_name)
+    return None
+
+
+def _normalise(sql):
+    # SQL arrives in two shapes. ``PerformanceMiddleware`` records it through
+    # ``connection.execute_wrapper``, before the parameters are bound, so it
+    # carries ``%s`` placeholders and already reads the same for different
+    # ids. ``CaptureQueriesContext`` in ``assert_query_count_stable`` records
+    # it with the parameters inlined; folding the literals makes those
+    # statements match for different ids too.
+    return _WHITESPACE.sub(' ', _LITERALS.sub('?', sql)).strip()
+
+
+def duplicate_queries(sql_statements, threshold=2):
+    """SQL templates executed at least ``threshold`` times, most frequent first"""
+    counts = Counter(_normalise(sql) for sql in sql_statements)
+    return [(sql, count) for sql, count in counts.most_common() if count >= threshold]
+
+
+def describe_queries(sql_statements):
+    duplicates = duplicate_queries(sql_statements)
+    if not duplicates:
+        return 'no duplicated queries'
+    return '\n'.join(f'  {count}x {sql}' for sql, count in duplicates)
+
+
+class QueryBudgetMiddleware:
+    """Enforce query budgets; must sit inside PerformanceMiddleware"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._query_budget = None
+        response = self.get_response(request)
+
+        budget = request._query_budget
+        stats = getattr(request, 'performance', None)
+        if budget is None or stats is None or stats.db_count <= budget:
+            return response
+
+        message = (
+            f'{request.method} {request.path} ran {stats.db_count} queries, '
+            f'budget is {budget}. Duplicated SQL:\n'
+            f'{describe_queries(sql for sql, _, _ in stats.queries)}'
+        )
+        if settings.QUERY_BUDGET_MODE == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if settings.QUERY_BUDGET_MODE != 'off':
+            request._query_budget = resolve_budget(request, view_func)
+        return None
+
+
+def assert_query_count_stable(testcase, seed, make_request, sizes=(1, 5, 25), using=None):
+    """Assert a request runs the same number of queries however many rows exist.
+
+    ``seed(n)`` must bring the fixture up to ``n`` related rows and
+    ``make_request()`` issue the request under test. An N+1 shows up as a
+    query count that grows with ``n``; the failure lists the duplicated SQL
+    of the largest run.
+    """
+    from django.test.utils import CaptureQueriesContext
+
+    db = connections[using or DEFAULT_DB_ALIAS]
+    counts = {}
+    captured = None
+    for size in sizes:
+        seed(size)
+        with CaptureQueriesContext(db) as context:
+            make_request()
+        counts[size] = len(context.captured_queries)
+        captured = context.captured_queries
+
+    if len(set(counts.values())) > 1:
+        testcase.fail(
+            f'Query count grows with row count {counts}. Duplicated SQL at n={sizes[-1]}:\n'
+            f"{describe_queries(query['sql'] for query in captured)}"
+        )
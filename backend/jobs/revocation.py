@@ -0,0 +1,120 @@
+"""
+In-memory list of revoked access tokens.
+
+Access tokens are short lived, so a revoked one only has to be remembered
+until its ``exp``. Revoked ``jti`` values are kept in sets sharded by expiry
+bucket: checking a token hashes its ``exp`` to one bucket and does a single
+set lookup, and whole buckets are dropped once every token in them has
+expired. ``RevokedToken`` rows carry revocations to other processes, which
+pull new rows at most every ``TOKEN_REVOCATION_SYNC_SECONDS`` instead of
+querying per request.
+"""
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+# Ids are assigned before commit, so a revocation committed late can get a
+# lower id than one already synced; re-reading this many ids catches it.
+SYNC_LOOKBACK_IDS = 100
+
+
+class RevocationList:
+    """Revoked token ids sharded into sets by expiry bucket"""
+
+    def __init__(self, bucket_seconds):
+        self.bucket_seconds = bucket_seconds
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._evicted_until = 0
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self._buckets.values())
+
+    def add(self, jti, exp):
+        if exp <= time.time():
+            return
+        with self._lock:
+            self._buckets.setdefault(int(exp // self.bucket_seconds), set()).add(jti)
+
+    def contains(self, jti, exp):
+        bucket = self._buckets.get(int(exp // self.bucket_seconds))
+        return bucket is not None and jti in bucket
+
+    def evict(self, now=None):
+        """Drop buckets whose tokens have all expired"""
+        current = int((now or time.time()) // self.bucket_seconds)
+        if current <= self._evicted_until:
+            return
+        with self._lock:
+            for index in [index for index in self._buckets if index < current]:
+                del self._buckets[index]
+            self._evicted_until = current
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class _SyncState:
+    def __init__(self):
+        self.last_id = 0
+        self.next_sync = 0.0
+        self.lock = threading.Lock()
+
+
+revoked_tokens = RevocationList(settings.TOKEN_REVOCATION_BUCKET_SECONDS)
+_sync = _SyncState()
+
+
+def sync_revocations(force=False):
+    """Pull revocations made by other processes, rate limited per process"""
+    now = time.monotonic()
+    if not force and now < _sync.next_sync:
+        return
+    from .models import RevokedToken
+
+    if not _sync.lock.acquire(blocking=False):
+        # Another thread is already syncing
+        return
+    try:
+        _sync.next_sync = now + settings.TOKEN_REVOCATION_SYNC_SECONDS
+        rows = RevokedToken.objects.filter(
+            id__gt=max(0, _sync.last_id - SYNC_LOOKBACK_IDS), expires_at__gt=timezone.now()).order_by('id')
+        for row_id, jti, expires_at in rows.values_list('id', 'jti', 'expires_at'):
+            revoked_tokens.add(jti, expires_at.timestamp())
+            _sync.last_id = max(_sync.last_id, row_id)
+        revoked_tokens.evict()
+    except DatabaseError:
+        # Keep serving with what is known, the next sync retries
+        pass
+    finally:
+        _sync.lock.release()
+
+
+def is_revoked(payload):
+    sync_revocations()
+    return revoked_tokens.contains(payload['jti'], payload['exp'])
+
+
+def revoke(jti, exp):
+    """Revoke one access token in this process and for every other one"""
+    from .models import RevokedToken
+
+    revoked_tokens.add(jti, exp)
+    expires_at = datetime.fromtimestamp(exp, tz=dt_timezone.utc)
+    RevokedToken.objects.bulk_create([RevokedToken(jti=jti, expires_at=expires_at)], ignore_conflicts=True)
+
+
+def purge_expired_revocations():
+    from .models import RedeemedStreamTicket, RefreshToken, RevokedToken
+
+    now = timezone.now()
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=now).delete()
+    refreshed, _ = RefreshToken.objects.filter(expires_at__lte=now).delete()
+    # Expired tickets are refused by their signature, their records can go
+    redeemed, _ = RedeemedStreamTicket.objects.filter(expires_at__lte=now).delete()
+    return deleted + refreshed + redeemed
@@ -0,0 +1,147 @@
+"""
+Per company application rollups behind the company dashboard.
+
+``CompanyApplicationRollup`` holds one count per (company, job, status, day
+applied). ``JobApplication`` signals move a single count whenever an
+application is created, changes status or is deleted, so reading a dashboard
+never touches ``JobApplication``. A periodic compaction folds days older
+than ``DASHBOARD_DAILY_RETENTION_DAYS`` into one row per job and status, which
+keeps the table size independent of how long a company has been hiring.
+"""
+from collections import Counter
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+# Day of the row holding everything compacted out of the daily window
+COMPACTED_DAY = date(1970, 1, 1)
+
+
+def application_day(applied_at):
+    return timezone.localdate(applied_at) if timezone.is_aware(applied_at) else applied_at.date()
+
+
+def rollup_key(company_id, job_id, status, applied_at):
+    # Applications of deleted jobs are not on any dashboard
+    if applied_at is None or job_id is None:
+        return None
+    return (company_id, job_id, status, application_day(applied_at))
+
+
+def apply_rollup_changes(old_key, new_key, using=None):
+    """Move one application's count from ``old_key`` to ``new_key``"""
+    from .models import CompanyApplicationRollup
+
+    if old_key == new_key:
+        return
+    rollups = CompanyApplicationRollup.objects.using(using)
+    with transaction.atomic(using=using):
+        if new_key is not None:
+            company_id, job_id, status, day = new_key
+            rollups.bulk_create(
+                [CompanyApplicationRollup(company_id=company_id, job_id=job_id, status=status, day=day, count=0)],
+                ignore_conflicts=True,
+            )
+            rollups.filter(company_id=company_id, job_id=job_id, status=status, day=day).update(
+                count=F('count') + 1)
+        if old_key is not None:
+            company_id, job_id, status, day = old_key
+            # A day already compacted away is counted in the COMPACTED_DAY row
+            updated = rollups.filter(company_id=company_id, job_id=job_id, status=status, day=day).update(
+                count=F('count') - 1)
+            if not updated:
+                rollups.filter(company_id=company_id, job_id=job_id, status=status, day=COMPACTED_DAY).update(
+                    count=F('count') - 1)
+
+
+def compact_rollups(retention_days=None):
+    """Fold daily rows older than the retention window, returns rows removed"""
+    from .models import CompanyApplicationRollup
+
+    retention_days = retention_days or settings.DASHBOARD_DAILY_RETENTION_DAYS
+    cutoff = timezone.localdate() - timedelta(days=retention_days)
+    with transaction.atomic():
+        expired = (
+            CompanyApplicationRollup.objects.select_for_update()
+            .filter(day__gt=COMPACTED_DAY, day__lt=cutoff)
+        )
+        folded = list(expired.values('company_id', 'job_id', 'status').annotate(total=Sum('count')))
+        removed, _ = expired.delete()
+        CompanyApplicationRollup.objects.bulk_create(
+            [CompanyApplicationRollup(company_id=row['company_id'], job_id=row['job_id'], status=row['status'],
+                                      day=COMPACTED_DAY, count=0) for row in folded],
+            ignore_conflicts=True,
+        )
+        for row in folded:
+            CompanyApplicationRollup.objects.filter(
+                company_id=row['company_id'], job_id=row['job_id'], status=row['status'], day=COMPACTED_DAY,
+            ).update(count=F('count') + row['total'])
+        removed += CompanyApplicationRollup.objects.filter(count=0).delete()[0]
+    return removed
+
+
+def rebuild_rollups(company_id=None, batch_size=2000):
+    """Recompute rollups from ``JobApplication``, for one company or all"""
+    from .db import stream_queryset
+    from .models import CompanyApplicationRollup, JobApplication
+
+    applications = JobApplication.objects.filter(job__isnull=False).values_list(
+        'job__company_id', 'job_id', 'status', 'applied_at')
+    rollups = CompanyApplicationRollup.objects.all()
+    if company_id is not None:
+        applications = applications.filter(job__company_id=company_id)
+        rollups = rollups.filter(company_id=company_id)
+
+    counts = Counter(rollup_key(*row) for row in stream_queryset(applications, chunk_size=batch_size))
+    with transaction.atomic():
+        rollups.delete()
+        CompanyApplicationRollup.objects.bulk_create(
+            [CompanyApplicationRollup(company_id=c, job_id=j, status=s, day=d, count=count)
+             for (c, j, s, d), count in counts.items()],
+            batch_size=batch_size,
+        )
+    # Rebuilt rows are daily again, fold the old ones right away
+    compact_rollups()
+    return len(counts)
+
+
+def company_dashboard(company_id, days):
+    """Application counts per job, status and day for the last ``days`` days"""
+    from .models import CompanyApplicationRollup, Job
+
+    today = timezone.localdate()
+    since = today - timedelta(days=days - 1)
+    rows = CompanyApplicationRollup.objects.filter(company_id=company_id, count__gt=0).values_list(
+        'job_id', 'status', 'day', 'count')
+
+    by_status = Counter()
+    by_job = {}
+    by_day = Counter()
+    for job_id, status, day, count in rows:
+        by_status[status] += count
+        by_job.setdefault(job_id, Counter())[status] += count
+        if day >= since:
+            by_day[day] += count
+
+    jobs = Job.objects.filter(company_id=company_id).order_by('id').values_list('id', 'title')
+    return {
+        'company_id': company_id,
+        'total_applications': sum(by_status.values()),
+        'by_status': dict(by_status),
+        'by_job': [
+            {
+                'job_id': job_id,
+                'title': title,
+                'total': sum(by_job.get(job_id, {}).values()),
+                'by_status': dict(by_job.get(job_id, {})),
+            }
+            for job_id, title in jobs
+        ],
+        'by_day': [
+            {'date': (since + timedelta(days=offset)).isoformat(), 'count': by_day[since + timedelta(days=offset)]}
+            for offset in range(days)
+        ],
+    }
@@ -0,0 +1,182 @@
+"""
+Salary normalisation and the salary distribution aggregates.
+
+Advertised ranges are converted to an annual amount in the base currency of
+``jobs/data/exchange_rates.json``. Each job's annual midpoint is counted in a
+fixed-width histogram bucket per title, skill and location
+(``SalaryStatBucket``). The buckets are adjusted incrementally as jobs change,
+so distributions are read from a table whose size depends on the number of
+distinct titles, skills and locations, never on the number of jobs.
+"""
+import json
+from collections import Counter
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+
+RATES_PATH = Path(__file__).resolve().parent / 'data' / 'exchange_rates.json'
+
+PERIOD_CHOICES = [
+    ('hour', 'Hourly'),
+    ('day', 'Daily'),
+    ('week', 'Weekly'),
+    ('month', 'Monthly'),
+    ('year', 'Yearly'),
+]
+# Full time working hours/days, 40 h weeks and 52 weeks a year
+PERIODS_PER_YEAR = {'hour': 2080, 'day': 260, 'week': 52, 'month': 12, 'year': 1}
+
+DIMENSIONS = ['title', 'skill', 'location']
+PERCENTILES = [10, 25, 50, 75, 90]
+CENTS = Decimal('0.01')
+
+
+@lru_cache(maxsize=1)
+def load_rates():
+    with open(RATES_PATH, encoding='utf-8') as handle:
+        table = json.load(handle)
+    return table['base'], {code: Decimal(str(rate)) for code, rate in table['rates'].items()}
+
+
+def base_currency():
+    return load_rates()[0]
+
+
+def annualise(amount, currency, period):
+    """Convert ``amount`` per ``period`` in ``currency`` to a yearly base currency amount"""
+    if amount is None:
+        return None
+    _, rates = load_rates()
+    currency = (currency or '').upper()
+    if currency not in rates:
+        raise ValueError(f'Unsupported salary currency "{currency}"')
+    if period not in PERIODS_PER_YEAR:
+        raise ValueError(f'Unsupported salary period "{period}"')
+    annual = Decimal(str(amount)) * PERIODS_PER_YEAR[period] * rates[currency]
+    return annual.quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def annual_range(job):
+    """Return the job's ``(annual_min, annual_max)``, falling back to ``salary``"""
+    low = job.salary_min if job.salary_min is not None else job.salary
+    high = job.salary_max if job.salary_max is not None else low
+    if low is not None and high is not None and Decimal(str(low)) > Decimal(str(high)):
+        low, high = high, low
+    return (annualise(low, job.salary_currency, job.salary_period),
+            annualise(high, job.salary_currency, job.salary_period))
+
+
+def _clean(value):
+    return ' '.join((value or '').lower().split())[:255]
+
+
+def stat_keys(title, skills, location, annual_min, annual_max):
+    """Histogram cells ``(dimension, value, bucket)`` a job contributes to"""
+    if annual_min is None:
+        return []
+    midpoint = (Decimal(annual_min) + Decimal(annual_max if annual_max is not None else annual_min)) / 2
+    bucket = int(midpoint // settings.SALARY_HISTOGRAM_BUCKET_WIDTH)
+    values = [('title', _clean(title)), ('location', _clean(location))]
+    values += [('skill', skill) for skill in sorted({_clean(s) for s in (skills or '').split(',')})]
+    return [(dimension, value, bucket) for dimension, value in values if value]
+
+
+def job_stat_keys(job):
+    return stat_keys(job.title, job.skills, job.location, job.salary_annual_min, job.salary_annual_max)
+
+
+def apply_stat_changes(old_keys, new_keys, using=None):
+    """Move a job's contribution from ``old_keys`` to ``new_keys``"""
+    from .models import SalaryStatBucket
+
+    delta = Counter(new_keys)
+    delta.subtract(Counter(old_keys))
+    changes = {key: change for key, change in delta.items() if change}
+    if not changes:
+        return
+
+    buckets = SalaryStatBucket.objects.using(using)
+    with transaction.atomic(using=using):
+        # Create missing cells first so every change is a plain F() update
+        # and concurrent writers never race on an insert.
+        buckets.bulk_create(
+            [SalaryStatBucket(dimension=d, value=v, bucket=b, count=0)
+             for (d, v, b), change in changes.items() if change > 0],
+            ignore_conflicts=True,
+        )
+        for (dimension, value, bucket), change in changes.items():
+            buckets.filter(dimension=dimension, value=value, bucket=bucket).update(count=F('count') + change)
+
+
+def rebuild_salary_stats(batch_size=2000):
+    """Recompute every histogram cell from the jobs table, returns the cell count"""
+    from .db import stream_queryset
+    from .models import Job, SalaryStatBucket
+
+    counts = Counter()
+    jobs = Job.objects.filter(salary_annual_min__isnull=False).values_list(
+        'title', 'skills', 'location', 'salary_annual_min', 'salary_annual_max')
+    for row in stream_queryset(jobs, chunk_size=batch_size):
+        counts.update(stat_keys(*row))
+
+    with transaction.atomic():
+        SalaryStatBucket.objects.all().delete()
+        SalaryStatBucket.objects.bulk_create(
+            [SalaryStatBucket(dimension=d, value=v, bucket=b, count=count) for (d, v, b), count in counts.items()],
+            batch_size=batch_size,
+        )
+    return len(counts)
+
+
+def _summarise(cells):
+    """Percentiles and histogram from ``[(bucket, count)]`` sorted by bucket"""
+    width = settings.SALARY_HISTOGRAM_BUCKET_WIDTH
+    total = sum(count for _, count in cells)
+    percentiles = {}
+    for p in PERCENTILES:
+        target = total * p / 100
+        seen = 0
+        for bucket, count in cells:
+            if seen + count >= target:
+                # Assume values are spread evenly inside a bucket
+                fraction = (target - seen) / count if count else 0
+                percentiles[f'p{p}'] = round((bucket + fraction) * width, 2)
+                break
+            seen += count
+    return {
+        'count': total,
+        'percentiles': percentiles,
+        'histogram': [
+            {'min': bucket * width, 'max': (bucket + 1) * width, 'count': count}
+            for bucket, count in cells
+        ],
+    }
+
+
+def distribution(dimension, value):
+    from .models import SalaryStatBucket
+
+    cells = list(
+        SalaryStatBucket.objects.filter(dimension=dimension, value=_clean(value), count__gt=0)
+        .order_by('bucket').values_list('bucket', 'count')
+    )
+    return {'value': _clean(value), **_summarise(cells)}
+
+
+def top_distributions(dimension, limit):
+    """Distributions of the ``limit`` most common values of ``dimension``"""
+    from .models import SalaryStatBucket
+
+    rows = SalaryStatBucket.objects.filter(dimension=dimension, count__gt=0)
+    top = list(
+        rows.values('value').annotate(total=Sum('count')).order_by('-total', 'value')
+        .values_list('value', flat=True)[:limit]
+    )
+    cells = {}
+    for value, bucket, count in rows.filter(value__in=top).order_by('bucket').values_list('value', 'bucket', 'count'):
+        cells.setdefault(value, []).append((bucket, count))
+    return [{'value': value, **_summarise(cells.get(value, []))} for value in top]
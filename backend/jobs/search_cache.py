@@ -0,0 +1,120 @@
+"""
+Search result cache with generation-based invalidation.
+
+Every entry records the index generation it was computed under. The indexing
+pipeline bumps the generation after each flush, which makes all older entries
+stale at once without scanning or deleting keys. Stale entries are still
+served for up to ``SEARCH_CACHE_STALE_SECONDS`` while a single background
+refresh recomputes them, and a cold key is computed by one caller while
+concurrent callers wait for its result (single-flight).
+"""
+import hashlib
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .instrumentation import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = 'search:generation'
+LOCK_TIMEOUT = 10
+WAIT_INTERVAL = 0.02
+
+_revalidator = ThreadPoolExecutor(max_workers=2, thread_name_prefix='search-revalidate')
+
+
+def current_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, 1, None)
+        generation = cache.get(GENERATION_KEY, 1)
+    return generation
+
+
+def bump_generation():
+    """Invalidate every cached search result, called after each index flush"""
+    try:
+        return cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, 1, None)
+        return cache.incr(GENERATION_KEY)
+
+
+def normalise_query(query):
+    # Match queries ignore term order and case, so neither should split the
+    # cache.
+    return ' '.join(sorted(query.lower().split()))
+
+
+def make_key(query, filters, page, page_size):
+    payload = json.dumps({
+        'q': normalise_query(query),
+        'filters': sorted((k, str(v).strip().lower()) for k, v in filters.items() if v not in (None, '')),
+        'page': page,
+        'page_size': page_size,
+    }, sort_keys=True)
+    return 'search:result:' + hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _store(key, generation, data):
+    cache.set(key, {'generation': generation, 'stored_at': time.time(), 'data': data},
+              settings.SEARCH_CACHE_STALE_SECONDS)
+
+
+def _compute_and_store(key, compute):
+    # Read the generation first so a flush during compute leaves the entry stale
+    generation = current_generation()
+    data = compute()
+    _store(key, generation, data)
+    return data
+
+
+def _revalidate(key, compute):
+    lock_key = key + ':lock'
+    if not cache.add(lock_key, True, LOCK_TIMEOUT):
+        return
+
+    def run():
+        try:
+            _compute_and_store(key, compute)
+        except Exception:
+            logger.warning('Background search revalidation failed', exc_info=True)
+        finally:
+            cache.delete(lock_key)
+
+    _revalidator.submit(run)
+
+
+def cached_search(key, compute):
+    """Return cached results for ``key``, computing them with ``compute()`` when needed"""
+    generation = current_generation()
+    entry = cache.get(key)
+    if entry is not None:
+        age = time.time() - entry['stored_at']
+        record_cache_lookup(True)
+        if entry['generation'] != generation or age >= settings.SEARCH_CACHE_FRESH_SECONDS:
+            _revalidate(key, compute)
+        return entry['data']
+
+    record_cache_lookup(False)
+    lock_key = key + ':lock'
+    if cache.add(lock_key, True, LOCK_TIMEOUT):
+        try:
+            return _compute_and_store(key, compute)
+        finally:
+            cache.delete(lock_key)
+
+    # Another request is computing this key, wait for its result rather than
+    # sending the same query to Elasticsearch.
+    deadline = time.monotonic() + settings.SEARCH_CACHE_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['data']
+    return compute()
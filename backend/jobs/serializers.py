@@ -4,7 +4,7 @@ from .models import Job, Company
 class CompanySerializer(serializers.ModelSerializer):
     class Meta:
         model = Company
-        fields = ['name', 'logo', 'website']
+        fields = ['name', 'industry', 'logo', 'website']
 
 class JobSerializer(serializers.ModelSerializer):
     company = CompanySerializer(read_only=True)
@@ -0,0 +1,229 @@
+"""
+Server-sent events for application status changes.
+
+``main.asgi`` hands ``/api/applicants/<id>/applications/stream/`` to
+``application_stream`` before Django sees the request. Between updates an
+idle stream is one coroutine and one queue, with no worker thread,
+middleware or database connection behind it. Status changes are published
+on commit by a ``JobApplication`` ``post_save`` receiver through
+jobs.pubsub.
+
+The stream authenticates with an ``Authorization: Bearer`` header.
+Browsers cannot set headers on ``EventSource``, and access tokens must not
+end up in URLs and the logs that record them, so such clients first
+``POST`` to ``.../applications/stream/ticket/`` and open the stream with the
+returned ``?ticket=``. A ticket is signed, opens this one stream only, works
+once and expires after ``STREAM_TICKET_SECONDS``. Used tickets are recorded
+in ``RedeemedStreamTicket``, so a ticket is refused a second time by every
+process, not just the one that accepted it. A ticket carries the id, version
+and expiry of the access token it was issued for. Every heartbeat checks
+that token again, so logging out or changing the password ends the stream
+within ``STREAM_HEARTBEAT_SECONDS``. The checks read the in-memory
+revocation list and the cached token version, so they rarely need a query.
+
+Events:
+
+- ``ready`` once subscribed; fetch the applications then, so nothing
+  committed in between is missed.
+- ``status`` with ``{"application_id", "job_id", "status", "previous_status"}``
+  for every new application and status change.
+- ``resync`` when the stream fell behind and dropped updates.
+
+The stream ends when the access token expires or is revoked; reconnect with
+a fresh one.
+"""
+import asyncio
+import json
+import re
+import secrets
+import time
+from datetime import timedelta
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from .auth import TokenPrincipal, current_token_version, principal_from_token
+from .models import RedeemedStreamTicket
+from .pubsub import get_pubsub
+from .revocation import is_revoked
+
+STREAM_PATH = re.compile(r'^/api/applicants/(?P<applicant_id>\d+)/applications/stream/$')
+
+TICKET_SALT = 'jobs.streams.ticket'
+
+
+def application_channel(applicant_id):
+    return f'applications:{applicant_id}'
+
+
+def publish_status(applicant_id, application_id, job_id, status, previous_status):
+    get_pubsub().publish(application_channel(applicant_id), {
+        'application_id': application_id,
+        'job_id': job_id,
+        'status': status,
+        'previous_status': previous_status,
+    })
+
+
+def issue_stream_ticket(principal):
+    """A single use ticket opening the caller's application stream"""
+    return signing.dumps({
+        'user_id': principal.id,
+        'email': principal.email,
+        'role': principal.role,
+        'applicant_id': principal.applicant_id,
+        'company_id': principal.company_id,
+        'ver': principal.token_version,
+        'jti': principal.jti,
+        'exp': principal.expires_at,
+        'nonce': secrets.token_urlsafe(12),
+    }, salt=TICKET_SALT)
+
+
+def _token_is_current(principal):
+    """Whether the access token behind ``principal`` is still valid"""
+    if is_revoked({'jti': principal.jti, 'exp': principal.expires_at}):
+        return False
+    return current_token_version(principal.id) == principal.token_version
+
+
+def _redeem_ticket(ticket):
+    try:
+        payload = signing.loads(ticket, salt=TICKET_SALT, max_age=settings.STREAM_TICKET_SECONDS)
+    except signing.BadSignature:
+        return None
+    # Single use in every process, a ticket copied out of a log opens nothing
+    expires_at = timezone.now() + timedelta(seconds=settings.STREAM_TICKET_SECONDS)
+    try:
+        with transaction.atomic():
+            RedeemedStreamTicket.objects.create(nonce=payload['nonce'], expires_at=expires_at)
+    except IntegrityError:
+        return None
+    principal = TokenPrincipal(payload)
+    return principal if _token_is_current(principal) else None
+
+
+def _authenticate(token, ticket):
+    close_old_connections()
+    try:
+        return principal_from_token(token) if token else _redeem_ticket(ticket)
+    finally:
+        close_old_connections()
+
+
+def _still_valid(principal):
+    close_old_connections()
+    try:
+        return _token_is_current(principal)
+    finally:
+        close_old_connections()
+
+
+def _credentials(scope):
+    """The Bearer token, or failing that the ``?ticket=``"""
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            value = value.decode('latin-1')
+            return (value[7:] if value.startswith('Bearer ') else None), None
+    values = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('ticket')
+    return None, (values[0] if values else None)
+
+
+async def _reject(send, status, error, headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), *headers],
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps({'error': error}).encode()})
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def _event(name, data):
+    return f'event: {name}\ndata: {data}\n\n'.encode()
+
+
+async def application_stream(scope, receive, send, applicant_id):
+    """Stream the status changes of one applicant's applications"""
+    if scope['method'] != 'GET':
+        await _reject(send, 405, 'Method not allowed', [(b'allow', b'GET')])
+        return
+    token, ticket = _credentials(scope)
+    principal = await sync_to_async(_authenticate)(token, ticket) if token or ticket else None
+    if principal is None:
+        await _reject(send, 401, 'Authentication required', [(b'www-authenticate', b'Bearer')])
+        return
+    if principal.applicant_id != applicant_id:
+        await _reject(send, 403, 'Access denied')
+        return
+
+    pubsub = get_pubsub()
+    subscription = await pubsub.subscribe(application_channel(applicant_id))
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                # Proxies must not buffer the stream
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n' + _event('ready', '{}'),
+                    'more_body': True})
+
+        while not disconnect.done():
+            remaining = principal.expires_at - time.time()
+            if remaining <= 0:
+                break
+            message = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait(
+                {message, disconnect},
+                timeout=min(settings.STREAM_HEARTBEAT_SECONDS, remaining),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if message not in done:
+                message.cancel()
+                if not done:
+                    # Logging out or a password change ends the stream here
+                    if not await sync_to_async(_still_valid)(principal):
+                        break
+                    await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+                continue
+            if subscription.lagged:
+                # Queued updates are incomplete, the client has to fetch again
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.lagged = False
+                body = _event('resync', '{}')
+            else:
+                body = _event('status', message.result())
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+        if not disconnect.done():
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        disconnect.cancel()
+        await pubsub.unsubscribe(subscription)
+
+
+def route_streams(django_application):
+    """ASGI application serving event streams and passing the rest to Django"""
+    async def application(scope, receive, send):
+        if scope['type'] == 'http':
+            match = STREAM_PATH.match(scope['path'])
+            if match:
+                await application_stream(scope, receive, send, int(match.group('applicant_id')))
+                return
+        await django_application(scope, receive, send)
+    return application
@@ -1,41 +1,84 @@
+import logging
+
 from celery import shared_task
 
-@shared_task(bind=True, max_retries=3, default_retry_delay=60)
-def update_search_index(self, job_id, action='index'):
-    from .documents import JobDocument
-    from .models import Job
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def update_search_index(job_id, action='index'):
+    # Kept for messages queued before the outbox existed. The indexer mirrors
+    # the database row, so ``action`` no longer matters.
+    from .outbox import publish
+    publish('job.sync', [job_id])
+
+
+# Nobody reads the result, and skipping it keeps the result backend out of
+# the on-commit nudge sent from request threads
+@shared_task(ignore_result=True)
+def relay_outbox(batch_size=500):
+    from .outbox import drain_outbox
     try:
-        job = Job.objects.get(id=job_id)
-        if action == 'delete':
-            JobDocument().update(job, action='delete')
-        else:
-            JobDocument().update(job)
-    except Job.DoesNotExist:
-        # Handle case where job might be deleted before task runs
-        pass
-    except Exception as exc:
-        # Log the exception and retry the task
-        print(f"Error updating search index for job {job_id}: {exc}")
-        raise self.retry(exc=exc)
+        return drain_outbox(batch_size=batch_size)
+    except Exception:
+        # Handler failures are retried per event by drain_outbox. Anything
+        # else leaves the events in place for the periodic relay in 5 seconds.
+        logger.exception('Error relaying outbox')
+
+
+# Queued by the user.registered outbox handler once its batch commits.
+# SMTP and connection errors are all OSErrors and worth another try.
+@shared_task(ignore_result=True, autoretry_for=(OSError,), retry_backoff=True, max_retries=5)
+def send_welcome_mail(user_ids):
+    from .onboarding import send_welcome_mails
+
+    return send_welcome_mails(user_ids)
 
 
 @shared_task
 def reconcile_search_index():
+    from .db import stream_queryset
     from .documents import JobDocument
     from .models import Job
+    from .outbox import publish
     
     # Get all job IDs from the database
-    db_job_ids = set(Job.objects.values_list('id', flat=True))
+    db_job_ids = set(stream_queryset(Job.objects.values_list('id', flat=True)))
     
     # Get all job IDs from the search index
     search_job_ids = {int(hit.meta.id) for hit in JobDocument.search().scan()}
     
-    # Jobs to be indexed (in DB but not in search index)
-    to_index = db_job_ids - search_job_ids
-    for job_id in to_index:
-        update_search_index.delay(job_id, action='index')
-        
-    # Jobs to be deleted (in search index but not in DB)
-    to_delete = search_job_ids - db_job_ids
-    for job_id in to_delete:
-        update_search_index.delay(job_id, action='delete')
+    # Jobs missing from the index and index entries without a job are both
+    # repaired by syncing them through the outbox.
+    publish('job.sync', sorted(db_job_ids ^ search_job_ids))
+
+
+@shared_task
+def compact_application_rollups():
+    from .rollups import compact_rollups
+
+    # Folds dashboard rows older than the daily window into one row per job
+    # and status.
+    return compact_rollups()
+
+
+@shared_task
+def purge_idempotency_keys():
+    from .idempotency import purge_expired_keys
+
+    return purge_expired_keys()
+
+
+@shared_task
+def purge_revoked_tokens():
+    from .revocation import purge_expired_revocations
+
+    return purge_expired_revocations()
+
+
+@shared_task(ignore_result=True)
+def deliver_notifications():
+    from .notifications import fan_out
+
+    # Everything queued since the last run goes out as one digest per user
+    return fan_out()
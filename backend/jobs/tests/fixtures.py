@@ -0,0 +1,42 @@
+"""Rows shared by the tests, written through the models so signals run"""
+from decimal import Decimal
+
+from ..auth import hash_password, issue_tokens
+from ..models import Applicant, Company, Job, User
+
+PASSWORD = 'correct horse battery staple'
+
+
+def create_user(email, role, name='Test User', using='default'):
+    return User.objects.using(using).create(
+        email=email, password_hash=hash_password(PASSWORD), role=role, name=name)
+
+
+def create_company(email='company@example.com', name='Acme', using='default'):
+    user = create_user(email, 'company', name=name, using=using)
+    return Company.objects.using(using).create(
+        user=user, name=name, industry='Software', brief='We build things', website='https://example.com')
+
+
+def create_applicant(email='applicant@example.com', name='Ada', using='default'):
+    user = create_user(email, 'applicant', name=name, using=using)
+    return Applicant.objects.using(using).create(user=user, skills='python, django')
+
+
+def create_job(company, title='Backend Developer', using='default', **fields):
+    values = {
+        'description': 'Build APIs',
+        'location': 'Remote',
+        'application_url': 'https://example.com/apply',
+        'salary': Decimal('50000'),
+        'skills': 'python, django',
+        'status': 'open',
+        'job_type': 'full_time',
+        **fields,
+    }
+    return Job.objects.using(using).create(company=company, title=title, **values)
+
+
+def bearer(user, **profile_ids):
+    """Authorization header value for a fresh access token of ``user``"""
+    return f"Bearer {issue_tokens(user, **profile_ids)['token']}"
@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..idempotency import _claim, _owned
+from ..models import IdempotencyKey, JobApplication
+from .fixtures import bearer, create_applicant, create_company, create_job
+
+
+class IdempotentApplyTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.job = create_job(create_company())
+        self.applicant = create_applicant()
+        self.auth = bearer(self.applicant.user, applicant_id=self.applicant.id)
+
+    def apply(self, key='key-1', **body):
+        body = {'job_id': self.job.id, 'status': 'applied', **body}
+        return self.client.post('/api/applications/', body, content_type='application/json',
+                                HTTP_AUTHORIZATION=self.auth, HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_a_retry_replays_the_stored_response(self):
+        first = self.apply()
+        retry = self.apply()
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(JobApplication.objects.count(), 1)
+
+    def test_a_key_reused_with_another_body_is_rejected(self):
+        self.apply()
+        self.assertEqual(self.apply(status='interview').status_code, 422)
+
+    def test_a_request_in_flight_is_not_run_twice(self):
+        self.apply()
+        IdempotencyKey.objects.update(response_status=None, response_body=None)
+        self.assertEqual(self.apply().status_code, 409)
+
+    @override_settings(IDEMPOTENCY_IN_FLIGHT_SECONDS=30)
+    def test_a_claim_left_in_flight_is_taken_over(self):
+        self.apply()
+        # The first request died before storing its response
+        IdempotencyKey.objects.update(response_status=None, response_body=None,
+                                      created_at=timezone.now() - timedelta(seconds=31))
+        retry = self.apply()
+        self.assertEqual(retry.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', retry)
+        self.assertEqual(IdempotencyKey.objects.get().response_status, 200)
+
+    def test_errors_caught_by_the_view_are_not_stored(self):
+        # Rejected with a generic 400, which may just as well be transient
+        response = self.apply(applicant_id='not a number')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        self.apply(key='key-2', job_id=self.job.id + 1000)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_replayable_client_errors_are_stored(self):
+        other = create_applicant(email='other@example.com')
+        first = self.apply(applicant_id=other.id)
+        retry = self.apply(applicant_id=other.id)
+        self.assertEqual(first.status_code, 403)
+        self.assertEqual(retry.status_code, 403)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+
+    def test_without_a_key_requests_run_every_time(self):
+        body = {'job_id': self.job.id, 'status': 'applied'}
+        statuses = [
+            self.client.post('/api/applications/', body, content_type='application/json',
+                             HTTP_AUTHORIZATION=self.auth).status_code
+            for _ in range(2)
+        ]
+        self.assertEqual(statuses, [201, 200])
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+@override_settings(IDEMPOTENCY_IN_FLIGHT_SECONDS=30)
+class ClaimTakeoverTests(TestCase):
+
+    def test_only_one_retry_takes_over_and_the_original_loses_its_claim(self):
+        original, claimed = _claim('user:1', 'key', 'fingerprint')
+        self.assertTrue(claimed)
+        original.created_at = timezone.now() - timedelta(seconds=31)
+        IdempotencyKey.objects.update(created_at=original.created_at)
+
+        _, first = _claim('user:1', 'key', 'fingerprint')
+        _, second = _claim('user:1', 'key', 'fingerprint')
+        self.assertEqual((first, second), (True, False))
+        self.assertEqual(_owned(original).update(response_status=201), 0)
+
+    def test_a_stale_claim_is_not_taken_over_with_another_body(self):
+        _claim('user:1', 'key', 'fingerprint')
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(seconds=31))
+        record, claimed = _claim('user:1', 'key', 'other')
+        self.assertFalse(claimed)
+        self.assertEqual(record.fingerprint, 'fingerprint')
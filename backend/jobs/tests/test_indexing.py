@@ -0,0 +1,43 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from ..models import OutboxEvent
+from ..outbox import drain_outbox
+from ..search_cache import current_generation
+from .fixtures import create_applicant, create_company, create_job
+
+
+class RelayRefreshTests(TestCase):
+
+    def setUp(self):
+        company = create_company()
+        self.jobs = [create_job(company), create_job(company)]
+        self.applicant = create_applicant()
+        self.client_mock = mock.MagicMock()
+        patches = [
+            mock.patch('jobs.indexing.bulk', return_value=(0, [])),
+            mock.patch('jobs.indexing.es_connections.get_connection', return_value=self.client_mock),
+            mock.patch('jobs.indexing.match_new_jobs'),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_one_refresh_and_generation_bump_per_batch(self):
+        self.assertEqual(set(OutboxEvent.objects.values_list('topic', flat=True)), {'job.sync', 'applicant.sync'})
+        generation = current_generation()
+
+        drain_outbox(batch_size=500)
+
+        self.client_mock.indices.refresh.assert_called_once_with(index='applicants,jobs')
+        self.assertEqual(current_generation(), generation + 1)
+
+    def test_each_batch_refreshes_what_it_wrote(self):
+        generation = current_generation()
+
+        drain_outbox(batch_size=1)
+
+        refreshed = [call.kwargs['index'] for call in self.client_mock.indices.refresh.call_args_list]
+        self.assertEqual(sorted(refreshed), ['applicants', 'jobs', 'jobs'])
+        self.assertEqual(current_generation(), generation + 3)
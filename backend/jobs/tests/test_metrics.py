@@ -0,0 +1,30 @@
+from django.test import TestCase, override_settings
+
+
+class MetricsEndpointTests(TestCase):
+
+    @override_settings(METRICS_TOKEN='', METRICS_ALLOWED_IPS=[])
+    def test_metrics_are_off_by_default(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+    @override_settings(METRICS_TOKEN='scrape-secret', METRICS_ALLOWED_IPS=[])
+    def test_a_scraper_presents_the_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'jobs_http_request_duration_seconds', response.content)
+
+    @override_settings(METRICS_TOKEN='', METRICS_ALLOWED_IPS=['10.0.0.5'])
+    def test_allowed_addresses_scrape_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.5').status_code, 200)
+        # Forwarded addresses are not trusted
+        self.assertEqual(self.client.get('/metrics', HTTP_X_FORWARDED_FOR='10.0.0.5').status_code, 404)
+
+
+class ServerTimingTests(TestCase):
+
+    def test_drf_rendering_is_reported_separately(self):
+        response = self.client.get('/api/auth/profile/')
+        entries = [entry.split(';')[0] for entry in response['Server-Timing'].split(', ')]
+        self.assertEqual(entries, ['total', 'db', 'es', 'cache', 'render'])
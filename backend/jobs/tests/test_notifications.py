@@ -0,0 +1,127 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..models import NotificationEvent
+from ..notifications import (
+    JOB_MATCHED, SINK_FAILURES, STATUS_CHANGED, ConsoleSink, EmailSink, FileSink, NotificationSink, fan_out, notify,
+)
+from .fixtures import create_applicant, create_company, create_job
+
+
+class RecordingSink(NotificationSink):
+    """Keeps what it was handed, failing for the recipients in ``broken``"""
+
+    def __init__(self, name, broken=()):
+        super().__init__(name)
+        self.broken = set(broken)
+        self.delivered = []
+
+    def deliver(self, digests):
+        if self.broken & {digest.recipient_id for digest in digests}:
+            raise RuntimeError('sink is down')
+        self.delivered += [digest.recipient_id for digest in digests]
+
+
+class FanOutTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.job = create_job(create_company())
+        self.first = create_applicant().user
+        self.second = create_applicant(email='second@example.com', name='Grace').user
+
+    def queue(self, user, object_id=1, statuses=('applied', 'interview')):
+        notify([
+            (user.id, STATUS_CHANGED, object_id,
+             {'job_id': self.job.id, 'status': status, 'from_status': previous})
+            for previous, status in zip(statuses, statuses[1:])
+        ])
+
+    def test_events_are_coalesced_into_one_digest_per_recipient(self):
+        self.queue(self.first, statuses=('applied', 'interview', 'offered'))
+        self.queue(self.first, object_id=2, statuses=('applied', 'rejected', 'applied'))
+        notify([(self.second.id, JOB_MATCHED, self.job.id, {'job_id': self.job.id, 'search': 'python'})])
+        sink = RecordingSink('recording')
+
+        stats = fan_out(sinks=[sink])
+        self.assertEqual(sorted(sink.delivered), [self.first.id, self.second.id])
+        self.assertEqual(stats['recording']['digests'], 2)
+        self.assertEqual(stats['recording']['events'], 5)
+        self.assertFalse(NotificationEvent.objects.exists())
+
+    def test_a_failing_sink_does_not_stop_the_others(self):
+        self.queue(self.first)
+        broken = RecordingSink('broken', broken=[self.first.id])
+        working = RecordingSink('working')
+        failures = SINK_FAILURES._values.get(('broken',), 0)
+
+        with self.assertLogs('jobs.notifications', 'ERROR'):
+            stats = fan_out(sinks=[broken, working])
+        self.assertEqual(working.delivered, [self.first.id])
+        self.assertEqual(stats['broken']['failures'], 1)
+        self.assertEqual(SINK_FAILURES._values[('broken',)], failures + 1)
+        # Kept for the next run
+        self.assertEqual(NotificationEvent.objects.count(), 1)
+
+    def test_a_failed_batch_does_not_block_later_recipients(self):
+        self.queue(self.first)
+        self.queue(self.second)
+        sink = RecordingSink('recording', broken=[self.first.id])
+
+        with self.assertLogs('jobs.notifications', 'ERROR'):
+            stats = fan_out(batch_recipients=1, sinks=[sink])
+        self.assertEqual(sink.delivered, [self.second.id])
+        self.assertEqual(stats['recording']['failures'], 1)
+        self.assertEqual(list(NotificationEvent.objects.values_list('recipient_id', flat=True)), [self.first.id])
+
+        sink.broken.clear()
+        fan_out(batch_recipients=1, sinks=[sink])
+        self.assertEqual(sink.delivered, [self.second.id, self.first.id])
+        self.assertFalse(NotificationEvent.objects.exists())
+
+    def test_max_batches_limits_a_run(self):
+        self.queue(self.first)
+        self.queue(self.second)
+        sink = RecordingSink('recording')
+        fan_out(batch_recipients=1, max_batches=1, sinks=[sink])
+        self.assertEqual(sink.delivered, [self.first.id])
+
+
+class SinkTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        job = create_job(create_company(), title='Data Engineer')
+        self.user = create_applicant().user
+        notify([(self.user.id, STATUS_CHANGED, 7, {'job_id': job.id, 'status': 'interview', 'from_status': 'applied'})])
+
+    def test_console_sink(self):
+        stream = io.StringIO()
+        fan_out(sinks=[ConsoleSink('console', stream=stream)])
+        output = stream.getvalue()
+        self.assertIn('To: applicant@example.com', output)
+        self.assertIn('Application 7 for Data Engineer at Acme moved from applied to interview', output)
+
+    def test_file_sink(self):
+        handle, path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        fan_out(sinks=[FileSink('file', path=path)])
+        with open(path) as lines:
+            digests = [json.loads(line) for line in lines]
+        self.assertEqual(len(digests), 1)
+        self.assertEqual(digests[0]['recipient_id'], self.user.id)
+        self.assertEqual(digests[0]['events'], 1)
+        self.assertEqual(digests[0]['items'][0]['payload']['status'], 'interview')
+
+    def test_email_sink(self):
+        fan_out(sinks=[EmailSink('email')])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['applicant@example.com'])
+        self.assertTrue(mail.outbox[0].body.startswith('Hi Ada,'))
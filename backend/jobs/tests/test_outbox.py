@@ -0,0 +1,181 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.core import mail
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import outbox
+from ..models import Experience, OutboxEvent
+from ..tasks import send_welcome_mail
+from .fixtures import create_applicant, create_company
+
+
+class DrainOutboxTests(TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.broken = set()
+        # Snapshot the real handlers too, or tearDown would drop them for good
+        outbox._load_handlers()
+        self.handlers = dict(outbox._handlers)
+        for topic in ('test.ok', 'test.broken'):
+            outbox._handlers[topic] = self.make_handler(topic)
+
+    def tearDown(self):
+        outbox._handlers.clear()
+        outbox._handlers.update(self.handlers)
+
+    def make_handler(self, topic):
+        def handler(events):
+            self.calls.append((topic, [object_id for object_id, _ in events]))
+            if topic in self.broken:
+                raise RuntimeError('search is down')
+        return handler
+
+    def publish(self, topic, object_ids):
+        OutboxEvent.objects.bulk_create([OutboxEvent(topic=topic, object_id=i) for i in object_ids])
+
+    def test_events_are_collapsed_per_object_and_deleted(self):
+        self.publish('test.ok', [1, 2, 1])
+        self.assertEqual(outbox.drain_outbox(), 3)
+        self.assertEqual(self.calls, [('test.ok', [2, 1])])
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_a_failing_topic_does_not_block_the_others(self):
+        self.broken.add('test.broken')
+        self.publish('test.broken', [1, 2])
+        self.publish('test.ok', [3])
+        with self.assertLogs('jobs.outbox', 'ERROR'):
+            self.assertEqual(outbox.drain_outbox(), 1)
+
+        self.assertEqual(self.calls, [('test.broken', [1, 2]), ('test.ok', [3])])
+        pending = OutboxEvent.objects.all()
+        self.assertEqual([event.topic for event in pending], ['test.broken', 'test.broken'])
+        self.assertTrue(all(event.attempts == 1 and event.retry_at > timezone.now() for event in pending))
+
+    def test_backed_off_events_wait_for_retry_at(self):
+        self.broken.add('test.broken')
+        self.publish('test.broken', [1])
+        with self.assertLogs('jobs.outbox', 'ERROR'):
+            outbox.drain_outbox()
+        self.assertEqual(outbox.drain_outbox(), 0)
+
+        self.broken.clear()
+        OutboxEvent.objects.update(retry_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(outbox.drain_outbox(), 1)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_events_are_dead_lettered_after_max_attempts(self):
+        self.broken.add('test.broken')
+        self.publish('test.broken', [1])
+        for _ in range(2):
+            OutboxEvent.objects.update(retry_at=None)
+            with self.assertLogs('jobs.outbox', 'ERROR'):
+                outbox.drain_outbox()
+
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.attempts, 2)
+        self.assertIsNotNone(event.failed_at)
+        self.assertEqual(outbox.drain_outbox(), 0)
+
+        self.broken.clear()
+        self.assertEqual(outbox.requeue_failed('test.broken'), 1)
+        self.assertEqual(outbox.drain_outbox(), 1)
+
+    def test_a_failing_handler_only_rolls_back_its_own_writes(self):
+        def writes_then_fails(events):
+            self.publish('test.ok', [99])
+            raise RuntimeError('half done')
+
+        outbox._handlers['test.broken'] = writes_then_fails
+        self.publish('test.broken', [1])
+        with self.assertLogs('jobs.outbox', 'ERROR'):
+            outbox.drain_outbox()
+        self.assertEqual(list(OutboxEvent.objects.values_list('topic', 'object_id')), [('test.broken', 1)])
+
+
+class WelcomeMailTests(TestCase):
+
+    def setUp(self):
+        self.users = [create_applicant().user, create_company().user]
+        # Only the registrations, the profiles' index syncs need Elasticsearch
+        OutboxEvent.objects.all().delete()
+        OutboxEvent.objects.bulk_create([
+            OutboxEvent(topic='user.registered', object_id=user.id) for user in self.users
+        ])
+
+    def test_mail_is_queued_once_the_batch_commits(self):
+        with mock.patch('jobs.tasks.send_welcome_mail.delay') as delay:
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.assertEqual(outbox.drain_outbox(), 2)
+            # Nothing is sent or queued inside the relay's transaction
+            delay.assert_not_called()
+            self.assertEqual(mail.outbox, [])
+            for callback in callbacks:
+                callback()
+        delay.assert_called_once_with([user.id for user in self.users])
+
+    def test_a_rolled_back_batch_queues_no_mail(self):
+        with mock.patch('jobs.tasks.send_welcome_mail.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    outbox.drain_outbox()
+                    transaction.set_rollback(True)
+        delay.assert_not_called()
+        self.assertTrue(OutboxEvent.objects.exists())
+
+    def test_an_unreachable_broker_does_not_fail_the_batch(self):
+        with mock.patch('jobs.tasks.send_welcome_mail.delay', side_effect=ConnectionError('broker is down')):
+            with self.assertLogs('jobs.onboarding', 'WARNING'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    outbox.drain_outbox()
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_welcome_mails_are_sent_by_role(self):
+        self.assertEqual(send_welcome_mail([user.id for user in self.users]), 2)
+        bodies = {message.to[0]: message.body for message in mail.outbox}
+        self.assertEqual(sorted(bodies), ['applicant@example.com', 'company@example.com'])
+        self.assertIn('Post your first job', bodies['company@example.com'])
+
+
+class ProfileOutboxTests(TestCase):
+    """Profile changes and their applicant.sync events commit together"""
+
+    databases = {'default', 'replica_0'}
+
+    def setUp(self):
+        self.applicant = create_applicant()
+
+    def failing_publish(self):
+        return mock.patch('jobs.outbox.publish', side_effect=RuntimeError('outbox insert failed'))
+
+    def test_a_failing_publish_rolls_back_the_applicant_update(self):
+        self.applicant.skills = 'rust'
+        with self.failing_publish(), self.assertRaises(RuntimeError):
+            self.applicant.save()
+        self.applicant.refresh_from_db()
+        self.assertEqual(self.applicant.skills, 'python, django')
+
+    def test_a_failing_publish_rolls_back_the_user_update(self):
+        user = self.applicant.user
+        user.name = 'Grace'
+        with self.failing_publish(), self.assertRaises(RuntimeError):
+            user.save()
+        user.refresh_from_db()
+        self.assertEqual(user.name, 'Ada')
+
+    def test_a_failing_publish_rolls_back_the_new_experience(self):
+        with self.failing_publish(), self.assertRaises(RuntimeError):
+            Experience.objects.create(applicant=self.applicant, company_name='Initech', job_title='Developer',
+                                      start_date=date(2020, 1, 1), description='Reports', skills='python')
+        self.assertFalse(Experience.objects.exists())
+
+    def test_profile_changes_publish_to_the_database_they_were_written_to(self):
+        applicant = create_applicant(email='elsewhere@example.com', using='replica_0')
+        OutboxEvent.objects.using('replica_0').all().delete()
+        applicant.user.save(using='replica_0')
+        self.assertEqual(list(OutboxEvent.objects.using('replica_0').values_list('topic', 'object_id')),
+                         [('applicant.sync', applicant.id)])
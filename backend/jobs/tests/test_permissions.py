@@ -0,0 +1,54 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..models import JobApplication
+from ..revocation import sync_revocations
+from .fixtures import bearer, create_applicant, create_company, create_job
+
+
+class ApplicationOwnershipTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        sync_revocations(force=True)
+        self.company = create_company()
+        self.applicant = create_applicant()
+        self.application = JobApplication.objects.create(
+            job=create_job(self.company), applicant=self.applicant, status='applied')
+        self.url = f'/api/applications/{self.application.id}/'
+        self.company_auth = bearer(self.company.user, company_id=self.company.id)
+        self.applicant_auth = bearer(self.applicant.user, applicant_id=self.applicant.id)
+
+    def put(self, auth, status='interview'):
+        return self.client.put(self.url, {'status': status}, content_type='application/json',
+                               HTTP_AUTHORIZATION=auth)
+
+    def test_the_hiring_company_updates_the_status(self):
+        response = self.put(self.company_auth)
+        self.assertEqual(response.status_code, 200)
+        self.application.refresh_from_db()
+        self.assertEqual(self.application.status, 'interview')
+
+    def test_the_applicant_updates_the_status(self):
+        self.assertEqual(self.put(self.applicant_auth).status_code, 200)
+
+    def test_other_companies_and_applicants_are_denied(self):
+        other_company = create_company(email='other@example.com', name='Other')
+        other_applicant = create_applicant(email='someone@example.com')
+        self.assertEqual(self.put(bearer(other_company.user, company_id=other_company.id)).status_code, 403)
+        self.assertEqual(self.put(bearer(other_applicant.user, applicant_id=other_applicant.id)).status_code, 403)
+        self.application.refresh_from_db()
+        self.assertEqual(self.application.status, 'applied')
+
+    def test_only_the_applicant_deletes(self):
+        response = self.client.delete(self.url, HTTP_AUTHORIZATION=self.company_auth)
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(JobApplication.objects.filter(pk=self.application.pk).exists())
+
+        response = self.client.delete(self.url, HTTP_AUTHORIZATION=self.applicant_auth)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(JobApplication.objects.filter(pk=self.application.pk).exists())
+
+    def test_an_unknown_application_is_not_found(self):
+        self.url = '/api/applications/999/'
+        self.assertEqual(self.put(self.company_auth).status_code, 404)
@@ -0,0 +1,119 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from ..models import Applicant, Company, Job, JobApplication
+from ..query_budget import QueryBudgetExceeded, assert_query_count_stable
+from ..revocation import sync_revocations
+from .fixtures import bearer, create_applicant, create_company, create_job
+
+
+class ListQueryCountTests(TestCase):
+    """List endpoints run the same queries for 1, 5 or 25 rows"""
+
+    def setUp(self):
+        cache.clear()
+        sync_revocations(force=True)
+        self.company = create_company()
+        self.applicant = create_applicant()
+        self.auth = bearer(self.applicant.user, applicant_id=self.applicant.id)
+
+    def get(self, url, auth=None):
+        def make_request():
+            # Cold caches, so every run does the same lookups
+            cache.clear()
+            response = self.client.get(url, HTTP_AUTHORIZATION=auth) if auth else self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+        return make_request
+
+    def add_companies(self, n):
+        while Company.objects.count() < n:
+            create_company(email=f'company{Company.objects.count()}@example.com')
+
+    def add_jobs(self, n, company=None):
+        while Job.objects.count() < n:
+            create_job(company or create_company(email=f'hiring{Job.objects.count()}@example.com'))
+
+    def add_applications(self, n, applicant=None):
+        while JobApplication.objects.count() < n:
+            job = create_job(self.company, title=f'Job {Job.objects.count()}')
+            JobApplication.objects.create(applicant=applicant or self.applicant, job=job, status='applied')
+
+    def test_job_list(self):
+        assert_query_count_stable(self, self.add_jobs, self.get('/api/jobs/'))
+
+    def test_company_list(self):
+        assert_query_count_stable(self, self.add_companies, self.get('/api/companies/'))
+
+    def test_jobs_by_company(self):
+        assert_query_count_stable(
+            self, lambda n: self.add_jobs(n, self.company),
+            self.get(f'/api/companies/{self.company.id}/jobs/', self.auth))
+
+    def test_applicant_list(self):
+        def add_applicants(n):
+            while Applicant.objects.count() < n:
+                create_applicant(email=f'applicant{Applicant.objects.count()}@example.com')
+
+        assert_query_count_stable(self, add_applicants, self.get('/api/applicants/', self.auth))
+
+    def test_application_list(self):
+        def add_applications(n):
+            # Applications of different applicants, each with its own user
+            while JobApplication.objects.count() < n:
+                applicant = create_applicant(email=f'other{JobApplication.objects.count()}@example.com')
+                JobApplication.objects.create(applicant=applicant, job=create_job(self.company), status='applied')
+
+        assert_query_count_stable(self, add_applications, self.get('/api/applications/', self.auth))
+
+    def test_applications_by_applicant(self):
+        assert_query_count_stable(
+            self, self.add_applications,
+            self.get(f'/api/applicants/{self.applicant.id}/applications/', self.auth))
+
+
+class QueryBudgetEnforcementTests(TestCase):
+
+    def setUp(self):
+        company = create_company()
+        create_job(company)
+        create_job(company)
+
+    @override_settings(QUERY_BUDGETS={'job-list': 0})
+    def test_raise_mode_fails_with_the_queries_run(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'budget is 0'):
+            self.client.get('/api/jobs/')
+
+    @override_settings(QUERY_BUDGETS={'job-list': 0}, QUERY_BUDGET_MODE='warn')
+    def test_warn_mode_logs_and_responds(self):
+        with self.assertLogs('jobs.performance', 'WARNING') as logs:
+            response = self.client.get('/api/jobs/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('budget is 0', logs.output[0])
+
+    @override_settings(QUERY_BUDGETS={'job-list': 0}, QUERY_BUDGET_MODE='off')
+    def test_off_mode_ignores_budgets(self):
+        self.assertEqual(self.client.get('/api/jobs/').status_code, 200)
+
+    def test_decorated_budget_wins_over_the_settings_map(self):
+        # ApplicationsByApplicantView declares @query_budget(5)
+        applicant = create_applicant()
+        with override_settings(QUERY_BUDGETS={'applications-by-applicant': 0}):
+            response = self.client.get(f'/api/applicants/{applicant.id}/applications/',
+                                       HTTP_AUTHORIZATION=bearer(applicant.user, applicant_id=applicant.id))
+        self.assertEqual(response.status_code, 200)
+
+    def test_duplicated_queries_are_listed(self):
+        from ..query_budget import describe_queries
+
+        described = describe_queries([
+            'SELECT * FROM job WHERE id = 1', 'SELECT * FROM job WHERE id = 2', 'SELECT 1',
+        ])
+        self.assertEqual(described, '  2x SELECT * FROM job WHERE id = ?')
+
+    def test_placeholder_sql_from_the_execute_wrapper_is_grouped(self):
+        from ..query_budget import duplicate_queries
+
+        duplicates = duplicate_queries([
+            'SELECT * FROM job WHERE id = %s', 'SELECT  *  FROM job WHERE id = %s', "SELECT * FROM job WHERE id = 3",
+        ])
+        self.assertEqual(duplicates, [('SELECT * FROM job WHERE id = %s', 2)])
@@ -0,0 +1,68 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from ..checks import check_replica_sticky_cache
+from .fixtures import PASSWORD, create_company, create_job
+
+REDIS_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379/1'}}
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'])
+class ReplicaRoutingTests(TestCase):
+    databases = {'default', 'replica_0'}
+
+    def setUp(self):
+        cache.clear()
+        company = create_company()
+        self.job = create_job(company, title='On the primary')
+        # The replica lags behind: same row, older title
+        replica_company = create_company(using='replica_0')
+        create_job(replica_company, title='On the replica', using='replica_0', id=self.job.id)
+        self.url = f'/api/jobs/{self.job.id}/'
+
+    def title(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['title']
+
+    def test_safe_reads_of_routed_views_use_a_replica(self):
+        self.assertEqual(self.title(), 'On the replica')
+
+    @override_settings(REPLICA_ROUTED_VIEWS=['job-list'])
+    def test_views_not_listed_read_the_primary(self):
+        self.assertEqual(self.title(), 'On the primary')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_reads_the_primary(self):
+        self.assertEqual(self.title(), 'On the primary')
+
+    def test_a_write_pins_the_caller_to_the_primary(self):
+        response = self.client.post('/api/auth/login/', {'email': 'company@example.com', 'password': PASSWORD},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.title(), 'On the primary')
+        self.assertEqual(self.client.get(self.url, REMOTE_ADDR='10.0.0.2').json()['title'], 'On the replica')
+
+        # The sticky window is over
+        cache.clear()
+        self.assertEqual(self.title(), 'On the replica')
+
+    def test_a_failed_write_does_not_pin(self):
+        response = self.client.post('/api/auth/login/', {'email': 'company@example.com', 'password': 'wrong'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.title(), 'On the replica')
+
+
+class ReplicaStickyCacheCheckTests(TestCase):
+
+    @override_settings(DATABASE_REPLICAS=['replica_0'])
+    def test_replicas_with_a_process_local_cache_fail(self):
+        self.assertEqual([error.id for error in check_replica_sticky_cache(None)], ['jobs.E001'])
+
+    @override_settings(DATABASE_REPLICAS=['replica_0'], CACHES=REDIS_CACHE)
+    def test_replicas_with_a_shared_cache_pass(self):
+        self.assertEqual(check_replica_sticky_cache(None), [])
+
+    def test_no_replicas_pass(self):
+        self.assertEqual(check_replica_sticky_cache(None), [])
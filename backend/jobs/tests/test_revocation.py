@@ -0,0 +1,101 @@
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from .. import revocation
+from ..auth import decode_jwt_token, issue_tokens, principal_from_token, revoke_user_tokens
+from ..models import RefreshToken, RevokedToken
+from ..revocation import RevocationList, revoke, revoked_tokens, sync_revocations
+from .fixtures import create_applicant
+
+
+class RevocationListTests(TestCase):
+
+    def test_tokens_are_found_in_their_expiry_bucket(self):
+        tokens = RevocationList(60)
+        exp = time.time() + 300
+        tokens.add('a', exp)
+        self.assertTrue(tokens.contains('a', exp))
+        self.assertFalse(tokens.contains('b', exp))
+        self.assertFalse(tokens.contains('a', exp + 120))
+
+    def test_expired_tokens_are_not_kept(self):
+        tokens = RevocationList(60)
+        tokens.add('a', time.time() - 1)
+        self.assertEqual(len(tokens), 0)
+
+    def test_eviction_drops_whole_expired_buckets(self):
+        tokens = RevocationList(60)
+        now = time.time()
+        tokens.add('soon', now + 30)
+        tokens.add('later', now + 600)
+        tokens.evict(now=now + 300)
+        self.assertFalse(tokens.contains('soon', now + 30))
+        self.assertTrue(tokens.contains('later', now + 600))
+        self.assertEqual(len(tokens), 1)
+
+
+class TokenRevocationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        revoked_tokens.clear()
+        revocation._sync.last_id = 0
+        revocation._sync.next_sync = 0.0
+        self.applicant = create_applicant()
+        self.tokens = issue_tokens(self.applicant.user, applicant_id=self.applicant.id)
+
+    def profile(self, token):
+        return self.client.get('/api/auth/profile/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_a_revoked_token_no_longer_authenticates(self):
+        token = self.tokens['token']
+        self.assertIsNotNone(principal_from_token(token))
+        payload = decode_jwt_token(token)
+        revoke(payload['jti'], payload['exp'])
+        self.assertIsNone(principal_from_token(token))
+        self.assertTrue(RevokedToken.objects.filter(jti=payload['jti']).exists())
+
+    def test_revocations_of_other_processes_are_synced(self):
+        token = self.tokens['token']
+        payload = decode_jwt_token(token)
+        sync_revocations(force=True)
+        expires_at = datetime.fromtimestamp(payload['exp'], tz=dt_timezone.utc)
+        # Written by another process, unknown here until the next sync
+        RevokedToken.objects.create(jti=payload['jti'], expires_at=expires_at)
+        self.assertIsNotNone(principal_from_token(token))
+        sync_revocations(force=True)
+        self.assertIsNone(principal_from_token(token))
+
+    def test_logout_revokes_the_access_and_refresh_token(self):
+        token = self.tokens['token']
+        response = self.client.post('/api/auth/logout/', {'refresh_token': self.tokens['refresh_token']},
+                                    content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.profile(token).status_code, 401)
+        refreshed = self.client.post('/api/auth/refresh/', {'refresh_token': self.tokens['refresh_token']},
+                                     content_type='application/json')
+        self.assertEqual(refreshed.status_code, 401)
+
+    def test_a_refresh_token_works_once(self):
+        refresh = lambda raw: self.client.post(
+            '/api/auth/refresh/', {'refresh_token': raw}, content_type='application/json')
+        first = refresh(self.tokens['refresh_token'])
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.profile(first.json()['token']).status_code, 200)
+
+        # Reusing the rotated token revokes the whole family
+        self.assertEqual(refresh(self.tokens['refresh_token']).status_code, 401)
+        self.assertEqual(refresh(first.json()['refresh_token']).status_code, 401)
+        self.assertFalse(RefreshToken.objects.filter(revoked_at__isnull=True).exists())
+
+    def test_revoking_all_tokens_of_a_user(self):
+        token = self.tokens['token']
+        self.assertEqual(self.profile(token).status_code, 200)
+        revoke_user_tokens(self.applicant.user_id)
+        self.assertEqual(self.profile(token).status_code, 401)
+        self.applicant.user.refresh_from_db()
+        fresh = issue_tokens(self.applicant.user, applicant_id=self.applicant.id)['token']
+        self.assertEqual(self.profile(fresh).status_code, 200)
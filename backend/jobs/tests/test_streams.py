@@ -0,0 +1,118 @@
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..auth import issue_tokens, revoke_user_tokens
+from ..models import RedeemedStreamTicket
+from ..revocation import purge_expired_revocations, sync_revocations
+from ..streams import application_stream
+from .fixtures import create_applicant
+
+
+class StreamClient:
+    """Drives one ASGI stream request, disconnecting once ``ready`` arrives"""
+
+    def __init__(self, disconnect_when_ready=True):
+        self.disconnect_when_ready = disconnect_when_ready
+        self.messages = []
+        self.disconnected = asyncio.Event()
+
+    async def receive(self):
+        await self.disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        self.messages.append(message)
+        if self.disconnect_when_ready and b'event: ready' in message.get('body', b''):
+            self.disconnected.set()
+
+    async def open(self, applicant_id, token=None, query=b''):
+        headers = [(b'authorization', f'Bearer {token}'.encode())] if token else []
+        scope = {'type': 'http', 'method': 'GET', 'headers': headers, 'query_string': query}
+        await asyncio.wait_for(application_stream(scope, self.receive, self.send, applicant_id), timeout=5)
+        return self.messages[0]['status']
+
+    @property
+    def body(self):
+        return b''.join(message.get('body', b'') for message in self.messages[1:])
+
+
+class ApplicationStreamTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        sync_revocations(force=True)
+        self.applicant = create_applicant()
+        self.token = issue_tokens(self.applicant.user, applicant_id=self.applicant.id)['token']
+
+    def ticket(self, applicant_id=None):
+        return self.client.post(f'/api/applicants/{applicant_id or self.applicant.id}/applications/stream/ticket/',
+                                HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    async def test_a_bearer_header_opens_the_stream(self):
+        client = StreamClient()
+        self.assertEqual(await client.open(self.applicant.id, token=self.token), 200)
+        self.assertIn(b'event: ready', client.body)
+
+    async def test_access_tokens_in_the_query_string_are_refused(self):
+        query = f'access_token={self.token}'.encode()
+        self.assertEqual(await StreamClient().open(self.applicant.id, query=query), 401)
+
+    async def test_a_ticket_opens_the_stream_once(self):
+        response = await sync_to_async(self.ticket)()
+        self.assertEqual(response.status_code, 200)
+        query = f"ticket={response.json()['ticket']}".encode()
+        self.assertEqual(await StreamClient().open(self.applicant.id, query=query), 200)
+        self.assertEqual(await StreamClient().open(self.applicant.id, query=query), 401)
+
+    async def test_a_used_ticket_is_refused_by_every_process(self):
+        query = f"ticket={(await sync_to_async(self.ticket)()).json()['ticket']}".encode()
+        self.assertEqual(await StreamClient().open(self.applicant.id, query=query), 200)
+        # Another worker shares the database, not this process's cache
+        await sync_to_async(cache.clear)()
+        self.assertEqual(await StreamClient().open(self.applicant.id, query=query), 401)
+
+    def test_expired_ticket_records_are_purged(self):
+        RedeemedStreamTicket.objects.create(nonce='old', expires_at=timezone.now() - timedelta(seconds=1))
+        RedeemedStreamTicket.objects.create(nonce='new', expires_at=timezone.now() + timedelta(seconds=30))
+        purge_expired_revocations()
+        self.assertEqual(list(RedeemedStreamTicket.objects.values_list('nonce', flat=True)), ['new'])
+
+    async def test_a_ticket_only_opens_its_own_stream(self):
+        other = await sync_to_async(create_applicant)(email='other@example.com')
+        query = f"ticket={(await sync_to_async(self.ticket)()).json()['ticket']}".encode()
+        self.assertEqual(await StreamClient().open(other.id, query=query), 403)
+
+    async def test_tickets_expire(self):
+        query = f"ticket={(await sync_to_async(self.ticket)()).json()['ticket']}".encode()
+        with override_settings(STREAM_TICKET_SECONDS=-1):
+            self.assertEqual(await StreamClient().open(self.applicant.id, query=query), 401)
+
+    async def test_tickets_of_revoked_tokens_are_refused(self):
+        query = f"ticket={(await sync_to_async(self.ticket)()).json()['ticket']}".encode()
+        await sync_to_async(revoke_user_tokens)(self.applicant.user_id)
+        self.assertEqual(await StreamClient().open(self.applicant.id, query=query), 401)
+
+    def test_tickets_are_only_issued_to_the_owner(self):
+        other = create_applicant(email='other@example.com')
+        self.assertEqual(self.ticket(applicant_id=other.id).status_code, 403)
+        self.assertEqual(self.client.post(
+            f'/api/applicants/{self.applicant.id}/applications/stream/ticket/').status_code, 401)
+
+    @override_settings(STREAM_HEARTBEAT_SECONDS=0.01)
+    async def test_the_stream_ends_at_the_heartbeat_after_revocation(self):
+        client = StreamClient(disconnect_when_ready=False)
+
+        async def revoke_when_ready():
+            while not client.messages[1:]:
+                await asyncio.sleep(0.01)
+            await sync_to_async(revoke_user_tokens)(self.applicant.user_id)
+
+        revoker = asyncio.ensure_future(revoke_when_ready())
+        self.assertEqual(await client.open(self.applicant.id, token=self.token), 200)
+        await revoker
+        self.assertFalse(client.messages[-1]['more_body'])
@@ -0,0 +1,84 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ..throttling import MemoryCounterStore, RedisCounterStore, get_store, parse_rate, sliding_count
+from .fixtures import PASSWORD, create_applicant
+
+
+class SlidingWindowTests(SimpleTestCase):
+
+    def test_rates_are_parsed(self):
+        self.assertEqual(parse_rate('5/min'), (5, 60))
+        self.assertEqual(parse_rate('10/hour'), (10, 3600))
+
+    def test_the_previous_window_fades_out(self):
+        self.assertEqual(sliding_count(10, 2, 0, 60), 12)
+        self.assertEqual(sliding_count(10, 2, 30, 60), 7)
+        self.assertEqual(sliding_count(10, 2, 60, 60), 2)
+
+
+class MemoryCounterStoreTests(SimpleTestCase):
+
+    def test_hits_beyond_the_limit_are_refused(self):
+        store = MemoryCounterStore()
+        allowed = [store.acquire('key', 3, 60, now=600) for _ in range(4)]
+        self.assertEqual(allowed, [True, True, True, False])
+        # Other keys and windows count separately
+        self.assertTrue(store.acquire('other', 3, 60, now=600))
+        self.assertTrue(store.acquire('key', 3, 3600, now=600))
+
+    def test_refused_hits_are_not_counted(self):
+        store = MemoryCounterStore()
+        for _ in range(10):
+            store.acquire('key', 2, 60, now=600)
+        # Half a window later only half of the two counted hits remain
+        self.assertTrue(store.acquire('key', 2, 60, now=690))
+        self.assertFalse(store.acquire('key', 2, 60, now=690))
+
+    def test_hits_slide_out_of_the_window(self):
+        store = MemoryCounterStore()
+        for _ in range(4):
+            store.acquire('key', 4, 60, now=650)
+        self.assertFalse(store.acquire('key', 4, 60, now=655))
+        # 40s into the next window a third of the previous one still counts
+        allowed = [store.acquire('key', 4, 60, now=700) for _ in range(4)]
+        self.assertEqual(allowed, [True, True, True, False])
+
+    def test_expired_windows_are_swept(self):
+        store = MemoryCounterStore()
+        store.SWEEP_EVERY = 2
+        store.acquire('old', 5, 60, now=0)
+        store.acquire('new', 5, 60, now=600)
+        self.assertEqual([entry[0] for entry in store._counts], ['new'])
+
+
+class RedisCounterStoreTests(SimpleTestCase):
+
+    def test_an_unreachable_store_allows_requests(self):
+        store = RedisCounterStore('redis://127.0.0.1:1/0')
+        with self.assertLogs('jobs.throttling', 'WARNING'):
+            self.assertTrue(store.acquire('key', 1, 60))
+
+
+@override_settings(AUTH_THROTTLE_RATES={'login': {'ip': '100/min', 'email': '2/min'}})
+class LoginThrottleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        get_store().clear()
+        self.applicant = create_applicant()
+
+    def login(self, email, password=PASSWORD):
+        return self.client.post('/api/auth/login/', {'email': email, 'password': password},
+                                content_type='application/json')
+
+    def test_attempts_per_email_are_limited(self):
+        email = self.applicant.user.email
+        self.assertEqual(self.login(email, 'wrong').status_code, 401)
+        self.assertEqual(self.login(email).status_code, 200)
+        response = self.login(email)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        # Addresses are compared case insensitively
+        self.assertEqual(self.login(email.upper()).status_code, 429)
+        self.assertEqual(self.login('someone@example.com').status_code, 401)
@@ -0,0 +1,156 @@
+"""
+Sliding window throttling for the credential endpoints.
+
+Each limit counts hits in fixed windows and estimates the sliding window
+as ``previous * (1 - elapsed / window) + current``, which needs two counters
+per key instead of a log of timestamps. Views opt in with
+``throttle_classes = [SlidingWindowThrottle]`` and a ``throttle_scope`` naming
+their entry in ``AUTH_THROTTLE_RATES``; every scope limits per client IP and
+per submitted email. DRF runs throttles before the handler, so a rejected
+attempt costs no query and no password hash.
+
+Counters live in Redis when ``THROTTLE_REDIS_URL`` is set, so limits hold
+across processes, and in process memory otherwise.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    """``'5/min'`` to ``(5, 60)``"""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period]
+
+
+def sliding_count(previous, current, elapsed, window):
+    return previous * (1 - elapsed / window) + current
+
+
+class MemoryCounterStore:
+    """Window counters in process memory, for tests and single process setups"""
+
+    SWEEP_EVERY = 1024
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+
+    def acquire(self, key, limit, window, now=None):
+        """Count a hit unless the sliding window is full, return whether it was"""
+        now = time.time() if now is None else now
+        index, elapsed = divmod(now, window)
+        index = int(index)
+        with self._lock:
+            self._hits += 1
+            if self._hits % self.SWEEP_EVERY == 0:
+                self._sweep(now)
+            current = self._counts.get((key, window, index), 0)
+            previous = self._counts.get((key, window, index - 1), 0)
+            if sliding_count(previous, current, elapsed, window) >= limit:
+                return False
+            self._counts[(key, window, index)] = current + 1
+            return True
+
+    def _sweep(self, now):
+        for entry in [entry for entry in self._counts if entry[2] < int(now // entry[1]) - 1]:
+            del self._counts[entry]
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+
+class RedisCounterStore:
+    """Window counters in Redis, checked and incremented in one round trip"""
+
+    SCRIPT = """
+    local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+    if previous * tonumber(ARGV[1]) + current >= tonumber(ARGV[2]) then
+        return 0
+    end
+    redis.call('INCR', KEYS[1])
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    return 1
+    """
+
+    def __init__(self, url):
+        import redis
+
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def acquire(self, key, limit, window, now=None):
+        now = time.time() if now is None else now
+        index, elapsed = divmod(now, window)
+        index = int(index)
+        try:
+            return bool(self._script(
+                keys=[f'throttle:{key}:{window}:{index}', f'throttle:{key}:{window}:{index - 1}'],
+                args=[1 - elapsed / window, limit, window * 2],
+            ))
+        except Exception:
+            # An unreachable store must not lock everybody out of their account
+            logger.warning('Throttle store unavailable, allowing request', exc_info=True)
+            return True
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                url = settings.THROTTLE_REDIS_URL
+                _store = RedisCounterStore(url) if url else MemoryCounterStore()
+    return _store
+
+
+def _email_key(request):
+    try:
+        email = request.data.get('email')
+    except Exception:
+        return None
+    if not isinstance(email, str) or not email.strip():
+        return None
+    # Keys are hashed so the store never holds addresses
+    return hashlib.blake2b(email.strip().lower().encode(), digest_size=12).hexdigest()
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """Per IP and per email limits for the view's ``throttle_scope``"""
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        rates = settings.AUTH_THROTTLE_RATES.get(scope) if scope else None
+        if not rates or request.method != 'POST':
+            return True
+
+        identities = {'ip': self.get_ident(request), 'email': _email_key(request)}
+        store = get_store()
+        for kind, rate in rates.items():
+            identity = identities.get(kind)
+            if identity is None:
+                continue
+            limit, window = parse_rate(rate)
+            if not store.acquire(f'{scope}:{kind}:{identity}', limit, window):
+                exception = Throttled(detail={'error': 'Too many attempts, try again later'})
+                # The sliding window frees up about one attempt per window / limit
+                exception.wait = math.ceil(window / limit)
+                raise exception
+        return True
@@ -0,0 +1,61 @@
+"""
+Per-process cache of verified JWT payloads.
+
+Clients send the same access token for every request until it expires, so
+signature checking, base64 and JSON decoding are done once per token and
+process. Entries are keyed by a digest of the token, never outlive the
+token's ``exp`` and are evicted least recently used beyond
+``JWT_VERIFIED_CACHE_SIZE``. Only verification is cached: revocation and the
+token version are still checked on every request.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class VerifiedTokenCache:
+    """Bounded LRU mapping token digests to decoded payloads"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def digest(token):
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def get(self, digest):
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        payload, expires_at = entry
+        with self._lock:
+            if expires_at <= time.time():
+                self._entries.pop(digest, None)
+                return None
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+        return payload
+
+    def put(self, digest, payload):
+        if self.maxsize <= 0 or 'exp' not in payload:
+            return
+        with self._lock:
+            self._entries[digest] = (payload, payload['exp'])
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+verified_tokens = VerifiedTokenCache(settings.JWT_VERIFIED_CACHE_SIZE)
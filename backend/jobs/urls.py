@@ -9,6 +9,8 @@ urlpatterns = [
     # Authentication endpoints
     path('auth/register/', views.RegisterView.as_view(), name='register'),
     path('auth/login/', views.LoginView.as_view(), name='login'),
+    path('auth/refresh/', views.RefreshTokenView.as_view(), name='token-refresh'),
+    path('auth/logout/', views.LogoutView.as_view(), name='logout'),
     path('auth/profile/', views.ProfileView.as_view(), name='profile'),
     
     # User endpoints
@@ -18,19 +20,26 @@ urlpatterns = [
     # Applicant endpoints
     path('applicants/', views.ApplicantListView.as_view(), name='applicant-list'),
     path('applicants/<int:applicant_id>/', views.ApplicantDetailView.as_view(), name='applicant-detail'),
+    path('applicants/search/', views.ApplicantSearchView.as_view(), name='applicant-search'),
     
     # Company endpoints
     path('companies/', views.CompanyListView.as_view(), name='company-list'),
     path('companies/<int:company_id>/', views.CompanyDetailView.as_view(), name='company-detail'),
+    path('companies/<int:company_id>/dashboard/', views.CompanyDashboardView.as_view(), name='company-dashboard'),
     
     # Job endpoints
     path('jobs/', views.JobListView.as_view(), name='job-list'),
     path('jobs/<int:job_id>/', views.JobDetailView.as_view(), name='job-detail'),
     path('jobs/search/', job_search_views.search_jobs, name='job-search'),
+    path('jobs/stats/salary/', views.SalaryStatsView.as_view(), name='salary-stats'),
     
     # Experience endpoints
     path('experiences/<int:applicant_id>/', views.ExperienceListView.as_view(), name='experience-list'),
     
+    # Saved search (job alert) endpoints
+    path('saved-searches/', views.SavedSearchListView.as_view(), name='saved-search-list'),
+    path('saved-searches/<int:saved_search_id>/', views.SavedSearchDetailView.as_view(), name='saved-search-detail'),
+    
     # Job Application endpoints
     path('applications/', views.JobApplicationListView.as_view(), name='application-list'),
     path('applications/<int:application_id>/', views.JobApplicationDetailView.as_view(), name='application-detail'),
@@ -38,5 +47,6 @@ urlpatterns = [
     # Additional utility endpoints
     path('companies/<int:company_id>/jobs/', views.JobsByCompanyView.as_view(), name='jobs-by-company'),
     path('applicants/<int:applicant_id>/applications/', views.ApplicationsByApplicantView.as_view(), name='applications-by-applicant'),
+    path('applicants/<int:applicant_id>/applications/stream/ticket/', views.ApplicationStreamTicketView.as_view(), name='application-stream-ticket'),
     path('applicants/<int:applicant_id>/experiences/', views.ExperiencesByApplicantView.as_view(), name='experiences-by-applicant'),
 ]
\ No newline at end of file
@@ -1,11 +1,16 @@
 from .user_views import UserListView, UserDetailView
 from .applicant_views import ApplicantListView, ApplicantDetailView
-from .company_views import CompanyListView, CompanyDetailView
+from .company_views import CompanyListView, CompanyDetailView, CompanyDashboardView
 from .job_views import JobListView, JobDetailView
 from .experience_views import ExperienceListView
 from .job_application_views import JobApplicationListView, JobApplicationDetailView
-from .utility_views import JobsByCompanyView, ApplicationsByApplicantView, ExperiencesByApplicantView
-from .auth_views import RegisterView, LoginView, ProfileView
+from .utility_views import (
+    JobsByCompanyView, ApplicationsByApplicantView, ApplicationStreamTicketView, ExperiencesByApplicantView,
+)
+from .auth_views import RegisterView, LoginView, RefreshTokenView, LogoutView, ProfileView
+from .stats_views import SalaryStatsView
+from .applicant_search_views import ApplicantSearchView
+from .saved_search_views import SavedSearchListView, SavedSearchDetailView
 from . import job_search_views
 
 def index(request):
@@ -20,6 +25,7 @@ __all__ = [
     'ApplicantDetailView',
     'CompanyListView',
     'CompanyDetailView',
+    'CompanyDashboardView',
     'JobListView',
     'JobDetailView',
     'ExperienceListView',
@@ -27,9 +33,16 @@ __all__ = [
     'JobApplicationDetailView',
     'JobsByCompanyView',
     'ApplicationsByApplicantView',
+    'ApplicationStreamTicketView',
     'ExperiencesByApplicantView',
     'RegisterView',
     'LoginView',
+    'RefreshTokenView',
+    'LogoutView',
     'ProfileView',
+    'SalaryStatsView',
+    'ApplicantSearchView',
+    'SavedSearchListView',
+    'SavedSearchDetailView',
     'job_search_views',
 ]
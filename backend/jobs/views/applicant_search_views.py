@@ -0,0 +1,146 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+from ..auth import require_role
+from ..documents import ApplicantDocument, skill_tags
+from ..instrumentation import track_es
+from ..search_cache import cached_search, make_key
+from .job_search_views import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, _positive_int
+
+SEARCH_FIELDS = ['skills^2', 'experience_titles^2', 'experience_companies', 'name']
+SORTS = ('relevance', 'experience')
+
+applicant_hit_schema = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        'id': openapi.Schema(type=openapi.TYPE_INTEGER),
+        'name': openapi.Schema(type=openapi.TYPE_STRING),
+        'skills': openapi.Schema(type=openapi.TYPE_STRING),
+        'experience_titles': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING)),
+        'experience_companies': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING)),
+        'years_of_experience': openapi.Schema(type=openapi.TYPE_NUMBER),
+        'linkedin': openapi.Schema(type=openapi.TYPE_STRING),
+        'github': openapi.Schema(type=openapi.TYPE_STRING),
+    }
+)
+
+
+def serialize_hit(hit):
+    """Render an applicant search hit without touching the DB"""
+    return {
+        'id': int(hit.meta.id),
+        'name': getattr(hit, 'name', None),
+        'skills': getattr(hit, 'skills', None),
+        'experience_titles': list(getattr(hit, 'experience_titles', None) or []),
+        'experience_companies': list(getattr(hit, 'experience_companies', None) or []),
+        'years_of_experience': getattr(hit, 'years_of_experience', None),
+        'linkedin': getattr(hit, 'linkedin', None) or '',
+        'github': getattr(hit, 'github', None) or '',
+    }
+
+
+def _years(value):
+    if value in (None, ''):
+        return None
+    try:
+        years = float(value)
+    except ValueError:
+        raise ValueError('min_years and max_years must be numbers')
+    if years < 0:
+        raise ValueError('min_years and max_years must not be negative')
+    return years
+
+
+def build_search(query, filters):
+    search = ApplicantDocument.search()
+    if query:
+        search = search.query("multi_match", query=query, fields=SEARCH_FIELDS)
+    for skill in filters.get('skills') or []:
+        search = search.filter('term', skill_tags=skill)
+    if filters.get('title'):
+        search = search.filter('match', experience_titles=filters['title'])
+    if filters.get('company'):
+        search = search.filter('match', experience_companies=filters['company'])
+    years = {}
+    if filters.get('min_years') is not None:
+        years['gte'] = filters['min_years']
+    if filters.get('max_years') is not None:
+        years['lte'] = filters['max_years']
+    if years:
+        search = search.filter('range', years_of_experience=years)
+    if filters.get('sort') == 'experience' or not query:
+        search = search.sort({'years_of_experience': {'order': 'desc'}}, '_score')
+    return search
+
+
+def run_search(search, page, page_size):
+    offset = (page - 1) * page_size
+    with track_es():
+        response = search[offset:offset + page_size].execute()
+    return {'results': [serialize_hit(hit) for hit in response], 'total': response.hits.total.value}
+
+
+class ApplicantSearchView(APIView):
+
+    @swagger_auto_schema(
+        operation_description="Search applicant profiles by skills, experience titles and companies. "
+                              "Without q every applicant matching the filters is returned, most experienced first. "
+                              "The total number of matches is sent in the X-Total-Count header.",
+        operation_summary="Search Applicants",
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, description="Free text over skills, titles, companies and name", type=openapi.TYPE_STRING),
+            openapi.Parameter('skills', openapi.IN_QUERY, description="Comma separated skills, all must match", type=openapi.TYPE_STRING),
+            openapi.Parameter('title', openapi.IN_QUERY, description="Past or current job title", type=openapi.TYPE_STRING),
+            openapi.Parameter('company', openapi.IN_QUERY, description="Past or current employer", type=openapi.TYPE_STRING),
+            openapi.Parameter('min_years', openapi.IN_QUERY, description="Minimum total years of experience", type=openapi.TYPE_NUMBER),
+            openapi.Parameter('max_years', openapi.IN_QUERY, description="Maximum total years of experience", type=openapi.TYPE_NUMBER),
+            openapi.Parameter('sort', openapi.IN_QUERY, description="relevance or experience", type=openapi.TYPE_STRING, default='relevance'),
+            openapi.Parameter('page', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, default=1),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description=f"Max {MAX_PAGE_SIZE}", type=openapi.TYPE_INTEGER, default=DEFAULT_PAGE_SIZE),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Matching applicants",
+                schema=openapi.Schema(type=openapi.TYPE_ARRAY, items=applicant_hit_schema)
+            ),
+            400: openapi.Response(description="Bad request"),
+            401: openapi.Response(description="Authentication required"),
+            403: openapi.Response(description="Only companies can search applicants")
+        },
+        tags=['Applicants']
+    )
+    @require_role('company')
+    def get(self, request):
+        """Search applicants"""
+        query = request.GET.get('q', '').strip()
+        sort = request.GET.get('sort', '').strip().lower() or 'relevance'
+        if sort not in SORTS:
+            return Response({'error': f'sort must be one of {", ".join(SORTS)}'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            min_years = _years(request.GET.get('min_years'))
+            max_years = _years(request.GET.get('max_years'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Lower-cased here so that the cache key and the query agree. The
+        # index entry keeps these keys apart from job searches.
+        filters = {
+            'index': 'applicants',
+            'skills': sorted(skill_tags(request.GET.get('skills'))),
+            'title': request.GET.get('title', '').strip().lower() or None,
+            'company': request.GET.get('company', '').strip().lower() or None,
+            'min_years': min_years,
+            'max_years': max_years,
+            'sort': sort,
+        }
+        page = _positive_int(request.GET.get('page'), 1)
+        page_size = _positive_int(request.GET.get('page_size'), DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+
+        search = build_search(query, filters)
+        data = cached_search(
+            make_key(query, {**filters, 'skills': ','.join(filters['skills'])}, page, page_size),
+            lambda: run_search(search, page, page_size),
+        )
+        return Response(data['results'], headers={'X-Total-Count': str(data['total'])})
@@ -2,16 +2,15 @@ from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny
 import json
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from ..models import User, Applicant, Experience, JobApplication
 from ..auth import require_authentication, require_ownership_or_admin, require_role
+from ..job_summaries import application_job_fields, get_job_summaries
 
 
 class ApplicantListView(APIView):
-    permission_classes = [AllowAny]
     
     @swagger_auto_schema(
         operation_description="Get all applicants (authentication required)",
@@ -74,7 +73,6 @@ class ApplicantListView(APIView):
 
 
 class ApplicantDetailView(APIView):
-    permission_classes = [AllowAny]
     
     @swagger_auto_schema(
         operation_description="Get specific applicant details with experiences and applications (owner only)",
@@ -116,7 +114,7 @@ class ApplicantDetailView(APIView):
     @require_ownership_or_admin('applicant', 'applicant_id')
     def get(self, request, applicant_id):
         """Get a specific applicant - Owner only"""
-        applicant = get_object_or_404(Applicant, id=applicant_id)
+        applicant = get_object_or_404(Applicant.objects.select_related('user'), id=applicant_id)
         
         # Get all experiences for this applicant
         experiences = Experience.objects.filter(applicant=applicant)
@@ -133,15 +131,14 @@ class ApplicantDetailView(APIView):
             })
         
         # Get all applications for this applicant
-        applications = JobApplication.objects.filter(applicant=applicant)
+        applications = list(JobApplication.objects.filter(applicant=applicant))
+        summaries = get_job_summaries(app.job_id for app in applications)
         applications_data = []
         for app in applications:
             applications_data.append({
                 'id': app.id,
-                'job_id': app.job.id,
-                'job_title': app.job_title,
-                'company_name': app.company_name,
-                'job_url': app.job_url,
+                'job_id': app.job_id,
+                **application_job_fields(app, summaries),
                 'status': app.status,
                 'applied_at': app.applied_at.isoformat()
             })
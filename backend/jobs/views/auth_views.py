@@ -1,17 +1,25 @@
 from django.shortcuts import get_object_or_404
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny
 import json
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from ..models import User, Applicant, Company
-from ..auth import hash_password, verify_password, generate_jwt_token, require_authentication
+from ..auth import (
+    hash_password, verify_password, issue_tokens, require_authentication, revoke_refresh_token,
+    rotate_refresh_token,
+)
+from ..outbox import publish
+from ..revocation import revoke
+from ..throttling import SlidingWindowThrottle
 
 
 class RegisterView(APIView):
-    permission_classes = [AllowAny]
+    throttle_classes = [SlidingWindowThrottle]
+    throttle_scope = 'register'
     @swagger_auto_schema(
         operation_description="Register a new user account",
         operation_summary="User Registration",
@@ -41,7 +49,9 @@ class RegisterView(APIView):
                     type=openapi.TYPE_OBJECT,
                     properties={
                         'message': openapi.Schema(type=openapi.TYPE_STRING),
-                        'token': openapi.Schema(type=openapi.TYPE_STRING, description='JWT authentication token'),
+                        'token': openapi.Schema(type=openapi.TYPE_STRING, description='Short lived JWT access token'),
+                        'refresh_token': openapi.Schema(type=openapi.TYPE_STRING, description='Single use token for /auth/refresh/'),
+                        'expires_in': openapi.Schema(type=openapi.TYPE_INTEGER, description='Access token lifetime in seconds'),
                         'user': openapi.Schema(
                             type=openapi.TYPE_OBJECT,
                             properties={
@@ -54,7 +64,8 @@ class RegisterView(APIView):
                     }
                 )
             ),
-            400: openapi.Response(description="Bad request - validation errors")
+            400: openapi.Response(description="Bad request - validation errors"),
+            429: openapi.Response(description="Too many attempts from this IP or for this email")
         },
         tags=['Authentication']
     )
@@ -69,54 +80,60 @@ class RegisterView(APIView):
                 if field not in data:
                     return Response({'error': f'{field} is required'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Check if user already exists
-            if User.objects.filter(email=data['email']).exists():
-                return Response({'error': 'User with this email already exists'}, status=status.HTTP_400_BAD_REQUEST)
-            
             # Validate role
             if data['role'] not in ['applicant', 'company']:
                 return Response({'error': 'Role must be either "applicant" or "company"'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Create user
-            user = User.objects.create(
-                email=data['email'],
-                password_hash=hash_password(data['password']),
-                role=data['role'],
-                name=data['name']
-            )
-            
-            # Create role-specific profile
-            if data['role'] == 'applicant':
-                Applicant.objects.create(
-                    user=user,
-                    linkedin=data.get('linkedin', ''),
-                    github=data.get('github', ''),
-                    resume=data.get('resume', ''),
-                    skills=data.get('skills', '')
-                )
-            elif data['role'] == 'company':
-                # For company registration, require additional fields
+            # For company registration, require additional fields
+            if data['role'] == 'company':
                 company_required = ['industry', 'brief', 'website']
                 for field in company_required:
                     if field not in data:
-                        user.delete()  # Cleanup user if company creation fails
                         return Response({'error': f'{field} is required for company registration'}, status=status.HTTP_400_BAD_REQUEST)
-                
-                Company.objects.create(
-                    user=user,
-                    name=data.get('company_name', data['name']),
-                    industry=data['industry'],
-                    logo=data.get('logo', ''),
-                    brief=data['brief'],
-                    website=data['website']
-                )
             
-            # Generate token
-            token = generate_jwt_token(user)
+            # One short transaction: the user, its profile, its refresh token
+            # and the outbox events for the follow-up work. The unique email
+            # index replaces a separate existence check.
+            try:
+                with transaction.atomic():
+                    user = User.objects.create(
+                        email=data['email'],
+                        password_hash=hash_password(data['password']),
+                        role=data['role'],
+                        name=data['name']
+                    )
+                    
+                    # Create role-specific profile
+                    profile_ids = {}
+                    if data['role'] == 'applicant':
+                        profile_ids['applicant_id'] = Applicant.objects.create(
+                            user=user,
+                            linkedin=data.get('linkedin', ''),
+                            github=data.get('github', ''),
+                            resume=data.get('resume', ''),
+                            skills=data.get('skills', '')
+                        ).id
+                    else:
+                        profile_ids['company_id'] = Company.objects.create(
+                            user=user,
+                            name=data.get('company_name', data['name']),
+                            industry=data['industry'],
+                            logo=data.get('logo', ''),
+                            brief=data['brief'],
+                            website=data['website']
+                        ).id
+                    
+                    # Welcome mail and the like run in the outbox relay
+                    publish('user.registered', [user.id])
+                    
+                    # Generate tokens
+                    tokens = issue_tokens(user, **profile_ids)
+            except IntegrityError:
+                return Response({'error': 'User with this email already exists'}, status=status.HTTP_400_BAD_REQUEST)
             
             return Response({
                 'message': 'User registered successfully',
-                'token': token,
+                **tokens,
                 'user': {
                     'id': user.id,
                     'email': user.email,
@@ -130,7 +147,8 @@ class RegisterView(APIView):
 
 
 class LoginView(APIView):
-    permission_classes = [AllowAny]
+    throttle_classes = [SlidingWindowThrottle]
+    throttle_scope = 'login'
     @swagger_auto_schema(
         operation_description="Login with email and password to get JWT token",
         operation_summary="User Login",
@@ -149,7 +167,9 @@ class LoginView(APIView):
                     type=openapi.TYPE_OBJECT,
                     properties={
                         'message': openapi.Schema(type=openapi.TYPE_STRING),
-                        'token': openapi.Schema(type=openapi.TYPE_STRING, description='JWT authentication token'),
+                        'token': openapi.Schema(type=openapi.TYPE_STRING, description='Short lived JWT access token'),
+                        'refresh_token': openapi.Schema(type=openapi.TYPE_STRING, description='Single use token for /auth/refresh/'),
+                        'expires_in': openapi.Schema(type=openapi.TYPE_INTEGER, description='Access token lifetime in seconds'),
                         'user': openapi.Schema(
                             type=openapi.TYPE_OBJECT,
                             properties={
@@ -163,7 +183,8 @@ class LoginView(APIView):
                 )
             ),
             401: openapi.Response(description="Invalid credentials"),
-            400: openapi.Response(description="Bad request")
+            400: openapi.Response(description="Bad request"),
+            429: openapi.Response(description="Too many attempts from this IP or for this email")
         },
         tags=['Authentication']
     )
@@ -186,9 +207,6 @@ class LoginView(APIView):
             if not verify_password(data['password'], user.password_hash):
                 return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
             
-            # Generate token
-            token = generate_jwt_token(user)
-            
             # Get role-specific data
             profile_data = {}
             if user.role == 'applicant':
@@ -217,9 +235,16 @@ class LoginView(APIView):
                 except Company.DoesNotExist:
                     pass
             
+            # Generate tokens, the profile id found above saves a lookup
+            tokens = issue_tokens(
+                user,
+                applicant_id=profile_data.get('applicant_id'),
+                company_id=profile_data.get('company_id'),
+            )
+            
             return Response({
                 'message': 'Login successful',
-                'token': token,
+                **tokens,
                 'user': {
                     'id': user.id,
                     'email': user.email,
@@ -233,8 +258,83 @@ class LoginView(APIView):
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+class RefreshTokenView(APIView):
+    @swagger_auto_schema(
+        operation_description="Trade a refresh token for a new access and refresh token. Each refresh token "
+                              "works once; reusing a rotated one revokes every token of that login.",
+        operation_summary="Refresh Token",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['refresh_token'],
+            properties={
+                'refresh_token': openapi.Schema(type=openapi.TYPE_STRING, description='Refresh token from login or the last refresh'),
+            }
+        ),
+        responses={
+            200: openapi.Response(
+                description="New token pair",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'token': openapi.Schema(type=openapi.TYPE_STRING, description='Short lived JWT access token'),
+                        'refresh_token': openapi.Schema(type=openapi.TYPE_STRING, description='Single use token for /auth/refresh/'),
+                        'expires_in': openapi.Schema(type=openapi.TYPE_INTEGER, description='Access token lifetime in seconds'),
+                    }
+                )
+            ),
+            400: openapi.Response(description="refresh_token missing"),
+            401: openapi.Response(description="Refresh token invalid, expired, used or revoked")
+        },
+        tags=['Authentication']
+    )
+    def post(self, request):
+        """Rotate a refresh token"""
+        raw_token = request.data.get('refresh_token')
+        if not raw_token:
+            return Response({'error': 'refresh_token is required'}, status=status.HTTP_400_BAD_REQUEST)
+        tokens = rotate_refresh_token(raw_token)
+        if tokens is None:
+            return Response({'error': 'Invalid refresh token'}, status=status.HTTP_401_UNAUTHORIZED)
+        return Response(tokens)
+
+
+class LogoutView(APIView):
+    @swagger_auto_schema(
+        operation_description="Revoke the access token used for this request and, when given, the refresh "
+                              "token of the same login",
+        operation_summary="Logout",
+        manual_parameters=[
+            openapi.Parameter(
+                'Authorization',
+                openapi.IN_HEADER,
+                description="JWT token in format: Bearer <token>",
+                type=openapi.TYPE_STRING,
+                required=True
+            )
+        ],
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'refresh_token': openapi.Schema(type=openapi.TYPE_STRING, description='Refresh token to revoke'),
+            }
+        ),
+        responses={
+            204: openapi.Response(description="Logged out"),
+            401: openapi.Response(description="Authentication required")
+        },
+        tags=['Authentication']
+    )
+    @require_authentication
+    def post(self, request):
+        """Revoke the caller's tokens"""
+        revoke(request.user.jti, request.user.expires_at)
+        raw_token = request.data.get('refresh_token')
+        if raw_token:
+            revoke_refresh_token(raw_token, request.user.id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class ProfileView(APIView):
-    permission_classes = [AllowAny]  # We'll handle auth manually with our JWT decorator
     @swagger_auto_schema(
         operation_description="Get current user profile information",
         operation_summary="Get User Profile",
@@ -283,8 +383,8 @@ class ProfileView(APIView):
     @require_authentication
     def get(self, request):
         """Get current user profile"""
-        # ...existing code...
-        user = request.user
+        # The token describes the caller, the profile needs the stored rows
+        user = get_object_or_404(User, id=request.user.id)
         
         # Get role-specific data
         profile_data = {}
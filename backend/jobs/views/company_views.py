@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -6,6 +7,7 @@ from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from ..models import User, Company
 from ..auth import require_authentication, require_ownership_or_admin, require_role
+from ..rollups import company_dashboard
 
 
 class CompanyListView(APIView):
@@ -155,3 +157,50 @@ class CompanyDetailView(APIView):
         company = get_object_or_404(Company, id=company_id)
         company.delete()
         return Response({'message': 'Company deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
+
+
+class CompanyDashboardView(APIView):
+    @swagger_auto_schema(
+        operation_summary="Get a company's application dashboard",
+        operation_description="Application counts per job, per status and per day, read from "
+                              "precomputed rollups. Requires ownership.",
+        manual_parameters=[
+            openapi.Parameter('days', openapi.IN_QUERY, description="Days covered by by_day, default 30",
+                              type=openapi.TYPE_INTEGER),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Dashboard counts",
+                examples={
+                    "application/json": {
+                        "company_id": 1,
+                        "total_applications": 3,
+                        "by_status": {"applied": 2, "interview": 1},
+                        "by_job": [
+                            {"job_id": 1, "title": "Backend Engineer", "total": 3,
+                             "by_status": {"applied": 2, "interview": 1}}
+                        ],
+                        "by_day": [{"date": "2024-01-01", "count": 3}]
+                    }
+                }
+            ),
+            400: "Bad request",
+            401: "Authentication required",
+            403: "Access denied",
+            404: "Company not found"
+        },
+        tags=["Companies"]
+    )
+    @require_ownership_or_admin('company', 'company_id')
+    def get(self, request, company_id):
+        """Get application counts for a company's jobs"""
+        try:
+            days = int(request.GET.get('days', 30))
+        except ValueError:
+            return Response({'error': 'days must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= days <= settings.DASHBOARD_DAILY_RETENTION_DAYS:
+            return Response(
+                {'error': f'days must be between 1 and {settings.DASHBOARD_DAILY_RETENTION_DAYS}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(company_dashboard(company_id, days))
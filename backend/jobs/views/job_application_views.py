@@ -1,11 +1,15 @@
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from ..models import Applicant, Job, JobApplication
+from ..models import Job, JobApplication
 from ..auth import require_authentication, require_ownership_or_admin, require_role
+from ..idempotency import idempotent, replayable
+from ..job_summaries import application_job_fields, get_job_summaries
+from ..query_budget import query_budget
 
 
 class JobApplicationListView(APIView):
@@ -40,17 +44,16 @@ class JobApplicationListView(APIView):
     @require_authentication
     def get(self, request):
         """Get all job applications"""
-        applications = JobApplication.objects.select_related('applicant__user', 'job__company').all()
+        applications = list(JobApplication.objects.select_related('applicant__user').all())
+        summaries = get_job_summaries(app.job_id for app in applications)
         applications_data = []
         for app in applications:
             applications_data.append({
                 'id': app.id,
-                'applicant_id': app.applicant.id,
+                'applicant_id': app.applicant_id,
                 'applicant_name': app.applicant.user.name,
-                'job_id': app.job.id,
-                'job_title': app.job_title,
-                'company_name': app.company_name,
-                'job_url': app.job_url,
+                'job_id': app.job_id,
+                **application_job_fields(app, summaries),
                 'status': app.status,
                 'applied_at': app.applied_at.isoformat()
             })
@@ -58,54 +61,72 @@ class JobApplicationListView(APIView):
     
     @swagger_auto_schema(
         operation_summary="Create a new job application",
-        operation_description="Create a new job application (requires applicant role).",
+        operation_description="Create a new job application (requires applicant role). Applying again to "
+                              "the same job returns the existing application with status 200. Requests "
+                              "repeated with the same Idempotency-Key replay the first response.",
+        manual_parameters=[
+            openapi.Parameter('Idempotency-Key', openapi.IN_HEADER, description="Client generated key, "
+                              "retries with the same key and body are not executed twice",
+                              type=openapi.TYPE_STRING),
+        ],
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
-            required=['applicant_id', 'job_id', 'company_name', 'status', 'job_title', 'job_url'],
+            required=['job_id', 'status'],
             properties={
-                'applicant_id': openapi.Schema(type=openapi.TYPE_INTEGER, description='Applicant ID'),
+                'applicant_id': openapi.Schema(type=openapi.TYPE_INTEGER, description='Applicant ID, defaults to the caller'),
                 'job_id': openapi.Schema(type=openapi.TYPE_INTEGER, description='Job ID'),
-                'company_name': openapi.Schema(type=openapi.TYPE_STRING, description='Company name'),
                 'status': openapi.Schema(type=openapi.TYPE_STRING, description='Application status'),
-                'job_title': openapi.Schema(type=openapi.TYPE_STRING, description='Job title'),
-                'job_url': openapi.Schema(type=openapi.TYPE_STRING, description='Job URL'),
             }
         ),
         responses={
+            200: openapi.Response(description="Already applied, the existing application"),
             201: openapi.Response(description="Job application created successfully"),
             400: openapi.Response(description="Bad request"),
             401: openapi.Response(description="Unauthorized"),
-            403: openapi.Response(description="Forbidden - requires applicant role"),
-            404: openapi.Response(description="Applicant or Job not found")
+            403: openapi.Response(description="Forbidden - requires applicant role, or applying for another applicant"),
+            404: openapi.Response(description="Job not found"),
+            409: openapi.Response(description="A request with this Idempotency-Key is in progress"),
+            422: openapi.Response(description="Idempotency-Key reused with a different body")
         },
         tags=["Job Applications"]
     )
+    # Inserting also moves the dashboard rollup and the job's counters, and an
+    # Idempotency-Key adds its claim and stored response, each in its own
+    # transaction or savepoint. Token checks add up to two more queries.
+    @query_budget(20)
     @require_role('applicant')
+    @idempotent
     def post(self, request):
         """Create a new job application"""
         try:
             data = request.data
-            applicant = get_object_or_404(Applicant, id=data['applicant_id'])
-            job = get_object_or_404(Job, id=data['job_id'])
+            if 'job_id' not in data or 'status' not in data:
+                return replayable(Response({'error': 'job_id and status are required'},
+                                           status=status.HTTP_400_BAD_REQUEST))
+            # The applicant comes from the token, a body value must agree with it
+            applicant_id = request.user.applicant_id
+            if applicant_id is None or int(data.get('applicant_id', applicant_id)) != applicant_id:
+                return replayable(Response({'error': 'You can only apply as yourself'},
+                                           status=status.HTTP_403_FORBIDDEN))
+            job = get_object_or_404(Job.objects.select_related('company'), id=data['job_id'])
             
-            application = JobApplication.objects.create(
-                applicant=applicant,
+            # The (applicant, job) constraint makes a concurrent double submit
+            # fall back to reading the row the other request inserted.
+            application, created = JobApplication.objects.get_or_create(
+                applicant_id=applicant_id,
                 job=job,
-                company_name=data['company_name'],
-                status=data['status'],
-                job_title=data['job_title'],
-                job_url=data['job_url']
+                defaults={'status': data['status']}
             )
             return Response({
                 'id': application.id,
-                'applicant_id': application.applicant.id,
-                'job_id': application.job.id,
-                'company_name': application.company_name,
+                'applicant_id': application.applicant_id,
+                'job_id': application.job_id,
+                'company_name': job.company.name,
                 'status': application.status,
-                'job_title': application.job_title,
-                'job_url': application.job_url,
+                'job_title': job.title,
+                'job_url': job.application_url,
                 'applied_at': application.applied_at.isoformat()
-            }, status=status.HTTP_201_CREATED)
+            }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -139,29 +160,27 @@ class JobApplicationDetailView(APIView):
     @require_authentication
     def get(self, request, application_id):
         """Get a specific job application"""
-        app = get_object_or_404(JobApplication, id=application_id)
+        app = get_object_or_404(JobApplication.objects.select_related('applicant__user'), id=application_id)
+        summaries = get_job_summaries([app.job_id])
         return Response({
             'id': app.id,
-            'applicant_id': app.applicant.id,
+            'applicant_id': app.applicant_id,
             'applicant_name': app.applicant.user.name,
-            'job_id': app.job.id,
-            'job_title': app.job_title,
-            'company_name': app.company_name,
-            'job_url': app.job_url,
+            'job_id': app.job_id,
+            **application_job_fields(app, summaries),
             'status': app.status,
             'applied_at': app.applied_at.isoformat()
         })
     
     @swagger_auto_schema(
         operation_summary="Update a specific job application",
-        operation_description="Update job application details. Only the applicant who owns the application or admin can update.",
+        operation_description="Update job application status. Only the applicant who owns the application, the company "
+                              "that posted the job or admin can update. "
+                              "The other party hears about the change in its next notification digest.",
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             properties={
-                'company_name': openapi.Schema(type=openapi.TYPE_STRING, description='Company name'),
                 'status': openapi.Schema(type=openapi.TYPE_STRING, description='Application status'),
-                'job_title': openapi.Schema(type=openapi.TYPE_STRING, description='Job title'),
-                'job_url': openapi.Schema(type=openapi.TYPE_STRING, description='Job URL'),
             }
         ),
         responses={
@@ -173,27 +192,26 @@ class JobApplicationDetailView(APIView):
         },
         tags=["Job Applications"]
     )
-    @require_ownership_or_admin('jobapplication', 'applicant')
+    @require_ownership_or_admin('jobapplication_status', 'application_id')
     def put(self, request, application_id):
         """Update a specific job application"""
         try:
             app = get_object_or_404(JobApplication, id=application_id)
             data = request.data
             
-            app.company_name = data.get('company_name', app.company_name)
             app.status = data.get('status', app.status)
-            app.job_title = data.get('job_title', app.job_title)
-            app.job_url = data.get('job_url', app.job_url)
-            app.save()
+            app._changed_by = request.user.id
+            # The status change notification commits with the status
+            with transaction.atomic():
+                app.save(update_fields=['status'])
+            summaries = get_job_summaries([app.job_id])
             
             return Response({
                 'id': app.id,
-                'applicant_id': app.applicant.id,
-                'job_id': app.job.id,
-                'company_name': app.company_name,
+                'applicant_id': app.applicant_id,
+                'job_id': app.job_id,
+                **application_job_fields(app, summaries),
                 'status': app.status,
-                'job_title': app.job_title,
-                'job_url': app.job_url,
                 'applied_at': app.applied_at.isoformat()
             })
         except Exception as e:
@@ -210,7 +228,7 @@ class JobApplicationDetailView(APIView):
         },
         tags=["Job Applications"]
     )
-    @require_ownership_or_admin('jobapplication', 'applicant')
+    @require_ownership_or_admin('jobapplication', 'application_id')
     def delete(self, request, application_id):
         """Delete a specific job application"""
         app = get_object_or_404(JobApplication, id=application_id)
@@ -1,7 +1,89 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from ..documents import JobDocument
-from ..serializers import JobSerializer
+from ..geo import GeoParamError, parse_origin, parse_radius
+from ..instrumentation import track_es
+from ..search_cache import cached_search, make_key
+
+SEARCH_FIELDS = ['title^2', 'skills', 'description', 'location', 'company.name', 'company.industry']
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+
+
+def serialize_hit(hit):
+    """Render a search hit in the JobSerializer shape without touching the DB"""
+    company = getattr(hit, 'company', None)
+    salary = getattr(hit, 'salary', None)
+    return {
+        'id': int(hit.meta.id),
+        'title': hit.title,
+        'description': hit.description,
+        'location': hit.location,
+        'salary': f'{salary:.2f}' if salary is not None else None,
+        'job_type': getattr(hit, 'job_type', None),
+        'skills': hit.skills,
+        'company': {
+            'name': getattr(company, 'name', None),
+            'industry': getattr(company, 'industry', None),
+            'logo': getattr(company, 'logo', None),
+            'website': getattr(company, 'website', None),
+        } if company is not None else None,
+        'application_url': getattr(hit, 'application_url', None),
+        'created_at': getattr(hit, 'created_at', None),
+    }
+
+
+def _distance_km(hit):
+    # Present only when sorting by distance, the first sort value is in km
+    sort = getattr(hit.meta, 'sort', None)
+    return round(sort[0], 3) if sort else None
+
+
+def _positive_int(value, default, maximum=None):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return default
+    if number < 1:
+        return default
+    return min(number, maximum) if maximum else number
+
+
+def build_search(query, filters):
+    search = JobDocument.search().query("multi_match", query=query, fields=SEARCH_FIELDS)
+    if filters.get('job_type'):
+        search = search.filter('term', job_type=filters['job_type'])
+    if filters.get('status'):
+        search = search.filter('term', status=filters['status'])
+    if filters.get('location'):
+        search = search.filter('match', location=filters['location'])
+    if filters.get('company'):
+        search = search.filter('match', **{'company.name': filters['company']})
+    if filters.get('lat') is not None:
+        origin = {'lat': filters['lat'], 'lon': filters['lon']}
+        if filters.get('radius_km'):
+            search = search.filter('geo_distance', distance=f"{filters['radius_km']}km", location_point=origin)
+        if filters.get('sort') == 'distance':
+            search = search.sort({'_geo_distance': {
+                'location_point': origin, 'order': 'asc', 'unit': 'km', 'ignore_unmapped': True,
+            }})
+    return search
+
+
+def run_search(search, page, page_size):
+    offset = (page - 1) * page_size
+    with track_es():
+        response = search[offset:offset + page_size].execute()
+    # isoformat keeps the cached payload plain JSON, whatever the cache backend
+    results = []
+    for hit in response:
+        result = serialize_hit(hit)
+        result['distance_km'] = _distance_km(hit)
+        if hasattr(result['created_at'], 'isoformat'):
+            result['created_at'] = result['created_at'].isoformat()
+        results.append(result)
+    return {'results': results, 'total': response.hits.total.value}
+
 
 @api_view(['GET'])
 def search_jobs(request):
@@ -9,8 +91,29 @@ def search_jobs(request):
     if not query:
         return Response([], status=200)
 
-    search = JobDocument.search().query("multi_match", query=query, fields=['title', 'description', 'skills', 'location'])
-    queryset = search.to_queryset()
-    serializer = JobSerializer(queryset, many=True)
-    
-    return Response(serializer.data)
+    # Lower-cased here so that the cache key and the query agree
+    filters = {
+        name: request.GET.get(name, '').strip().lower() or None
+        for name in ('job_type', 'status', 'location', 'company')
+    }
+    try:
+        origin = parse_origin(request.GET)
+        radius = parse_radius(request.GET)
+    except GeoParamError as e:
+        return Response({'error': str(e)}, status=400)
+    sort = request.GET.get('sort', '').strip().lower() or None
+    if (radius or sort == 'distance') and origin is None:
+        return Response({'error': 'radius_km and sort=distance need lat and lon or near'}, status=400)
+    if origin is not None:
+        # ~10 m precision, nearby origins share cache entries
+        filters.update(lat=round(origin[0], 4), lon=round(origin[1], 4), radius_km=radius, sort=sort)
+
+    page = _positive_int(request.GET.get('page'), 1)
+    page_size = _positive_int(request.GET.get('page_size'), DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+
+    search = build_search(query, filters)
+    data = cached_search(
+        make_key(query, filters, page, page_size),
+        lambda: run_search(search, page, page_size),
+    )
+    return Response(data['results'], headers={'X-Total-Count': str(data['total'])})
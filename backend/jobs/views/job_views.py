@@ -2,21 +2,42 @@ from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny
 import json
 from decimal import Decimal
+from django.db.models import F
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from ..models import Company, Job
+from ..models import Job
 from ..auth import require_role, require_ownership_or_admin
+from ..query_budget import query_budget
+from ..counters import STATUS_COUNTERS
+from ..geo import GeoParamError, distance_expression, parse_origin, parse_radius, within_radius
+
+
+def _optional_decimal(value):
+    return None if value in (None, '') else Decimal(str(value))
+
+
+def _decimal_str(value):
+    return str(value) if value is not None else None
+
+
+def _applications_by_status(job):
+    return {status: getattr(job, field) for status, field in STATUS_COUNTERS.items()}
 
 
 class JobListView(APIView):
-    permission_classes = [AllowAny]
     
     @swagger_auto_schema(
-        operation_description="Get all job listings",
+        operation_description="Get all job listings, optionally within a radius of a point or place",
         operation_summary="List Jobs",
+        manual_parameters=[
+            openapi.Parameter('near', openapi.IN_QUERY, description="Place name from the gazetteer, e.g. Cairo", type=openapi.TYPE_STRING),
+            openapi.Parameter('lat', openapi.IN_QUERY, description="Origin latitude", type=openapi.TYPE_NUMBER),
+            openapi.Parameter('lon', openapi.IN_QUERY, description="Origin longitude", type=openapi.TYPE_NUMBER),
+            openapi.Parameter('radius_km', openapi.IN_QUERY, description="Only jobs within this distance of the origin", type=openapi.TYPE_NUMBER),
+            openapi.Parameter('sort', openapi.IN_QUERY, description="'distance' for nearest first, 'popular' for most applications first", type=openapi.TYPE_STRING),
+        ],
         responses={
             200: openapi.Response(
                 description="List of jobs",
@@ -36,25 +57,54 @@ class JobListView(APIView):
                                     'location': openapi.Schema(type=openapi.TYPE_STRING),
                                     'application_url': openapi.Schema(type=openapi.TYPE_STRING),
                                     'salary': openapi.Schema(type=openapi.TYPE_STRING),
+                                    'salary_min': openapi.Schema(type=openapi.TYPE_STRING),
+                                    'salary_max': openapi.Schema(type=openapi.TYPE_STRING),
+                                    'salary_currency': openapi.Schema(type=openapi.TYPE_STRING),
+                                    'salary_period': openapi.Schema(type=openapi.TYPE_STRING),
+                                    'applications_count': openapi.Schema(type=openapi.TYPE_INTEGER),
+                                    'applications_by_status': openapi.Schema(type=openapi.TYPE_OBJECT, additional_properties=openapi.Schema(type=openapi.TYPE_INTEGER)),
                                     'skills': openapi.Schema(type=openapi.TYPE_STRING),
                                     'status': openapi.Schema(type=openapi.TYPE_STRING),
                                     'job_type': openapi.Schema(type=openapi.TYPE_STRING),
                                     'created_at': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+                                    'latitude': openapi.Schema(type=openapi.TYPE_NUMBER),
+                                    'longitude': openapi.Schema(type=openapi.TYPE_NUMBER),
+                                    'distance_km': openapi.Schema(type=openapi.TYPE_NUMBER, description="Only when an origin is given"),
                                 }
                             )
                         )
                     }
                 )
-            )
+            ),
+            400: openapi.Response(description="Invalid geo parameters")
         },
         tags=['Jobs']
     )
     def get(self, request):
         """Get all jobs"""
+        try:
+            origin = parse_origin(request.GET)
+            radius = parse_radius(request.GET)
+        except GeoParamError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        sort = request.GET.get('sort')
+        if (radius or sort == 'distance') and origin is None:
+            return Response({'error': 'radius_km and sort=distance need lat and lon or near'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
         jobs = Job.objects.select_related('company').all()
+        if origin is not None:
+            if radius:
+                jobs = within_radius(jobs, origin[0], origin[1], radius)
+            else:
+                jobs = jobs.annotate(distance_km=distance_expression(*origin))
+            if sort == 'distance':
+                jobs = jobs.order_by(F('distance_km').asc(nulls_last=True), 'id')
+        if sort == 'popular':
+            jobs = jobs.order_by('-applications_count', '-id')
         jobs_data = []
         for job in jobs:
-            jobs_data.append({
+            job_data = {
                 'id': job.id,
                 'company_id': job.company.id,
                 'company_name': job.company.name,
@@ -63,11 +113,23 @@ class JobListView(APIView):
                 'location': job.location,
                 'application_url': job.application_url,
                 'salary': str(job.salary),
+                'salary_min': _decimal_str(job.salary_min),
+                'salary_max': _decimal_str(job.salary_max),
+                'salary_currency': job.salary_currency,
+                'salary_period': job.salary_period,
                 'skills': job.skills,
                 'status': job.status,
                 'job_type': job.job_type,
-                'created_at': job.created_at.isoformat()
-            })
+                'created_at': job.created_at.isoformat(),
+                'latitude': job.latitude,
+                'longitude': job.longitude,
+                'applications_count': job.applications_count,
+                'applications_by_status': _applications_by_status(job),
+            }
+            if origin is not None:
+                distance = job.distance_km
+                job_data['distance_km'] = round(distance, 3) if distance is not None else None
+            jobs_data.append(job_data)
         return Response({'jobs': jobs_data})
     
     @swagger_auto_schema(
@@ -75,14 +137,18 @@ class JobListView(APIView):
         operation_summary="Create Job",
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
-            required=['company_id', 'title', 'description', 'location', 'application_url', 'salary', 'skills', 'status', 'job_type'],
+            required=['title', 'description', 'location', 'application_url', 'skills', 'status', 'job_type'],
             properties={
-                'company_id': openapi.Schema(type=openapi.TYPE_INTEGER, description='Company ID'),
+                'company_id': openapi.Schema(type=openapi.TYPE_INTEGER, description='Company ID, defaults to the caller'),
                 'title': openapi.Schema(type=openapi.TYPE_STRING, description='Job title'),
                 'description': openapi.Schema(type=openapi.TYPE_STRING, description='Job description'),
                 'location': openapi.Schema(type=openapi.TYPE_STRING, description='Job location'),
                 'application_url': openapi.Schema(type=openapi.TYPE_STRING, description='Application URL'),
-                'salary': openapi.Schema(type=openapi.TYPE_NUMBER, description='Salary amount'),
+                'salary': openapi.Schema(type=openapi.TYPE_NUMBER, description='Salary amount, defaults to salary_max or salary_min'),
+                'salary_min': openapi.Schema(type=openapi.TYPE_NUMBER, description='Lower end of the salary range'),
+                'salary_max': openapi.Schema(type=openapi.TYPE_NUMBER, description='Upper end of the salary range'),
+                'salary_currency': openapi.Schema(type=openapi.TYPE_STRING, description='ISO 4217 code, defaults to USD'),
+                'salary_period': openapi.Schema(type=openapi.TYPE_STRING, description='hour, day, week, month or year (default)'),
                 'skills': openapi.Schema(type=openapi.TYPE_STRING, description='Required skills'),
                 'status': openapi.Schema(type=openapi.TYPE_STRING, description='Job status'),
                 'job_type': openapi.Schema(type=openapi.TYPE_STRING, description='Job type'),
@@ -92,36 +158,50 @@ class JobListView(APIView):
             201: openapi.Response(description="Job created successfully"),
             400: openapi.Response(description="Bad request"),
             401: openapi.Response(description="Authentication required"),
-            403: openapi.Response(description="Company role required")
+            403: openapi.Response(description="Company role required, or posting for another company")
         },
         tags=['Jobs']
     )
+    # Saving also geocodes, updates salary statistics and writes the outbox row
+    @query_budget(12)
     @require_role('company')
     def post(self, request):
         """Create a new job"""
         try:
             data = request.data
-            company = get_object_or_404(Company, id=data['company_id'])
+            # The company comes from the token, a body value must agree with it
+            company_id = request.user.company_id
+            if company_id is None or int(data.get('company_id', company_id)) != company_id:
+                return Response({'error': 'You can only post jobs for your own company'},
+                                status=status.HTTP_403_FORBIDDEN)
             
             job = Job.objects.create(
-                company=company,
+                company_id=company_id,
                 title=data['title'],
                 description=data['description'],
                 location=data['location'],
                 application_url=data['application_url'],
-                salary=Decimal(str(data['salary'])),
+                salary=Decimal(str(data.get('salary', data.get('salary_max', data.get('salary_min'))))),
+                salary_min=_optional_decimal(data.get('salary_min')),
+                salary_max=_optional_decimal(data.get('salary_max')),
+                salary_currency=data.get('salary_currency', 'USD'),
+                salary_period=data.get('salary_period', 'year'),
                 skills=data['skills'],
                 status=data['status'],
                 job_type=data['job_type']
             )
             return Response({
                 'id': job.id,
-                'company_id': job.company.id,
+                'company_id': job.company_id,
                 'title': job.title,
                 'description': job.description,
                 'location': job.location,
                 'application_url': job.application_url,
                 'salary': str(job.salary),
+                'salary_min': _decimal_str(job.salary_min),
+                'salary_max': _decimal_str(job.salary_max),
+                'salary_currency': job.salary_currency,
+                'salary_period': job.salary_period,
                 'skills': job.skills,
                 'status': job.status,
                 'job_type': job.job_type,
@@ -132,7 +212,6 @@ class JobListView(APIView):
 
 
 class JobDetailView(APIView):
-    permission_classes = [AllowAny]
     
     @swagger_auto_schema(
         operation_description="Retrieve a specific job by ID",
@@ -160,6 +239,12 @@ class JobDetailView(APIView):
                         'location': openapi.Schema(type=openapi.TYPE_STRING),
                         'application_url': openapi.Schema(type=openapi.TYPE_STRING),
                         'salary': openapi.Schema(type=openapi.TYPE_STRING),
+                        'salary_min': openapi.Schema(type=openapi.TYPE_STRING),
+                        'salary_max': openapi.Schema(type=openapi.TYPE_STRING),
+                        'salary_currency': openapi.Schema(type=openapi.TYPE_STRING),
+                        'salary_period': openapi.Schema(type=openapi.TYPE_STRING),
+                        'applications_count': openapi.Schema(type=openapi.TYPE_INTEGER),
+                        'applications_by_status': openapi.Schema(type=openapi.TYPE_OBJECT, additional_properties=openapi.Schema(type=openapi.TYPE_INTEGER)),
                         'skills': openapi.Schema(type=openapi.TYPE_STRING),
                         'status': openapi.Schema(type=openapi.TYPE_STRING),
                         'job_type': openapi.Schema(type=openapi.TYPE_STRING),
@@ -173,7 +258,7 @@ class JobDetailView(APIView):
     )
     def get(self, request, job_id):
         """Get a specific job"""
-        job = get_object_or_404(Job, id=job_id)
+        job = get_object_or_404(Job.objects.select_related('company'), id=job_id)
         return Response({
             'id': job.id,
             'company_id': job.company.id,
@@ -183,10 +268,16 @@ class JobDetailView(APIView):
             'location': job.location,
             'application_url': job.application_url,
             'salary': str(job.salary),
+            'salary_min': _decimal_str(job.salary_min),
+            'salary_max': _decimal_str(job.salary_max),
+            'salary_currency': job.salary_currency,
+            'salary_period': job.salary_period,
             'skills': job.skills,
             'status': job.status,
             'job_type': job.job_type,
-            'created_at': job.created_at.isoformat()
+            'created_at': job.created_at.isoformat(),
+            'applications_count': job.applications_count,
+            'applications_by_status': _applications_by_status(job),
         })
 
     @swagger_auto_schema(
@@ -208,7 +299,11 @@ class JobDetailView(APIView):
                 'description': openapi.Schema(type=openapi.TYPE_STRING, description='Job description'),
                 'location': openapi.Schema(type=openapi.TYPE_STRING, description='Job location'),
                 'application_url': openapi.Schema(type=openapi.TYPE_STRING, description='Application URL'),
-                'salary': openapi.Schema(type=openapi.TYPE_NUMBER, description='Salary amount'),
+                'salary': openapi.Schema(type=openapi.TYPE_NUMBER, description='Salary amount, defaults to salary_max or salary_min'),
+                'salary_min': openapi.Schema(type=openapi.TYPE_NUMBER, description='Lower end of the salary range'),
+                'salary_max': openapi.Schema(type=openapi.TYPE_NUMBER, description='Upper end of the salary range'),
+                'salary_currency': openapi.Schema(type=openapi.TYPE_STRING, description='ISO 4217 code, defaults to USD'),
+                'salary_period': openapi.Schema(type=openapi.TYPE_STRING, description='hour, day, week, month or year (default)'),
                 'skills': openapi.Schema(type=openapi.TYPE_STRING, description='Required skills'),
                 'status': openapi.Schema(type=openapi.TYPE_STRING, description='Job status'),
                 'job_type': openapi.Schema(type=openapi.TYPE_STRING, description='Job type'),
@@ -223,7 +318,7 @@ class JobDetailView(APIView):
         },
         tags=['Jobs']
     )
-    @require_ownership_or_admin('job', 'company')
+    @require_ownership_or_admin('job', 'job_id')
     def put(self, request, job_id):
         """Update a specific job"""
         try:
@@ -236,6 +331,12 @@ class JobDetailView(APIView):
             job.application_url = data.get('application_url', job.application_url)
             if 'salary' in data:
                 job.salary = Decimal(str(data['salary']))
+            if 'salary_min' in data:
+                job.salary_min = _optional_decimal(data['salary_min'])
+            if 'salary_max' in data:
+                job.salary_max = _optional_decimal(data['salary_max'])
+            job.salary_currency = data.get('salary_currency', job.salary_currency)
+            job.salary_period = data.get('salary_period', job.salary_period)
             job.skills = data.get('skills', job.skills)
             job.status = data.get('status', job.status)
             job.job_type = data.get('job_type', job.job_type)
@@ -249,6 +350,10 @@ class JobDetailView(APIView):
                 'location': job.location,
                 'application_url': job.application_url,
                 'salary': str(job.salary),
+                'salary_min': _decimal_str(job.salary_min),
+                'salary_max': _decimal_str(job.salary_max),
+                'salary_currency': job.salary_currency,
+                'salary_period': job.salary_period,
                 'skills': job.skills,
                 'status': job.status,
                 'job_type': job.job_type,
@@ -277,7 +382,7 @@ class JobDetailView(APIView):
         },
         tags=['Jobs']
     )
-    @require_ownership_or_admin('job', 'company')
+    @require_ownership_or_admin('job', 'job_id')
     def delete(self, request, job_id):
         """Delete a specific job"""
         job = get_object_or_404(Job, id=job_id)
@@ -0,0 +1,124 @@
+from django.conf import settings
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+from ..alerts import tokenize
+from ..auth import require_ownership_or_admin, require_role
+from ..models import SavedSearch
+
+JOB_TYPES = [choice for choice, _ in SavedSearch._meta.get_field('job_type').choices]
+
+saved_search_example = {
+    "id": 1,
+    "name": "Remote Django",
+    "query": "django python",
+    "job_type": "full_time",
+    "location": "Berlin",
+    "created_at": "2024-01-15T10:30:00Z"
+}
+
+
+def serialize_saved_search(saved_search):
+    return {
+        'id': saved_search.id,
+        'name': saved_search.name,
+        'query': saved_search.query,
+        'job_type': saved_search.job_type,
+        'location': saved_search.location,
+        'created_at': saved_search.created_at.isoformat(),
+    }
+
+
+class SavedSearchListView(APIView):
+    @swagger_auto_schema(
+        operation_summary="Get your saved searches",
+        operation_description="Retrieve the job alerts of the authenticated applicant.",
+        responses={
+            200: openapi.Response(
+                description="Saved searches",
+                examples={"application/json": {"saved_searches": [saved_search_example]}}
+            ),
+            401: openapi.Response(description="Unauthorized"),
+            403: openapi.Response(description="Only applicants have saved searches")
+        },
+        tags=["Saved Searches"]
+    )
+    @require_role('applicant')
+    def get(self, request):
+        """Get the applicant's saved searches"""
+        saved_searches = SavedSearch.objects.filter(applicant_id=request.user.applicant_id).order_by('id')
+        return Response({'saved_searches': [serialize_saved_search(s) for s in saved_searches]})
+
+    @swagger_auto_schema(
+        operation_summary="Save a search",
+        operation_description="Save a job alert. Open jobs posted from now on that contain every term of "
+                              "the query, and match the optional job type and location, are mailed in a "
+                              "periodic digest.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['query'],
+            properties={
+                'name': openapi.Schema(type=openapi.TYPE_STRING, description='Label used in the digest'),
+                'query': openapi.Schema(type=openapi.TYPE_STRING, description='Terms that must all appear in the job'),
+                'job_type': openapi.Schema(type=openapi.TYPE_STRING, enum=JOB_TYPES),
+                'location': openapi.Schema(type=openapi.TYPE_STRING),
+            }
+        ),
+        responses={
+            201: openapi.Response(
+                description="Saved search created",
+                examples={"application/json": saved_search_example}
+            ),
+            400: openapi.Response(description="Bad request"),
+            401: openapi.Response(description="Unauthorized"),
+            403: openapi.Response(description="Only applicants have saved searches")
+        },
+        tags=["Saved Searches"]
+    )
+    @require_role('applicant')
+    def post(self, request):
+        """Create a saved search"""
+        data = request.data
+        query = str(data.get('query') or '').strip()
+        job_type = str(data.get('job_type') or '')
+        if not tokenize(query):
+            return Response({'error': 'query needs at least one word'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(query) > 255:
+            return Response({'error': 'query is limited to 255 characters'}, status=status.HTTP_400_BAD_REQUEST)
+        if job_type and job_type not in JOB_TYPES:
+            return Response({'error': f'job_type must be one of {", ".join(JOB_TYPES)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        applicant_id = request.user.applicant_id
+        if SavedSearch.objects.filter(applicant_id=applicant_id).count() >= settings.SAVED_SEARCHES_PER_APPLICANT:
+            return Response({'error': f'At most {settings.SAVED_SEARCHES_PER_APPLICANT} saved searches are allowed'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        saved_search = SavedSearch.objects.create(
+            applicant_id=applicant_id,
+            name=str(data.get('name') or '')[:255],
+            query=query,
+            job_type=job_type,
+            location=str(data.get('location') or '')[:255],
+        )
+        return Response(serialize_saved_search(saved_search), status=status.HTTP_201_CREATED)
+
+
+class SavedSearchDetailView(APIView):
+    @swagger_auto_schema(
+        operation_summary="Delete a saved search",
+        operation_description="Stop a job alert. Matches not mailed yet are dropped with it.",
+        responses={
+            204: openapi.Response(description="Saved search deleted"),
+            401: openapi.Response(description="Unauthorized"),
+            403: openapi.Response(description="Forbidden"),
+            404: openapi.Response(description="Saved search not found")
+        },
+        tags=["Saved Searches"]
+    )
+    @require_ownership_or_admin('savedsearch', 'saved_search_id')
+    def delete(self, request, saved_search_id):
+        """Delete a saved search"""
+        SavedSearch.objects.filter(id=saved_search_id).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,87 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+from ..salary import DIMENSIONS, base_currency, distribution, top_distributions
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+distribution_schema = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        'value': openapi.Schema(type=openapi.TYPE_STRING),
+        'count': openapi.Schema(type=openapi.TYPE_INTEGER),
+        'percentiles': openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                name: openapi.Schema(type=openapi.TYPE_NUMBER)
+                for name in ('p10', 'p25', 'p50', 'p75', 'p90')
+            }
+        ),
+        'histogram': openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'min': openapi.Schema(type=openapi.TYPE_NUMBER),
+                    'max': openapi.Schema(type=openapi.TYPE_NUMBER),
+                    'count': openapi.Schema(type=openapi.TYPE_INTEGER),
+                }
+            )
+        ),
+    }
+)
+
+
+class SalaryStatsView(APIView):
+
+    @swagger_auto_schema(
+        operation_description="Yearly salary percentiles and histogram by title, skill or location, "
+                              "in the base currency. Without a value the most common values are returned.",
+        operation_summary="Salary Statistics",
+        manual_parameters=[
+            openapi.Parameter('by', openapi.IN_QUERY, description="title, skill or location", type=openapi.TYPE_STRING, default='title'),
+            openapi.Parameter('value', openapi.IN_QUERY, description="A single title, skill or location", type=openapi.TYPE_STRING),
+            openapi.Parameter('limit', openapi.IN_QUERY, description=f"Values returned without a value, max {MAX_LIMIT}", type=openapi.TYPE_INTEGER, default=DEFAULT_LIMIT),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Salary distributions",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'by': openapi.Schema(type=openapi.TYPE_STRING),
+                        'currency': openapi.Schema(type=openapi.TYPE_STRING),
+                        'period': openapi.Schema(type=openapi.TYPE_STRING),
+                        'results': openapi.Schema(type=openapi.TYPE_ARRAY, items=distribution_schema),
+                    }
+                )
+            ),
+            400: openapi.Response(description="Bad request")
+        },
+        tags=['Jobs']
+    )
+    def get(self, request):
+        """Get salary distributions"""
+        dimension = request.GET.get('by', 'title')
+        if dimension not in DIMENSIONS:
+            return Response({'error': f'by must be one of {", ".join(DIMENSIONS)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+        value = request.GET.get('value')
+        if value:
+            results = [distribution(dimension, value)]
+        else:
+            results = top_distributions(dimension, limit)
+        return Response({
+            'by': dimension,
+            'currency': base_currency(),
+            'period': 'year',
+            'results': results,
+        })
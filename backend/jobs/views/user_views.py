@@ -1,15 +1,11 @@
 from django.shortcuts import get_object_or_404
 from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
-from django.utils.decorators import method_decorator
-from django.views import View
-import json
+from rest_framework.views import APIView
 from ..models import User
-from ..auth import require_authentication, require_ownership_or_admin, hash_password
+from ..auth import require_authentication, require_ownership_or_admin, hash_password, revoke_user_tokens
 
 
-@method_decorator(csrf_exempt, name='dispatch')
-class UserListView(View):
+class UserListView(APIView):
     @require_authentication
     def get(self, request):
         """Get all users - Admin only for now"""
@@ -29,8 +25,7 @@ class UserListView(View):
         return JsonResponse({'error': 'Use /auth/register endpoint for user registration'}, status=400)
 
 
-@method_decorator(csrf_exempt, name='dispatch')
-class UserDetailView(View):
+class UserDetailView(APIView):
     @require_ownership_or_admin('user', 'user_id')
     def get(self, request, user_id):
         """Get a specific user - Owner only"""
@@ -47,7 +42,9 @@ class UserDetailView(View):
         """Update a specific user - Owner only"""
         try:
             user = get_object_or_404(User, id=user_id)
-            data = json.loads(request.body)
+            data = request.data
+            # A new password or role invalidates the tokens already handed out
+            revoke = 'password' in data or data.get('role', user.role) != user.role
             
             user.email = data.get('email', user.email)
             if 'password' in data:
@@ -55,6 +52,8 @@ class UserDetailView(View):
             user.role = data.get('role', user.role)
             user.name = data.get('name', user.name)
             user.save()
+            if revoke:
+                revoke_user_tokens(user.id)
             
             return JsonResponse({
                 'id': user.id,
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -6,6 +7,9 @@ from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from ..models import Company, Job, Applicant, JobApplication, Experience
 from ..auth import require_authentication, require_ownership_or_admin
+from ..job_summaries import application_job_fields, get_job_summaries
+from ..query_budget import query_budget
+from ..streams import issue_stream_ticket
 
 
 class JobsByCompanyView(APIView):
@@ -61,10 +65,15 @@ class JobsByCompanyView(APIView):
         return Response({'jobs': jobs_data})
 
 
+@query_budget(5)
 class ApplicationsByApplicantView(APIView):
     @swagger_auto_schema(
         operation_summary="Get all applications for a specific applicant",
-        operation_description="Retrieve all job applications for a specific applicant. Only the applicant owner or admin can access.",
+        operation_description="Retrieve all job applications for a specific applicant. Only the applicant owner or admin can access. "
+                              "Instead of polling, open the server-sent event stream at "
+                              "/api/applicants/{applicant_id}/applications/stream/ (ASGI only) to hear about status changes. "
+                              "The stream takes the same Bearer header; EventSource clients pass a ticket from "
+                              "POST /api/applicants/{applicant_id}/applications/stream/ticket/ as ?ticket= instead.",
         responses={
             200: openapi.Response(
                 description="List of applications by applicant",
@@ -94,21 +103,48 @@ class ApplicationsByApplicantView(APIView):
     def get(self, request, applicant_id):
         """Get all applications for a specific applicant - Owner only"""
         applicant = get_object_or_404(Applicant, id=applicant_id)
-        applications = JobApplication.objects.filter(applicant=applicant)
+        applications = list(JobApplication.objects.filter(applicant=applicant))
+        summaries = get_job_summaries(app.job_id for app in applications)
         applications_data = []
         for app in applications:
             applications_data.append({
                 'id': app.id,
-                'job_id': app.job.id,
-                'job_title': app.job_title,
-                'company_name': app.company_name,
-                'job_url': app.job_url,
+                'job_id': app.job_id,
+                **application_job_fields(app, summaries),
                 'status': app.status,
                 'applied_at': app.applied_at.isoformat()
             })
         return Response({'applications': applications_data})
 
 
+class ApplicationStreamTicketView(APIView):
+    @swagger_auto_schema(
+        operation_summary="Get a ticket for the application status stream",
+        operation_description="Issue a short lived, single use ticket opening "
+                              "/api/applicants/{applicant_id}/applications/stream/?ticket=... for clients such as "
+                              "EventSource that cannot send an Authorization header. The stream ends when the "
+                              "access token used here expires or is revoked. Only the applicant owner can access.",
+        responses={
+            200: openapi.Response(
+                description="Stream ticket",
+                examples={
+                    "application/json": {
+                        "ticket": "eyJ1c2VyX2lkIjoxfQ:1u2v3w:signature",
+                        "expires_in": 30
+                    }
+                }
+            ),
+            401: openapi.Response(description="Unauthorized"),
+            403: openapi.Response(description="Forbidden")
+        },
+        tags=["Utility"]
+    )
+    @require_ownership_or_admin('applicant', 'applicant_id')
+    def post(self, request, applicant_id):
+        """Issue a stream ticket - Owner only"""
+        return Response({'ticket': issue_stream_ticket(request.user), 'expires_in': settings.STREAM_TICKET_SECONDS})
+
+
 class ExperiencesByApplicantView(APIView):
     @swagger_auto_schema(
         operation_summary="Get all experiences for a specific applicant",
@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Event streams are answered before Django, see jobs.streams
+from jobs.streams import route_streams  # noqa: E402
+
+application = route_streams(django_application)
@@ -1,6 +1,7 @@
 import os
 from celery import Celery
 from celery.schedules import crontab
+from django.conf import settings
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main.settings')
@@ -19,9 +20,46 @@ app.autodiscover_tasks()
 
 @app.on_after_configure.connect
 def setup_periodic_tasks(sender, **kwargs):
+    from jobs.tasks import (
+        compact_application_rollups, deliver_notifications, purge_idempotency_keys, purge_revoked_tokens,
+        reconcile_search_index, relay_outbox,
+    )
+
+    # Drains outbox events whose on-commit relay request was lost.
+    sender.add_periodic_task(5.0, relay_outbox.s(), name='relay outbox every 5 seconds')
+
     # Executes the reconciliation task daily at midnight.
     sender.add_periodic_task(
         crontab(minute=0, hour=0), 
         reconcile_search_index.s(), 
         name='reconcile search index daily at midnight'
     )
+
+    # Keeps the dashboard rollup table bounded by the daily retention window.
+    sender.add_periodic_task(
+        crontab(minute=30, hour=0),
+        compact_application_rollups.s(),
+        name='compact application rollups daily'
+    )
+
+    # Expired Idempotency-Key responses are only dead weight.
+    sender.add_periodic_task(
+        crontab(minute=15),
+        purge_idempotency_keys.s(),
+        name='purge expired idempotency keys hourly'
+    )
+
+    # Revocations and refresh tokens past their expiry protect nothing.
+    sender.add_periodic_task(
+        crontab(minute=45),
+        purge_revoked_tokens.s(),
+        name='purge expired token revocations hourly'
+    )
+
+    # Notifications queued since the last run go out as one digest per user,
+    # the interval is how long changes have to coalesce.
+    sender.add_periodic_task(
+        float(settings.NOTIFICATION_DIGEST_SECONDS),
+        deliver_notifications.s(),
+        name='deliver notification digests'
+    )
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+from copy import deepcopy
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'jobs.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,6 +54,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'jobs.middleware.ReplicaRoutingMiddleware',
+    'jobs.query_budget.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'main.urls'
@@ -79,20 +84,194 @@ WSGI_APPLICATION = 'main.wsgi.application'
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
-        "NAME": "job_app",
-        "USER": "jobadmin",
-        "PASSWORD": "job_app_2025",
-        "HOST": "localhost",
-        "PORT": "5432",
+        "NAME": os.environ.get("DB_NAME", "job_app"),
+        "USER": os.environ.get("DB_USER", "jobadmin"),
+        "PASSWORD": os.environ.get("DB_PASSWORD", "job_app_2025"),
+        "HOST": os.environ.get("DB_HOST", "localhost"),
+        "PORT": os.environ.get("DB_PORT", "5432"),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {},
     }
 }
 
+# Connection pooling
+# DB_POOL_MODE selects how connections are reused:
+#   "psycopg"   - in-process psycopg3 pool (requires psycopg[pool])
+#   "pgbouncer" - persistent connections to a PgBouncer in transaction mode
+#   "none"      - persistent connections without a pool (CONN_MAX_AGE only)
+DB_POOL_MODE = os.environ.get("DB_POOL_MODE", "psycopg")
+
+if DB_POOL_MODE == "psycopg":
+    # Django's pool and CONN_MAX_AGE are mutually exclusive, the pool owns
+    # connection lifetime.
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", "2")),
+        "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", "10")),
+        "timeout": float(os.environ.get("DB_POOL_TIMEOUT", "10")),
+        "max_idle": float(os.environ.get("DB_POOL_MAX_IDLE", "600")),
+        "max_lifetime": float(os.environ.get("DB_POOL_MAX_LIFETIME", "3600")),
+    }
+else:
+    DATABASES["default"]["CONN_MAX_AGE"] = int(os.environ.get("DB_CONN_MAX_AGE", "60"))
+    if DB_POOL_MODE == "pgbouncer":
+        # Transaction pooling hands each transaction a different server
+        # connection, so prepared statements cannot be reused. Server-side
+        # cursors stay enabled; stream through jobs.db.stream_queryset which
+        # keeps the cursor inside a single transaction.
+        DATABASES["default"]["OPTIONS"]["prepare_threshold"] = None
+
+# Read replicas
+# DB_REPLICA_HOSTS is a comma separated list of host[:port] entries. Each one
+# becomes a "replica_<n>" alias sharing the primary's credentials.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(h.strip() for h in os.environ.get("DB_REPLICA_HOSTS", "").split(",") if h.strip()):
+    replica_host, _, replica_port = replica.partition(":")
+    alias = f"replica_{index}"
+    DATABASES[alias] = deepcopy(DATABASES["default"])
+    DATABASES[alias]["HOST"] = replica_host
+    DATABASES[alias]["PORT"] = replica_port or DATABASES["default"]["PORT"]
+    DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['jobs.db_router.ReplicaRouter']
+
+# Seconds a caller keeps reading from the primary after one of their writes
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", "5"))
+
+# URL names whose safe (GET/HEAD/OPTIONS) requests may read from a replica
+REPLICA_ROUTED_VIEWS = [
+    'job-list',
+    'job-detail',
+    'job-search',
+    'company-list',
+    'company-detail',
+    'jobs-by-company',
+    'salary-stats',
+]
+
+# Performance instrumentation
+# Requests slower than this are logged with up to SLOW_REQUEST_LOG_QUERIES
+# of the queries they ran.
+SLOW_REQUEST_THRESHOLD_MS = int(os.environ.get("SLOW_REQUEST_THRESHOLD_MS", "500"))
+SLOW_REQUEST_LOG_QUERIES = int(os.environ.get("SLOW_REQUEST_LOG_QUERIES", "50"))
+# /metrics is served to requests carrying "Authorization: Bearer
+# <METRICS_TOKEN>" or coming straight from one of METRICS_ALLOWED_IPS (comma
+# separated), and is a 404 for everybody else. Both are empty by default.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.environ.get("METRICS_ALLOWED_IPS", "").split(",") if ip.strip()]
+
+# Query budgets
+# Maximum queries per view, keyed by URL name. Views can also declare a budget
+# with jobs.query_budget.query_budget. QUERY_BUDGET_MODE is "raise", "warn" or
+# "off"; it defaults to warning with DEBUG on, main.test_settings raises.
+QUERY_BUDGET_MODE = os.environ.get("QUERY_BUDGET_MODE", "warn" if DEBUG else "off")
+QUERY_BUDGETS = {
+    'job-list': 2,
+    'job-detail': 2,
+    'company-list': 2,
+    'applicant-list': 4,
+    'application-list': 4,
+    'applicant-detail': 8,
+    'jobs-by-company': 5,
+    'experiences-by-applicant': 6,
+    'salary-stats': 2,
+    'company-dashboard': 5,
+}
+
+# Cache
+# Shared state such as the replica sticky window lives here, so production
+# deployments should point CACHE_URL at Redis. With read replicas configured
+# a process local cache fails the jobs.E001 system check.
+if os.environ.get("CACHE_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["CACHE_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 ELASTICSEARCH_DSL = {
     'default': {
         'hosts': 'http://localhost:9200'
     },
 }
 
+# Shard and replica counts used when (re)building search indexes. Applied by
+# the rebuild_search_index command, which swaps the new index in behind the
+# document's alias.
+SEARCH_INDEX_SHARDS = int(os.environ.get("SEARCH_INDEX_SHARDS", "1"))
+SEARCH_INDEX_REPLICAS = int(os.environ.get("SEARCH_INDEX_REPLICAS", "0"))
+
+# Search result cache: entries are fresh for SEARCH_CACHE_FRESH_SECONDS or
+# until the next index flush, then served stale while one request refreshes
+# them, for up to SEARCH_CACHE_STALE_SECONDS.
+SEARCH_CACHE_FRESH_SECONDS = int(os.environ.get("SEARCH_CACHE_FRESH_SECONDS", "60"))
+SEARCH_CACHE_STALE_SECONDS = int(os.environ.get("SEARCH_CACHE_STALE_SECONDS", "600"))
+SEARCH_CACHE_WAIT_SECONDS = float(os.environ.get("SEARCH_CACHE_WAIT_SECONDS", "2"))
+
+# Indexing goes through the transactional outbox (jobs.outbox), turn off the
+# library's own post_save indexing so documents are not written twice.
+ELASTICSEARCH_DSL_AUTOSYNC = False
+
+# Failed outbox handler runs are retried with exponential backoff (capped at
+# five minutes); after this many the events are dead-lettered.
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "10"))
+
+# Width, in yearly base currency, of the salary distribution histogram buckets
+# (jobs.salary). Run rebuild_salary_stats after changing it.
+SALARY_HISTOGRAM_BUCKET_WIDTH = int(os.environ.get("SALARY_HISTOGRAM_BUCKET_WIDTH", "5000"))
+
+# Company dashboards keep per day application counts for this many days, older
+# days are folded into per job totals by compact_application_rollups.
+DASHBOARD_DAILY_RETENTION_DAYS = int(os.environ.get("DASHBOARD_DAILY_RETENTION_DAYS", "90"))
+
+# Job title, company and URL shown with applications are cached this long
+# (jobs.job_summaries), saves invalidate them earlier.
+JOB_SUMMARY_CACHE_SECONDS = int(os.environ.get("JOB_SUMMARY_CACHE_SECONDS", "300"))
+
+# Responses stored for Idempotency-Key retries are replayed for this long. A
+# key whose request has not finished after IDEMPOTENCY_IN_FLIGHT_SECONDS is
+# taken over by the next retry.
+IDEMPOTENCY_KEY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_KEY_TTL_SECONDS", str(24 * 60 * 60)))
+IDEMPOTENCY_IN_FLIGHT_SECONDS = int(os.environ.get("IDEMPOTENCY_IN_FLIGHT_SECONDS", "60"))
+
+# Job alerts (jobs.alerts). Every process rebuilds its saved search index
+# when a search changes, and at least this often.
+SAVED_SEARCH_INDEX_SECONDS = int(os.environ.get("SAVED_SEARCH_INDEX_SECONDS", "300"))
+SAVED_SEARCHES_PER_APPLICANT = int(os.environ.get("SAVED_SEARCHES_PER_APPLICANT", "20"))
+
+# Notification digests (jobs.notifications) go out this often, one per user
+# with at most NOTIFICATION_DIGEST_MAX_ITEMS lines. Each batch of the
+# fan-out covers this many recipients.
+NOTIFICATION_DIGEST_SECONDS = int(os.environ.get("NOTIFICATION_DIGEST_SECONDS", "60"))
+NOTIFICATION_DIGEST_MAX_ITEMS = int(os.environ.get("NOTIFICATION_DIGEST_MAX_ITEMS", "20"))
+NOTIFICATION_BATCH_RECIPIENTS = int(os.environ.get("NOTIFICATION_BATCH_RECIPIENTS", "500"))
+NOTIFICATION_SINKS = {
+    'email': {'BACKEND': 'jobs.notifications.EmailSink'},
+}
+if os.environ.get("NOTIFICATION_FILE_PATH"):
+    NOTIFICATION_SINKS['file'] = {
+        'BACKEND': 'jobs.notifications.FileSink',
+        'OPTIONS': {'path': os.environ["NOTIFICATION_FILE_PATH"]},
+    }
+
+# Live application status streams (jobs.streams), served by the ASGI app.
+# Updates reach streams of other processes through Redis when
+# STREAM_PUBSUB_URL is set, and only streams of the same process otherwise.
+# A stream more than STREAM_QUEUE_SIZE updates behind is told to resync.
+STREAM_PUBSUB_URL = os.environ.get("STREAM_PUBSUB_URL", "")
+STREAM_HEARTBEAT_SECONDS = float(os.environ.get("STREAM_HEARTBEAT_SECONDS", "25"))
+# EventSource clients open a stream with a ticket valid this long
+STREAM_TICKET_SECONDS = int(os.environ.get("STREAM_TICKET_SECONDS", "30"))
+STREAM_QUEUE_SIZE = int(os.environ.get("STREAM_QUEUE_SIZE", "100"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -138,13 +317,17 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.coreapi.AutoSchema',
+    # Views declare their rules with the jobs.auth decorators; methods
+    # without any are public.
     'DEFAULT_PERMISSION_CLASSES': [
-        'rest_framework.permissions.AllowAny',
+        'jobs.permissions.DeclaredAccess',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.BasicAuthentication',
-        'rest_framework.authentication.SessionAuthentication',
+        'jobs.authentication.JWTAuthentication',
     ],
+    # Proxies in front of the app, client IPs are read from X-Forwarded-For
+    # past them. Leave at 0 when clients connect directly.
+    'NUM_PROXIES': int(os.environ.get("NUM_PROXIES", "0")),
 }
 
 # Swagger settings
@@ -176,6 +359,43 @@ SWAGGER_SETTINGS = {
 # JWT Secret Key for authentication
 JWT_SECRET = 'your-secret-key-change-in-production'
 
+# Access tokens are short lived and renewed with single use refresh tokens
+JWT_ACCESS_TOKEN_SECONDS = int(os.environ.get("JWT_ACCESS_TOKEN_SECONDS", "900"))
+JWT_REFRESH_TOKEN_DAYS = int(os.environ.get("JWT_REFRESH_TOKEN_DAYS", "30"))
+
+# Revoked access tokens are held in memory in sets per expiry bucket, and
+# each process pulls revocations made elsewhere this often.
+TOKEN_REVOCATION_BUCKET_SECONDS = int(os.environ.get("TOKEN_REVOCATION_BUCKET_SECONDS", "60"))
+TOKEN_REVOCATION_SYNC_SECONDS = float(os.environ.get("TOKEN_REVOCATION_SYNC_SECONDS", "5"))
+
+# Verified token payloads kept per process, 0 verifies every request
+JWT_VERIFIED_CACHE_SIZE = int(os.environ.get("JWT_VERIFIED_CACHE_SIZE", "4096"))
+
+# Sliding window limits for the credential endpoints (jobs.throttling), per
+# client IP and per submitted email. Counters are shared through Redis when
+# THROTTLE_REDIS_URL is set and kept per process otherwise.
+THROTTLE_REDIS_URL = os.environ.get("THROTTLE_REDIS_URL", "")
+AUTH_THROTTLE_RATES = {
+    'login': {
+        'ip': os.environ.get("LOGIN_THROTTLE_IP_RATE", "30/min"),
+        'email': os.environ.get("LOGIN_THROTTLE_EMAIL_RATE", "5/min"),
+    },
+    'register': {
+        'ip': os.environ.get("REGISTER_THROTTLE_IP_RATE", "10/hour"),
+        'email': os.environ.get("REGISTER_THROTTLE_EMAIL_RATE", "3/hour"),
+    },
+}
+
+# Token versions are read from the cache, a revocation (password or role
+# change) reaches processes with a local cache within this many seconds.
+TOKEN_VERSION_CACHE_SECONDS = int(os.environ.get("TOKEN_VERSION_CACHE_SECONDS", "60"))
+
+# Outgoing mail (welcome messages, notification digests), printed to stdout unless configured
+EMAIL_BACKEND = os.environ.get("EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend")
+EMAIL_HOST = os.environ.get("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.environ.get("EMAIL_PORT", "25"))
+DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "no-reply@jobboard.local")
+
 # Celery Configuration
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
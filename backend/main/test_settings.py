@@ -0,0 +1,32 @@
+"""
+Settings for the test suite:
+
+    python manage.py test --settings=main.test_settings
+
+Tests run against two local SQLite databases, ``default`` and
+``replica_0``, so neither PostgreSQL nor Redis is needed. Replica routing
+stays off unless a test lists ``replica_0`` in ``DATABASE_REPLICAS``; the
+replica then only holds what the test wrote to it.
+"""
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test-default.sqlite3',
+    },
+    'replica_0': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test-replica.sqlite3',
+    },
+}
+DATABASE_REPLICAS = []
+
+# A view running more queries than its budget fails the test
+QUERY_BUDGET_MODE = 'raise'
+
+# Relay nudges sent on commit go nowhere instead of waiting for Redis
+CELERY_BROKER_URL = 'memory://'
+CELERY_RESULT_BACKEND = 'cache+memory://'
+
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'